@@ -1,7 +1,11 @@
 import os
 import re
 import sys
+import hashlib
 import datetime
+import itertools
+import threading
+import cStringIO
 
 __version__ = "0.12.3"
 __verbose__ = False
@@ -18,7 +22,8 @@ from .types import (ReservedNameError,
                     Set,
                     Dict,
                     Struct,
-                    GlobalValidationDisabled)
+                    GlobalValidationDisabled,
+                    Transaction)
 from .schematypes import (TypeValidator,
                           ValidationError)
 from .validation import (UnknownSchemaError,
@@ -32,7 +37,36 @@ from .mixin import (SchemaTypeError,
                     bind,
                     has_bound_mixins,
                     get_bound_mixins)
+from .parser import ParseError
+from .binary import BinaryError
+from .compression import CompressionError
+from .journal import JournalError
+from .archive import ArchiveError
+from .parallel import (ReadManyError,
+                       WriteManyError)
+from .tasks import (CancelledError,
+                    TimeoutError)
 from . import schema
+from . import parser
+from . import binary
+from . import mapped
+from . import compression
+from . import cache
+from . import parallel
+from . import tasks
+from . import scan
+from . import serializer
+from . import hashing
+from . import cli
+from . import journal
+from . import lazy
+from . import archive
+from . import compiler
+
+# Functions below use 'compression', 'journal' and 'lazy' as argument names
+_compression = compression
+_journal = journal
+_lazy = lazy
 
 # For backward compatibiilty
 Das = Struct
@@ -265,15 +299,18 @@ def validate(d, schema_type):
       return get_schema_type(schema_type).validate(d)
 
 
+def transaction(d):
+   return Transaction(d)
+
+
 def check(d, schema_type):
    if not isinstance(schema_type, (basestring, TypeValidator)):
       raise Exception("Expected a string or a das.schematypes.TypeValidator instance as second argument")
    try:
       if isinstance(schema_type, TypeValidator):
-         schema_type.validate(copy(d))
+         return schema_type.accepts(d)
       else:
-         get_schema_type(schema_type).validate(copy(d))
-      return True
+         return get_schema_type(schema_type).accepts(d)
    except:
       return False
 
@@ -283,40 +320,74 @@ def is_compatible(d, schema_type):
       raise Exception("Expected a string or a das.schematypes.TypeValidator instance as second argument") 
    try:
       if isinstance(schema_type, TypeValidator):
-         schema_type.is_compatible(copy(d))
+         return schema_type._matcher(False)(d)
       else:
-         get_schema_type(schema_type).is_compatible(copy(d))
-      return True
+         return get_schema_type(schema_type)._matcher(False)(d)
    except:
       return False
 
 
-def _read_file(path, skip_content=False):
-   mde = re.compile("^\s*([^:]+):\s*(.*)\s*$")
-   reading_content = False
-   content = ""
-   md = {}
-   if os.path.isfile(path):
-      with open(path, "rb") as f:
-         for l in f.readlines():
-            sl = l.strip()
-            if sl.startswith("#"):
-               if not reading_content:
-                  m = mde.match(sl[1:])
-                  if m is not None:
-                     md[m.group(1)] = m.group(2)
-            else:
-               reading_content = True
-               if skip_content:
-                  break
-               else:
-                  # Convert line endings to LF on the fly
-                  content += l.rstrip() + "\n"
-   return md, content
+def _is_path(path):
+   return isinstance(path, basestring)
+
+
+def _source_name(path):
+   if _is_path(path):
+      return path.replace("\\", "/")
+   else:
+      return str(getattr(path, "name", "<%s>" % type(path).__name__))
+
 
+# Size of reads when only looking for metadata
+_MetaChunkSize = 4096
 
-def read_meta(path):
-   return _read_file(path, skip_content=True)[0]
+_MetaLine = re.compile("^\s*([^:]+):\s*(.*)\s*$")
+
+
+def _read_header(f):
+   # Reads the metadata lines at the start of text content
+   #   returns metadata and the first content line ("" if there is none)
+   md = {}
+   for l in f:
+      sl = l.strip()
+      if not sl.startswith("#"):
+         return md, l
+      m = _MetaLine.match(sl[1:])
+      if m is not None:
+         md[m.group(1)] = m.group(2)
+   return md, ""
+
+
+def _content_lines(lines):
+   # Drop comment lines and convert line endings to LF
+   return (l.rstrip() + "\n" for l in lines if not l.strip().startswith("#"))
+
+
+def _read_file(path, skip_content=False, compression=None, raw=False):
+   # path may also be a file like object or a byte buffer
+   # With raw, text content is returned as is (comment lines and line endings kept)
+   if _is_path(path) and not os.path.isfile(path):
+      return {}, ""
+   with _compression.open(path, compression, chunk_size=(_MetaChunkSize if skip_content else _compression.ChunkSize)) as f:
+      if f.peek(len(binary.Magic)) == binary.Magic:
+         # Binary content is returned whole, header included
+         if skip_content:
+            return binary.read_meta(f), ""
+         content = f.read()
+         return binary.loads_meta(content), content
+      md, l = _read_header(f)
+      if skip_content or not l:
+         return md, ""
+      if raw:
+         return md, l + f.read()
+      # Remaining content is read at once and split in C
+      lines = itertools.chain([l], cStringIO.StringIO(f.read()))
+      return md, "".join(_content_lines(lines))
+
+
+def read_meta(path, compression=None):
+   # Only the header is read (and decompressed)
+   return _read_file(path, skip_content=True, compression=compression)[0]
 
 
 def ascii_or_unicode(s, encoding=None):
@@ -367,7 +438,8 @@ def decode(d, encoding):
       return d
 
 
-def read_string(s, schema_type=None, encoding=None, strict_schema=True, **funcs):
+def _read_schema_type(schema_type, funcs):
+   # Also adds schema module's exported names to funcs
    if schema_type is not None:
       if isinstance(schema_type, basestring):
          schname = schema_type
@@ -383,30 +455,63 @@ def read_string(s, schema_type=None, encoding=None, strict_schema=True, **funcs)
          if mod is not None and hasattr(mod, "__all__"):
             for item in mod.__all__:
                funcs[item] = getattr(mod, item)
-      else:
-         mod = None
+      return sch
    else:
-      sch, mod = None, None
+      return None
+
+
+class _CompatibilityMode(object):
+   # Struct.CompatibilityMode is global, reads from several threads must not overlap while it is set
+   Lock = threading.RLock()
+
+   def __init__(self, strict_schema):
+      super(_CompatibilityMode, self).__init__()
+      self.on = (True if not strict_schema else False)
+
+   def __enter__(self):
+      _CompatibilityMode.Lock.acquire()
+      # Lazy reads may parse fields while already in this mode
+      self.prev = schematypes.Struct.CompatibilityMode
+      schematypes.Struct.CompatibilityMode = self.on
+      return self
+
+   def __exit__(self, type, value, traceback):
+      schematypes.Struct.CompatibilityMode = self.prev
+      _CompatibilityMode.Lock.release()
+      return False
+
+
+def _validate_read(rv, sch, strict_schema):
+   if sch is None:
+      return rv
+   with _CompatibilityMode(strict_schema):
+      return sch.validate(rv)
+
+
+def read_string(s, schema_type=None, encoding=None, strict_schema=True, **funcs):
+   return _read_string(s, schema_type, encoding, strict_schema, funcs)
+
+
+def _read_string(s, schema_type, encoding, strict_schema, funcs, compiled=False):
+   sch = _read_schema_type(schema_type, funcs)
 
    if not encoding:
       if __verbose__:
          print_once("[das] Warning: das.read assumes system default encoding for unicode characters unless explicitely set.")
-   else:
-      s = ("# encoding: %s\n" % encoding) + s
 
-   rv = eval(s, globals(), funcs)
+   if binary.is_binary(s):
+      return _validate_read(binary.loads(s, names=funcs, encoding=encoding), sch, strict_schema)
 
-   if encoding:
-      rv = decode(rv, encoding)
+   if compiled:
+      # Skip parsing when a compiled form of the same content exists
+      found, rv = cache.CompiledCache.instance.load(s, encoding=encoding, names=funcs)
+      if not found:
+         rv = parser.parse(s, names=funcs, encoding=encoding)
+         cache.CompiledCache.instance.store(s, rv, encoding=encoding, names=funcs)
+      return _validate_read(rv, sch, strict_schema)
 
-   if sch is None:
-      return rv
-   else:
-      try:
-         schematypes.Struct.CompatibilityMode = (True if not strict_schema else False)
-         return sch.validate(rv)
-      finally:
-         schematypes.Struct.CompatibilityMode = False
+   # Strings are decoded as they are parsed, no need for a separate decode pass
+   return _validate_read(parser.parse(s, names=funcs, encoding=encoding), sch, strict_schema)
 
 
 # returns: -2 if version check could not be performed
@@ -428,10 +533,7 @@ def is_version_compatible(reqver, curver):
       return -2
 
 
-def read(path, schema_type=None, ignore_meta=False, strict_schema=None, **funcs):
-   # Read header data
-   md, src = _read_file(path)  
-
+def _check_meta(path, md, schema_type=None, ignore_meta=False, strict_schema=None):
    libver = md.get("version", None)
    if libver:
       compat = is_version_compatible(libver, __version__)
@@ -471,12 +573,163 @@ def read(path, schema_type=None, ignore_meta=False, strict_schema=None, **funcs)
    encoding = md.get("encoding", None)
    if encoding is None:
       if __verbose__:
-         print_once("[das] Warning: No encoding specified in file '%s'." % path.replace("\\", "/"))
+         print_once("[das] Warning: No encoding specified in file '%s'." % _source_name(path))
 
    if strict_schema is None:
       strict_schema = True
 
-   return read_string(src, schema_type=schema_type, encoding=encoding, strict_schema=strict_schema, **funcs)
+   return schema_type, encoding, strict_schema
+
+
+def set_read_cache_size(max_size):
+   # Approximate memory budget in bytes for values cached by 'read', 0 disables caching
+   cache.ReadCache.instance.set_max_size(max_size)
+
+
+def get_read_cache_size():
+   return cache.ReadCache.instance.max_size
+
+
+def clear_read_cache():
+   cache.ReadCache.instance.clear()
+
+
+def set_compiled_cache_path(path):
+   # Directory where parsed file contents are stored, None disables it
+   # Only point it at directories writable by trusted users
+   cache.CompiledCache.instance.set_path(path)
+
+
+def get_compiled_cache_path():
+   return cache.CompiledCache.instance.path
+
+
+def set_compiled_cache_size(max_size):
+   # Size in bytes above which least recently used compiled files are removed, 0 for no limit
+   cache.CompiledCache.instance.set_max_size(max_size)
+
+
+def get_compiled_cache_size():
+   return cache.CompiledCache.instance.max_size
+
+
+def read(path, schema_type=None, ignore_meta=False, strict_schema=None, compression=None, lazy=False, **funcs):
+   # compression is detected from file content when not specified
+   # With lazy, the top level fields of a Struct are only parsed and validated when first
+   # accessed (text files only, see das.lazy)
+   return _read(path, schema_type, ignore_meta, strict_schema, funcs, compression=compression, lazy=lazy)
+
+
+def aread(path, schema_type=None, ignore_meta=False, strict_schema=None, compression=None, lazy=False, executor=None, **funcs):
+   # Returns a future like das.tasks.Task (or executor's own future type)
+   return tasks.submit(executor, _read, path, schema_type, ignore_meta, strict_schema, funcs, compression=compression, lazy=lazy, checkpoint=tasks.checkpoint)
+
+
+def _read(path, schema_type, ignore_meta, strict_schema, funcs, compression=None, lazy=False, checkpoint=None):
+   key = None
+   # Extra names may change parsing results, don't cache those reads
+   # Lazy reads would be fully parsed to be cached
+   if cache.ReadCache.instance.enabled() and not funcs and not lazy:
+      key = cache.ReadCache.instance.key(path, schema_type=schema_type, ignore_meta=ignore_meta, strict_schema=strict_schema)
+      if key is not None:
+         found, rv = cache.ReadCache.instance.get(key)
+         if found:
+            return rv
+
+   # Read header data
+   md, src = _read_file(path, compression=compression, raw=lazy)
+
+   if checkpoint is not None:
+      checkpoint()
+
+   schema_type, encoding, strict_schema = _check_meta(path, md, schema_type=schema_type, ignore_meta=ignore_meta, strict_schema=strict_schema)
+
+   rv = None
+   if lazy:
+      rv = _lazy.read_string(src, md, schema_type, encoding, strict_schema, funcs)
+      if rv is None and not binary.is_binary(src):
+         src = "".join(_content_lines(cStringIO.StringIO(src)))
+   if rv is None:
+      rv = _read_string(src, schema_type, encoding, strict_schema, funcs, compiled=cache.CompiledCache.instance.enabled())
+
+   if _is_path(path):
+      rv = journal.replay(path, rv, md, names=funcs)
+
+   if checkpoint is not None:
+      checkpoint()
+
+   if key is not None:
+      cache.ReadCache.instance.add(key, rv, schema_type=schema_type)
+
+   return rv
+
+
+def read_many(paths, schema_type=None, workers=None, ignore_meta=False, strict_schema=None):
+   # Results are returned in input order, ReadManyError lists all files that failed
+   return parallel.read_many(paths, schema_type=schema_type, workers=workers, ignore_meta=ignore_meta, strict_schema=strict_schema)
+
+
+def scan_meta(root, pattern="*.das", workers=None, index=None):
+   # Returns metadata of all files matching pattern under root, read in a thread pool
+   # ReadManyError lists all files that failed
+   return scan.scan_meta(root, pattern=pattern, workers=workers, index=index)
+
+
+def iterread(path, schema_type=None, ignore_meta=False, strict_schema=None, compression=None, **funcs):
+   # Content is read in a single pass so that path may also be a stream
+   f = _compression.open(path, compression)
+   try:
+      if f.peek(len(binary.Magic)) == binary.Magic:
+         # Binary content is compact, only decoded elements need to be bounded
+         content = f.read()
+         md = binary.loads_meta(content)
+         lines = None
+      else:
+         content = None
+         md, l = _read_header(f)
+         lines = itertools.chain([l] if l else [], f)
+
+      schema_type, encoding, strict_schema = _check_meta(path, md, schema_type=schema_type, ignore_meta=ignore_meta, strict_schema=strict_schema)
+
+      seq = None
+      sch = _read_schema_type(schema_type, funcs)
+      if sch is not None:
+         seq = sch
+         while isinstance(seq, (schematypes.Optional, schematypes.SchemaType)):
+            seq = (seq.type if isinstance(seq, schematypes.Optional) else get_schema_type(seq.name))
+         if not isinstance(seq, schematypes.Sequence):
+            raise ValidationError("Expected a sequence schema type, got %s" % (get_schema_type_name(sch) or type(sch).__name__))
+   except:
+      f.close()
+      raise
+
+   return _iterread(f, content, lines, seq, encoding, strict_schema, funcs)
+
+
+def _iterread(f, content, lines, seq, encoding, strict_schema, funcs):
+   n = 0
+   with f:
+      if content is not None:
+         elements = binary.iterloads(content, names=funcs, encoding=encoding)
+      else:
+         elements = parser.iterparse(_content_lines(lines), names=funcs, encoding=encoding)
+      while True:
+         # Compatibility mode is a global switch, only keep it on while reading
+         with _CompatibilityMode(strict_schema):
+            try:
+               item = elements.next()
+            except StopIteration:
+               break
+            if seq is not None:
+               try:
+                  item = seq.type.validate(item)
+               except ValidationError, e:
+                  raise ValidationError("Invalid sequence element: %s" % e)
+         n += 1
+         yield item
+   if seq is not None:
+      # Size constraints can only be checked once all elements are read
+      seq._validate_self([None] * n)
 
 
 class _Placeholder(object):
@@ -922,109 +1175,16 @@ def _get_sorted_keys(d):
 
 
 def pprint(d, stream=None, indent="  ", depth=0, inline=False, eof=True, encoding=None):
+   # indent=None writes everything on a single line
    if stream is None:
       stream = sys.stdout
+   serializer.Serializer(stream, indent=indent, encoding=encoding).dump(d, depth=depth, inline=inline, eof=eof)
 
-   tindent = indent * depth
-
-   if not inline:
-      stream.write(tindent)
-
-   if isinstance(d, (dict, Struct)):
-      stream.write("{\n")
-      n = len(d)
-      i = 0
-      keys = _get_sorted_keys(d)
-      for k in keys:
-         stream.write("%s%s%s: " % (tindent, indent, repr(k)))
-         v = d[k]
-         pprint(v, stream, indent=indent, depth=depth+1, inline=True, eof=False, encoding=encoding)
-         i += 1
-         if i >= n:
-            stream.write("\n")
-         else:
-            stream.write(",\n")
-      stream.write("%s}" % tindent)
-
-   elif isinstance(d, list):
-      stream.write("[\n")
-      n = len(d)
-      i = 0
-      for v in d:
-         pprint(v, stream, indent=indent, depth=depth+1, inline=False, eof=False, encoding=encoding)
-         i += 1
-         if i >= n:
-            stream.write("\n")
-         else:
-            stream.write(",\n")
-      stream.write("%s]" % tindent)
-
-   elif isinstance(d, set):
-      stream.write("set([\n")
-      n = len(d)
-      i = 0
-      for v in d:
-         pprint(v, stream, indent=indent, depth=depth+1, inline=False, eof=False, encoding=encoding)
-         i += 1
-         if i >= n:
-            stream.write("\n")
-         else:
-            stream.write(",\n")
-      stream.write("%s])" % tindent)
-
-   elif isinstance(d, str):
-      try:
-         d.decode("ascii")
-      except Exception, e:
-         if not encoding:
-            raise Exception("Non-ascii string value found but no encoding provided (%s)." % e)
-         try:
-            stream.write(repr(d.decode(encoding)))
-         except Exception, e:
-            raise Exception("Non-ascii string value cannot be decoded to '%s' (%s)." % (encoding, e))
-      else:
-         # properly deal with multiline characters
-         # using repr here would solve the problem too but lead to less readable files
-         # -> line1\\nline1 -> eval -> line1\nline2
-         lines = d.split("\n")
-         nlines = len(lines)
-         if nlines > 1:
-            stream.write("'''")
-            for i in xrange(nlines):
-               stream.write(lines[i])
-               if i + 1 < nlines:
-                  stream.write("\n")
-            stream.write("'''")
-         else:
-            # stream.write("'%s'" % d)
-            stream.write(repr(d))
-
-   elif isinstance(d, unicode):
-      try:
-         s = d.encode("ascii")
-      except:
-         stream.write(repr(d))
-      else:
-         # see comment above
-         lines = s.split("\n")
-         nlines = len(lines)
-         if nlines > 1:
-            stream.write("'''")
-            for i in xrange(nlines):
-               stream.write(lines[i])
-               if i + 1 < nlines:
-                  stream.write("\n")
-            stream.write("'''")
-         else:
-            # stream.write("'%s'" % s)
-            stream.write(repr(s))
 
-   else:
-      # stream.write(str(d))
-      stream.write(repr(d))
-
-   if eof:
-      stream.write("\n")
+def digest(d, algorithm="sha1", cache=None):
+   # Canonical hash of d (hexadecimal string), computed without serializing d
+   # cache is an optional dictionary to keep digests of immutable values between calls
+   return hashing.Digester(algorithm=algorithm, cache=cache).hexdigest(d)
 
 
 class _CSVHeader(object):
@@ -1206,7 +1366,10 @@ def _dump_csv_data(k, d, valuetype, headers, parent=None, prefix=None):
       header.add_data(cv)
 
 
-def write(d, path, indent="  ", encoding=None):
+def _dumps(d, indent="  ", encoding=None, format="text", lazy=False):
+   if not format in ("text", "binary", "mapped"):
+      raise Exception("Unsupported das format '%s'" % format)
+
    d._validate()
 
    schema_type = d._get_schema_type()
@@ -1214,19 +1377,146 @@ def write(d, path, indent="  ", encoding=None):
    if encoding is None and schema_type:
       encoding = "utf8"
 
-   with open(path, "wb") as f:
-      if encoding is not None:
-         f.write("# encoding: %s\n" % encoding)
-      f.write("# version: %s\n" % __version__)
-      f.write("# author: %s\n" % os.environ["USER" if sys.platform != "win32" else "USERNAME"])
-      f.write("# date: %s\n" % datetime.datetime.now().strftime("%Y/%m/%d %H:%M:%S"))
-      if schema_type:
-         st = get_schema_type_name(schema_type)
-         f.write("# schema_type: %s\n" % st)
-         sn = get_schema(st)
-         if sn and sn.version is not None:
-            f.write("# schema_version: %s\n" % sn.version)
-      pprint(d, stream=f, indent=indent, encoding=encoding)
+   md = []
+   if encoding is not None:
+      md.append(("encoding", encoding))
+   md.append(("version", __version__))
+   md.append(("author", os.environ["USER" if sys.platform != "win32" else "USERNAME"]))
+   md.append(("date", datetime.datetime.now().strftime("%Y/%m/%d %H:%M:%S")))
+   if schema_type:
+      st = get_schema_type_name(schema_type)
+      md.append(("schema_type", st))
+      sn = get_schema(st)
+      if sn and sn.version is not None:
+         md.append(("schema_version", sn.version))
+
+   if format == "binary":
+      body = binary.dumps_body(d, encoding=encoding)
+   elif format == "mapped":
+      body = mapped.dumps_body(d, encoding=encoding)
+   else:
+      f = cStringIO.StringIO()
+      ser = serializer.Serializer(f, indent=indent, encoding=encoding)
+      if lazy and isinstance(d, Struct):
+         # Location of top level fields for lazy reads
+         fields = ser.dump_fields(d)
+         if fields and all([isinstance(k, basestring) and _lazy.FieldName.match(k) for k, _, _ in fields]):
+            md.append(("fields", ",".join(["%s=%d+%d" % x for x in fields])))
+      else:
+         ser.dump(d)
+      body = f.getvalue()
+
+   # Lets writers tell whether a file content changed from its header only
+   md.append(("digest", hashlib.sha1(body).hexdigest()))
+
+   if format == "binary":
+      return binary.dumps_header(md) + body
+   elif format == "mapped":
+      return binary.dumps_header(md, version=mapped.Version) + body
+   else:
+      return "".join(["# %s: %s\n" % (k, v) for k, v in md]) + body
+
+
+def _body(content):
+   if binary.is_binary(content):
+      return binary.body(content)
+   else:
+      return _read_file(buffer(content))[1]
+
+
+def _unchanged(path, content, compression=None):
+   # Compares content with the one of file at path, leaving out the header date and author
+   if not os.path.isfile(path) or os.path.isfile(journal.journal_path(path)):
+      return False
+   try:
+      with open(path, "rb") as f:
+         if _compression.from_magic(f.read(_compression.MagicSize)) != compression:
+            return False
+      md = read_meta(path)
+      newmd = read_meta(buffer(content))
+      for k in ("encoding", "schema_type", "schema_version"):
+         if md.get(k, None) != newmd.get(k, None):
+            return False
+      if "digest" in md:
+         return (md["digest"] == newmd["digest"])
+      # Written by an older version, compare bodies
+      with _compression.open(path) as f:
+         return (_body(f.read()) == _body(content))
+   except Exception:
+      return False
+
+
+def write(d, path, indent="  ", encoding=None, format="text", compression=None, only_if_changed=False, journal=None, lazy=False):
+   # compression is deduced from path extension when not specified
+   # With only_if_changed, an existing file with same content is left untouched
+   # With lazy, the location of top level Struct fields is recorded in file metadata so
+   # that das.read(path, lazy=True) doesn't need to scan the content for them
+   # journal is a list of (operation, key, value) records, das.cli style, describing
+   # the changes made to d since it was read from path: they are appended to a journal
+   # file next to path instead of rewriting it whole (see das.journal)
+   # Returns False when the file was not written
+   if journal is not None and _is_path(path):
+      return _journal.write(d, path, journal, indent=indent, encoding=encoding, format=format, compression=compression)
+   return _write(d, path, indent, encoding, format, compression, only_if_changed=only_if_changed, lazy=lazy)
+
+
+def awrite(d, path, indent="  ", encoding=None, format="text", compression=None, only_if_changed=False, executor=None, lazy=False):
+   # Returns a future like das.tasks.Task (or executor's own future type)
+   return tasks.submit(executor, _write, d, path, indent, encoding, format, compression, only_if_changed=only_if_changed, checkpoint=tasks.checkpoint, lazy=lazy)
+
+
+def _write(d, path, indent, encoding, format, compression, only_if_changed=False, checkpoint=None, lazy=False):
+   # path may also be a file like object or a bytearray
+   content = _dumps(d, indent=indent, encoding=encoding, format=format, lazy=lazy)
+   if compression is None and _is_path(path):
+      compression = _compression.from_extension(path)
+   if compression is not None and format == "mapped":
+      raise CompressionError("Mapped das files can't be compressed")
+   if only_if_changed and _is_path(path) and _unchanged(path, content, compression):
+      return False
+   if compression is not None:
+      content = _compression.compress(content, compression)
+   if checkpoint is not None:
+      # Last chance to cancel before the file is modified
+      checkpoint()
+   if hasattr(path, "write"):
+      path.write(content)
+   elif isinstance(path, bytearray):
+      path.extend(content)
+   elif format == "mapped":
+      # Other processes may have the file mapped, replace it rather than truncate it
+      tmppath = "%s.%d.tmp" % (path, os.getpid())
+      try:
+         with open(tmppath, "wb") as f:
+            f.write(content)
+         if sys.platform == "win32" and os.path.isfile(path):
+            os.remove(path)
+         os.rename(tmppath, path)
+      except:
+         if os.path.isfile(tmppath):
+            os.remove(tmppath)
+         raise
+      journal.remove(path)
+   else:
+      with open(path, "wb") as f:
+         f.write(content)
+      # Journal records applied to previous content
+      journal.remove(path)
+   return True
+
+
+def read_mapped(path, **funcs):
+   # Read only view of a file written with format="mapped": values are decoded from the
+   # file mapped in memory as they are accessed, dictionary fields are also available as
+   # attributes (see das.mapped)
+   # Use das.read to get validated das types instead
+   return mapped.open(path, **funcs)
+
+
+def write_many(items, indent="  ", encoding=None, format="text", compression=None, workers=None, fsync=False, only_if_changed=False):
+   # items: list of (data, path) tuples
+   # Returns the list of paths actually written
+   return parallel.write_many(items, indent=indent, encoding=encoding, format=format, compression=compression, workers=workers, fsync=fsync, only_if_changed=only_if_changed)
 
 
 def write_csv(data, path, alias=None, encoding=None, delimiter="\t", newline="\n"):
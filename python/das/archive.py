@@ -0,0 +1,333 @@
+from __future__ import absolute_import
+import os
+import sys
+import struct
+import marshal
+import __builtin__
+import das
+try:
+   import fcntl
+except ImportError:
+   fcntl = None
+   import msvcrt
+
+
+class ArchiveError(Exception):
+   def __init__(self, msg):
+      super(ArchiveError, self).__init__(msg)
+
+
+# File layout:
+#   Magic, version byte
+#   Records: kind byte, name size and content size (uint32), then name and content
+#     _DOCUMENT  content is a whole das file (text or binary, metadata included)
+#     _REMOVED   no content, previous document of the same name is removed
+#     _INDEX     content is the marshalled index of documents written before it
+#   Trailer: trailer magic and offset of last index record (uint64)
+#
+# Updates only append records, a new index and trailer being written by flush
+# Without a valid trailer (interrupted update), records are scanned to rebuild the index
+#
+# Archives opened for update hold an exclusive lock on a '.lock' file next to them until
+# closed, other writers wait for it (readers don't). The archive itself isn't locked as
+# compaction replaces it
+
+Magic = "\x89DASARC\n"
+Version = 1
+
+TrailerMagic = "\x89DASIDX"
+
+_DOCUMENT = "D"
+_REMOVED = "R"
+_INDEX = "I"
+
+_Record = struct.Struct("<cII")
+_Trailer = struct.Struct("<8sQ")
+
+# Archives are compacted on flush when the space used by replaced or removed
+# documents exceeds max(MinCompactSize, archive size * CompactRatio)
+MinCompactSize = 1 << 20
+CompactRatio = 0.5
+
+LockSuffix = ".lock"
+# Windows only: each msvcrt.locking attempt waits up to 10 seconds
+LockAttempts = 6
+
+
+def _lock(path):
+   f = __builtin__.open(path + LockSuffix, "ab")
+   try:
+      if fcntl is not None:
+         fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+      else:
+         f.seek(0)
+         for i in xrange(LockAttempts):
+            try:
+               msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)
+               break
+            except IOError:
+               # This attempt gave up after 10 seconds, try again
+               pass
+         else:
+            raise ArchiveError("Timed out waiting for lock on '%s'" % path)
+   except:
+      f.close()
+      raise
+   return f
+
+
+def _unlock(f):
+   try:
+      if fcntl is not None:
+         fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+      else:
+         f.seek(0)
+         msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+   finally:
+      f.close()
+
+
+class Archive(object):
+   # mode: "r" read only, "a" read and append (archive created if needed)
+   def __init__(self, path, mode="r"):
+      super(Archive, self).__init__()
+      if not mode in ("r", "a"):
+         raise ArchiveError("Invalid archive mode '%s'" % mode)
+      self.path = path
+      self.mode = mode
+      # name -> (content offset, content size)
+      self.index = {}
+      # Bytes used by replaced or removed documents and past indices
+      self.dead = 0
+      self.dirty = False
+      self.f = None
+      self.lock = None
+      try:
+         if mode == "a":
+            # Index is loaded once other writers are done
+            self.lock = _lock(path)
+            if not os.path.isfile(path):
+               with __builtin__.open(path, "wb") as f:
+                  f.write(Magic + chr(Version))
+         self.f = __builtin__.open(path, ("rb" if mode == "r" else "r+b"))
+         self._load()
+      except:
+         if self.f is not None:
+            self.f.close()
+            self.f = None
+         if self.lock is not None:
+            _unlock(self.lock)
+            self.lock = None
+         raise
+
+   def __enter__(self):
+      return self
+
+   def __exit__(self, type, value, traceback):
+      self.close()
+
+   def _load(self):
+      f = self.f
+      head = f.read(len(Magic) + 1)
+      if head[:len(Magic)] != Magic:
+         raise ArchiveError("'%s' is not a das archive" % self.path)
+      if ord(head[len(Magic):] or "\x00") != Version:
+         raise ArchiveError("Unsupported das archive version in '%s'" % self.path)
+      f.seek(0, 2)
+      size = f.tell()
+      self.end = None
+      if size >= len(head) + _Trailer.size:
+         f.seek(size - _Trailer.size)
+         magic, offset = _Trailer.unpack(f.read(_Trailer.size))
+         if magic == TrailerMagic and offset < size:
+            try:
+               f.seek(offset)
+               kind, nsize, csize = _Record.unpack(f.read(_Record.size))
+               if kind == _INDEX and offset + _Record.size + nsize + csize + _Trailer.size == size:
+                  f.seek(nsize, 1)
+                  self.index, self.dead = marshal.loads(f.read(csize))
+                  # Index is outdated by next update, which overwrites the trailer
+                  self.dead += _Record.size + nsize + csize
+                  self.end = size - _Trailer.size
+            except (struct.error, EOFError, ValueError, TypeError):
+               self.index, self.dead = {}, 0
+      if self.end is None:
+         self._scan(len(head), size)
+
+   def _scan(self, offset, size):
+      # Rebuild index from records, stopping at the first incomplete one
+      f = self.f
+      index = {}
+      dead = 0
+      f.seek(offset)
+      while offset + _Record.size <= size:
+         kind, nsize, csize = _Record.unpack(f.read(_Record.size))
+         if not kind in (_DOCUMENT, _REMOVED, _INDEX) or offset + _Record.size + nsize + csize > size:
+            break
+         name = f.read(nsize)
+         f.seek(csize, 1)
+         start = offset + _Record.size + nsize
+         if kind == _INDEX:
+            dead += _Record.size + nsize + csize
+         else:
+            old = index.pop(name, None)
+            if old is not None:
+               dead += _Record.size + len(name) + old[1]
+            if kind == _DOCUMENT:
+               index[name] = (start, csize)
+            else:
+               dead += _Record.size + nsize
+         offset = start + csize
+      self.index = index
+      self.dead = dead
+      # Anything past last complete record (or a trailer) is dropped on next update
+      self.end = offset
+
+   def _check_writable(self):
+      if self.f is None:
+         raise ArchiveError("Archive '%s' is closed" % self.path)
+      if self.mode != "a":
+         raise ArchiveError("Archive '%s' is opened read only" % self.path)
+
+   def _append(self, kind, name, content=""):
+      f = self.f
+      f.seek(self.end)
+      f.write(_Record.pack(kind, len(name), len(content)))
+      f.write(name)
+      f.write(content)
+      offset = self.end + _Record.size + len(name)
+      self.end = offset + len(content)
+      self.dirty = True
+      return offset
+
+   def _name(self, name):
+      if isinstance(name, unicode):
+         return name.encode("utf8")
+      elif isinstance(name, str):
+         return name
+      else:
+         raise ArchiveError("Document names must be strings, got %s" % type(name).__name__)
+
+   def names(self):
+      return sorted(self.index.keys())
+
+   def __len__(self):
+      return len(self.index)
+
+   def __contains__(self, name):
+      return (self._name(name) in self.index)
+
+   def __iter__(self):
+      return iter(self.names())
+
+   def content(self, name):
+      # Raw das content of a document
+      if self.f is None:
+         raise ArchiveError("Archive '%s' is closed" % self.path)
+      try:
+         offset, size = self.index[self._name(name)]
+      except KeyError:
+         raise ArchiveError("No document '%s' in archive '%s'" % (name, self.path))
+      self.f.seek(offset)
+      return self.f.read(size)
+
+   def read_meta(self, name):
+      return das.read_meta(buffer(self.content(name)))
+
+   def read(self, name, schema_type=None, ignore_meta=False, strict_schema=None, **funcs):
+      return das.read(buffer(self.content(name)), schema_type=schema_type, ignore_meta=ignore_meta, strict_schema=strict_schema, **funcs)
+
+   def iteritems(self, schema_type=None, ignore_meta=False, strict_schema=None, **funcs):
+      # Documents are read in file order
+      for offset, name in sorted([(v[0], k) for k, v in self.index.iteritems()]):
+         yield (name, self.read(name, schema_type=schema_type, ignore_meta=ignore_meta, strict_schema=strict_schema, **funcs))
+
+   def write(self, name, d, indent="  ", encoding=None, format="text"):
+      self._check_writable()
+      name = self._name(name)
+      content = das._dumps(d, indent=indent, encoding=encoding, format=format)
+      old = self.index.get(name, None)
+      self.index[name] = (self._append(_DOCUMENT, name, content), len(content))
+      if old is not None:
+         self.dead += _Record.size + len(name) + old[1]
+
+   def remove(self, name):
+      self._check_writable()
+      name = self._name(name)
+      old = self.index.pop(name, None)
+      if old is None:
+         raise ArchiveError("No document '%s' in archive '%s'" % (name, self.path))
+      self._append(_REMOVED, name)
+      self.dead += 2 * _Record.size + 2 * len(name) + old[1]
+
+   def flush(self):
+      # Makes updates visible to other readers of the archive, compacting it if needed
+      if self.f is None or self.mode != "a" or not self.dirty:
+         return
+      if self.dead > max(MinCompactSize, self.end * CompactRatio):
+         self.compact()
+         return
+      content = marshal.dumps((self.index, self.dead), 2)
+      offset = self.end
+      self._append(_INDEX, "", content)
+      # Next update overwrites the trailer
+      self.f.write(_Trailer.pack(TrailerMagic, offset))
+      self.f.truncate()
+      self.f.flush()
+      self.dead += _Record.size + len(content)
+      self.dirty = False
+
+   def compact(self):
+      # Rewrites the archive with live documents only
+      self._check_writable()
+      tmppath = "%s.%d.tmp" % (self.path, os.getpid())
+      index = {}
+      try:
+         with __builtin__.open(tmppath, "wb") as out:
+            out.write(Magic + chr(Version))
+            pos = len(Magic) + 1
+            for offset, name in sorted([(v[0], k) for k, v in self.index.iteritems()]):
+               content = self.content(name)
+               out.write(_Record.pack(_DOCUMENT, len(name), len(content)))
+               out.write(name)
+               out.write(content)
+               index[name] = (pos + _Record.size + len(name), len(content))
+               pos += _Record.size + len(name) + len(content)
+            content = marshal.dumps((index, 0), 2)
+            out.write(_Record.pack(_INDEX, 0, len(content)))
+            out.write(content)
+            out.write(_Trailer.pack(TrailerMagic, pos))
+         self.f.close()
+         self.f = None
+         if sys.platform == "win32":
+            os.remove(self.path)
+         os.rename(tmppath, self.path)
+      except:
+         if os.path.isfile(tmppath):
+            os.remove(tmppath)
+         raise
+      finally:
+         if self.f is None:
+            self.f = __builtin__.open(self.path, "r+b")
+      self.f.seek(0, 2)
+      self.index = index
+      self.dead = _Record.size + len(content)
+      self.end = self.f.tell() - _Trailer.size
+      self.dirty = False
+
+   def close(self):
+      try:
+         if self.f is not None:
+            try:
+               self.flush()
+            finally:
+               self.f.close()
+               self.f = None
+      finally:
+         if self.lock is not None:
+            _unlock(self.lock)
+            self.lock = None
+
+
+def open(path, mode="r"):
+   return Archive(path, mode=mode)
@@ -0,0 +1,301 @@
+from __future__ import absolute_import
+import os
+import sys
+import glob
+import struct
+import marshal
+import hashlib
+import threading
+import collections
+import das
+
+
+_Immutables = set([type(None), bool, int, long, float, complex, str, unicode])
+
+
+def _clone(d):
+   # Cached values are already validated, copy their structure without going
+   # through validation again (unlike das.copy)
+   if type(d) in _Immutables:
+      return d
+   elif isinstance(d, das.types.Struct):
+      rv = d.__class__()
+      rv._dict.update([(k, _clone(v)) for k, v in d._dict.iteritems()])
+   elif isinstance(d, list):
+      rv = d.__class__([_clone(x) for x in list.__iter__(d)])
+   elif isinstance(d, tuple):
+      rv = d.__class__([_clone(x) for x in tuple.__iter__(d)])
+   elif isinstance(d, set):
+      rv = d.__class__([_clone(x) for x in set.__iter__(d)])
+   elif isinstance(d, dict):
+      rv = d.__class__()
+      for k, v in dict.iteritems(d):
+         dict.__setitem__(rv, k, _clone(v))
+   elif isinstance(d, frozenset):
+      return d
+   elif hasattr(d, "copy") and callable(getattr(d, "copy")):
+      return d.copy()
+   else:
+      return d
+   if isinstance(d, das.types.TypeBase):
+      rv._set_schema_type(d._get_schema_type())
+   return rv
+
+
+def _sizeof(d):
+   # Approximate memory footprint of a read value
+   getsizeof = sys.getsizeof
+   size = 0
+   stack = [d]
+   while stack:
+      v = stack.pop()
+      size += getsizeof(v)
+      if type(v) in _Immutables:
+         continue
+      elif isinstance(v, das.types.Struct):
+         v = v._dict
+         size += getsizeof(v)
+      if isinstance(v, dict):
+         stack.extend(dict.iterkeys(v))
+         stack.extend(dict.itervalues(v))
+      elif isinstance(v, list):
+         stack.extend(list.__iter__(v))
+      elif isinstance(v, tuple):
+         stack.extend(tuple.__iter__(v))
+      elif isinstance(v, (set, frozenset)):
+         stack.extend(v)
+   return size
+
+
+class ReadCache(object):
+   instance = None
+
+   def __init__(self, max_size=0):
+      super(ReadCache, self).__init__()
+      if ReadCache.instance is not None:
+         raise Exception("ReadCache must be globally unique")
+      self.max_size = max_size
+      self.size = 0
+      self.hits = 0
+      self.misses = 0
+      # key -> (value, size, schema name, schema version)
+      self.entries = collections.OrderedDict()
+      # Reads may run on das.tasks executor threads
+      self.lock = threading.Lock()
+      ReadCache.instance = self
+
+   def enabled(self):
+      return (self.max_size > 0)
+
+   def set_max_size(self, max_size):
+      with self.lock:
+         self.max_size = max(0, max_size or 0)
+         self._evict()
+
+   def clear(self):
+      with self.lock:
+         self.entries.clear()
+         self.size = 0
+
+   def key(self, path, schema_type=None, ignore_meta=False, strict_schema=None):
+      if not isinstance(path, basestring):
+         # Streams and buffers
+         return None
+      if not isinstance(schema_type, basestring) and schema_type is not None:
+         schema_type = das.get_schema_type_name(schema_type)
+         if not schema_type:
+            # Unregistered type
+            return None
+      try:
+         st = os.stat(path)
+      except OSError:
+         return None
+      return (os.path.abspath(path), st.st_size, st.st_mtime, das.journal.stamp(path), schema_type, ignore_meta, strict_schema)
+
+   def get(self, key):
+      with self.lock:
+         entry = self.entries.pop(key, None)
+         if entry is not None:
+            value, _, sname, sversion = entry
+            if sname is None or self._schema_version(sname) == sversion:
+               self.entries[key] = entry
+               self.hits += 1
+            else:
+               self.size -= entry[1]
+               entry = None
+         if entry is None:
+            self.misses += 1
+            return (False, None)
+      # Cached values are never modified, clone them outside of the lock
+      return (True, _clone(value))
+
+   def add(self, key, value, schema_type=None):
+      if isinstance(schema_type, das.schematypes.TypeValidator):
+         schema_type = das.get_schema_type_name(schema_type)
+      size = _sizeof(value)
+      if size > self.max_size:
+         return
+      entry = (_clone(value), size, schema_type or None, self._schema_version(schema_type))
+      with self.lock:
+         old = self.entries.pop(key, None)
+         if old is not None:
+            self.size -= old[1]
+         self.entries[key] = entry
+         self.size += size
+         self._evict()
+
+   def _schema_version(self, schema_type):
+      try:
+         return (None if not schema_type else das.get_schema(schema_type).version)
+      except das.UnknownSchemaError:
+         return None
+
+   def _evict(self):
+      # Called with lock held
+      while self.entries and self.size > self.max_size:
+         _, entry = self.entries.popitem(last=False)
+         self.size -= entry[1]
+
+
+class CompiledCache(object):
+   instance = None
+
+   # File header: magic, marshalled data size and sha1 digest
+   #   marshal doesn't check its input, files are only loaded if intact
+   Magic = "DASC"
+   Header = struct.Struct("<4sI20s")
+
+   def __init__(self, path=None, max_size=0):
+      super(CompiledCache, self).__init__()
+      if CompiledCache.instance is not None:
+         raise Exception("CompiledCache must be globally unique")
+      self.path = path
+      self.max_size = max_size
+      # Bytes written since the directory was last pruned, None if never pruned
+      self.written = None
+      CompiledCache.instance = self
+
+   def enabled(self):
+      return bool(self.path)
+
+   def set_path(self, path):
+      self.path = path
+      self.written = None
+
+   def set_max_size(self, max_size):
+      self.max_size = max(0, max_size or 0)
+      self.written = None
+
+   def pack(self, value):
+      data = marshal.dumps(value, 2)
+      return self.Header.pack(self.Magic, len(data), hashlib.sha1(data).digest()) + data
+
+   def unpack(self, data):
+      if len(data) < self.Header.size:
+         return (False, None)
+      magic, size, digest = self.Header.unpack_from(data)
+      data = data[self.Header.size:]
+      if magic != self.Magic or size != len(data) or hashlib.sha1(data).digest() != digest:
+         return (False, None)
+      try:
+         return (True, marshal.loads(data))
+      except Exception:
+         return (False, None)
+
+   def filename(self, s, encoding=None, names=None):
+      # Files are named after their content so that a cache directory can be shared
+      # between hosts, whatever the location of the source files
+      h = hashlib.sha1("das %s marshal %d %s\n" % (das.__version__, marshal.version, encoding or ""))
+      for k in sorted(names or []):
+         v = names[k]
+         if hasattr(v, "__name__"):
+            v = "%s.%s" % (getattr(v, "__module__", ""), v.__name__)
+         else:
+            v = repr(v)
+         h.update("%s=%s\n" % (k, v))
+      h.update(s)
+      return os.path.join(self.path, h.hexdigest() + ".dasc")
+
+   def load(self, s, encoding=None, names=None):
+      path = self.filename(s, encoding=encoding, names=names)
+      try:
+         with open(path, "rb") as f:
+            data = f.read()
+      except IOError:
+         return (False, None)
+      rv = self.unpack(data)
+      if rv[0] and self.max_size > 0:
+         # Pruning removes least recently used files first
+         try:
+            os.utime(path, None)
+         except OSError:
+            pass
+      return rv
+
+   def store(self, s, value, encoding=None, names=None):
+      try:
+         data = self.pack(value)
+      except ValueError:
+         # Class instances and the like can't be cached
+         return False
+      path = self.filename(s, encoding=encoding, names=names)
+      tmppath = "%s.%d.tmp" % (path, os.getpid())
+      try:
+         if not os.path.isdir(self.path):
+            os.makedirs(self.path)
+         with open(tmppath, "wb") as f:
+            f.write(data)
+         os.rename(tmppath, path)
+      except (IOError, OSError), e:
+         if das.__verbose__:
+            das.print_once("[das] Failed to write compiled cache file '%s' (%s)" % (path, e))
+         try:
+            os.remove(tmppath)
+         except:
+            pass
+         return False
+      if self.max_size > 0:
+         # Listing the directory is only worth it once enough data was written
+         if self.written is None or self.written + len(data) >= self.max_size / 8:
+            self.prune()
+         else:
+            self.written += len(data)
+      return True
+
+   def prune(self):
+      # Remove least recently used files until the cache directory fits in max_size
+      self.written = 0
+      entries = []
+      for path in glob.glob(os.path.join(self.path, "*.dasc")):
+         try:
+            st = os.stat(path)
+         except OSError:
+            continue
+         entries.append((st.st_mtime, st.st_size, path))
+      size = sum([x[1] for x in entries])
+      entries.sort()
+      for _, fsize, path in entries:
+         if size <= self.max_size:
+            break
+         try:
+            os.remove(path)
+         except OSError:
+            # Already removed by another process
+            pass
+         size -= fsize
+
+
+_MaxSize = 0
+try:
+   _MaxSize = max(0, int(os.environ.get("DAS_READ_CACHE_SIZE", "0")))
+except:
+   pass
+
+_MaxCompiledSize = 1 << 28
+try:
+   _MaxCompiledSize = max(0, int(os.environ.get("DAS_COMPILED_CACHE_SIZE", str(_MaxCompiledSize))))
+except:
+   pass
+
+ReadCache(max_size=_MaxSize)
+CompiledCache(path=os.environ.get("DAS_COMPILED_CACHE_PATH", None), max_size=_MaxCompiledSize)
@@ -34,11 +34,6 @@ def _merge(field_parts):
    return o
 
 def _generic_do(data, key, val=None, attrfunc=None, subscriptfunc=None):
-   field = data
-
-   parts = _merge(key.split("."))
-   nparts = len(parts)
-
    novalue = (val is None)
    value = None
    if not novalue:
@@ -48,6 +43,14 @@ def _generic_do(data, key, val=None, attrfunc=None, subscriptfunc=None):
       except Exception, e:
          raise Exception("Invalid value %s: %s\n" % (val, e))
 
+   return _do(data, key, value, novalue, attrfunc=attrfunc, subscriptfunc=subscriptfunc)
+
+def _do(data, key, value, novalue, attrfunc=None, subscriptfunc=None):
+   field = data
+
+   parts = _merge(key.split("."))
+   nparts = len(parts)
+
    if not novalue and (attrfunc is None or subscriptfunc is None):
       raise Exception("'attrfunc' and 'subscriptfunc' functions must be provided")
 
@@ -86,14 +89,14 @@ def _generic_do(data, key, val=None, attrfunc=None, subscriptfunc=None):
          for j in xrange(nsubscripts):
             subscript = subscripts[j]
             lastsubscript = (j + 1 == nsubscripts)
-            if lastsubscript and subscriptfunc:
+            if last and lastsubscript and subscriptfunc:
                if novalue:
                   retval = subscriptfunc(field, subscript)
                else:
                   retval = subscriptfunc(field, subscript, value)
             else: 
                field = field[subscript]
-               if lastsubscript:
+               if last and lastsubscript:
                   retval = field
 
    return (field if len(parts) == 0 else retval)
@@ -142,3 +145,11 @@ def get(data, key):
 
 def eval(data, expr):
    return _pyeval(expr, globals(), {"data": data})
+
+# Same as above with actual values instead of strings
+
+def set_value(data, key, value):
+   _do(data, key, value, False, attrfunc=_attr_set, subscriptfunc=_subscript_set)
+
+def add_value(data, key, value):
+   _do(data, key, value, False, attrfunc=_attr_add, subscriptfunc=_subscript_add)
@@ -0,0 +1,588 @@
+import das
+
+
+# Schema types compile to functions of a single value equivalent to schema_type.validate(value)
+# Decisions that only depend on the schema type (aliases, optional and deprecated fields,
+# element types, referenced schema types, registered mixins) are made once at compile time
+#
+# Compiled functions are dropped whenever TypeValidator.Generation changes, that is when a
+# schema type attribute, property or the schema types registry is modified
+# Compatibility mode and types without a compiler here use TypeValidator._interpret
+#
+# Built containers are stamped with TypeValidator.Generation (TypeBase._validated), any
+# modification of a das object or its descendants clearing the stamp (TypeBase._dirty)
+# In reuse mode, das objects of the schema type being validated are not rebuilt:
+#   stamped objects are returned as is, others are validated in place and stamped
+
+_ValidationError = das.schematypes.ValidationError
+_Struct = das.schematypes.Struct
+_ValidateGlobally = das.types.TypeBase.ValidateGlobally
+_DynamicClasses = das.mixin._DynamicClasses
+_TypeBase = das.types.TypeBase
+_TypeValidator = das.schematypes.TypeValidator
+
+# In reuse mode, value is valid as is
+_Clean = object()
+
+# Classes of validation results without mixins bound
+_Plain = set([das.types.Struct, das.types.Sequence, das.types.Set, das.types.Tuple, das.types.Dict])
+
+
+def _mixins(t):
+   stn = das.get_schema_type_name(t)
+   if stn:
+      return das.get_registered_mixins(stn)
+   else:
+      return t.get_property("mixins", None)
+
+
+def _finalize(value, rv, mixins, plain):
+   # Same as TypeValidator._finalize with key and index being None
+   # plain: result was built by a compiled container function, its global validation would only
+   #        run the container checks again if no mixins are bound to it
+   if value.__class__.__name__ in _DynamicClasses:
+      das.mixin.bind(das.mixin.get_bound_mixins(value), rv, reset=True)
+   elif mixins and not rv.__class__.__name__ in _DynamicClasses:
+      das.mixin.bind(mixins, rv)
+   elif plain and rv.__class__ in _Plain:
+      return rv
+   return _ValidateGlobally(rv)
+
+
+class _Node(object):
+   # fn: compiled function
+   # plain: see _finalize
+   # typed: fn results are either scalars or das types (das.adapt_value does nothing on them)
+   def __init__(self, fn, plain, typed):
+      super(_Node, self).__init__()
+      self.fn = fn
+      self.plain = plain
+      self.typed = typed
+
+
+class _Compiler(object):
+   def __init__(self, reuse=False):
+      super(_Compiler, self).__init__()
+      self.reuse = reuse
+      # id(schema type) -> (schema type, _Node)
+      self.nodes = {}
+
+   def node(self, t):
+      entry = self.nodes.get(id(t), None)
+      if entry is not None:
+         return entry[1]
+      # Recursive schema types see a forwarding function until compiled
+      target = []
+      self.nodes[id(t)] = (t, _Node(lambda value: target[0](value), False, False))
+      compiler = getattr(self, "_" + type(t).__name__, None)
+      n = None
+      if compiler is not None and type(t) is getattr(das.schematypes, type(t).__name__, None):
+         n = compiler(t)
+      if n is None:
+         n = _Node(t._interpret, False, False)
+      target.append(n.fn)
+      self.nodes[id(t)] = (t, n)
+      return n
+
+   def inplace(self, t, value, mixins):
+      # Whether a container validates value in place rather than building a new one
+      if not self.reuse or not isinstance(value, _TypeBase) or value.__dict__["_schema_type"] is not t:
+         return False
+      if value.__dict__.get("_validated", None) == _TypeValidator.Generation:
+         return _Clean
+      # Registered mixins would be bound to a new container
+      return (not mixins or value.__class__.__name__ in _DynamicClasses)
+
+   def done(self, value, rv, mixins, inplace):
+      if inplace:
+         value._gvalidate(callback=False, changed=False)
+         rv = value
+      else:
+         rv = _finalize(value, rv, mixins, True)
+      rv.__dict__["_validated"] = _TypeValidator.Generation
+      return rv
+
+   def passthrough(self, value, rv, mixins, plain):
+      # Optional, Deprecated and SchemaType results
+      if self.reuse and rv is value and not mixins:
+         return rv
+      return _finalize(value, rv, mixins, plain)
+
+   def _leaf(self, t):
+      # Results are scalars that can't have mixins bound
+      if _mixins(t):
+         return None
+      return _Node(t._validate_self, True, True)
+
+   _Boolean = _leaf
+   _Integer = _leaf
+   _Real = _leaf
+   _String = _leaf
+   _Empty = _leaf
+
+   def _Sequence(self, t):
+      mixins = _mixins(t)
+      elem = self.node(t.type).fn
+      def validate(value):
+         if _Struct.CompatibilityMode:
+            return t._interpret(value)
+         inplace = self.inplace(t, value, mixins)
+         if inplace is _Clean:
+            return value
+         t._validate_self(value)
+         tmp = [None] * len(value)
+         for index, item in enumerate(value):
+            try:
+               tmp[index] = elem(item)
+            except _ValidationError, e:
+               raise _ValidationError("Invalid sequence element: %s" % e)
+         rv = das.types.Sequence(tmp)
+         rv._set_schema_type(t)
+         return self.done(value, rv, mixins, inplace)
+      return _Node(validate, True, True)
+
+   def _Set(self, t):
+      mixins = _mixins(t)
+      elem = self.node(t.type).fn
+      def validate(value):
+         if _Struct.CompatibilityMode:
+            return t._interpret(value)
+         inplace = self.inplace(t, value, mixins)
+         if inplace is _Clean:
+            return value
+         t._validate_self(value)
+         tmp = [None] * len(value)
+         i = 0
+         for item in value:
+            try:
+               tmp[i] = elem(item)
+            except _ValidationError, e:
+               raise _ValidationError("Invalid set element: %s" % e)
+            i += 1
+         rv = das.types.Set(tmp)
+         rv._set_schema_type(t)
+         return self.done(value, rv, mixins, inplace)
+      return _Node(validate, True, True)
+
+   def _Tuple(self, t):
+      mixins = _mixins(t)
+      elems = [self.node(x).fn for x in t.types]
+      def validate(value):
+         if _Struct.CompatibilityMode:
+            return t._interpret(value)
+         inplace = self.inplace(t, value, mixins)
+         if inplace is _Clean:
+            return value
+         t._validate_self(value)
+         tmp = [None] * len(value)
+         for i, elem in enumerate(elems):
+            try:
+               tmp[i] = elem(value[i])
+            except _ValidationError, e:
+               raise _ValidationError("Invalid tuple element: %s" % e)
+         rv = das.types.Tuple(tmp)
+         rv._set_schema_type(t)
+         return self.done(value, rv, mixins, inplace)
+      return _Node(validate, True, True)
+
+   def _Dict(self, t):
+      mixins = _mixins(t)
+      key = self.node(t.ktype).fn
+      vnode = self.node(t.vtype)
+      overrides = dict([(k, self.node(v)) for k, v in t.vtypeOverrides.iteritems()])
+      typed = (vnode.typed and all([n.typed for n in overrides.itervalues()]))
+      def validate(value):
+         if _Struct.CompatibilityMode:
+            return t._interpret(value)
+         inplace = self.inplace(t, value, mixins)
+         if inplace is _Clean:
+            return value
+         t._validate_self(value)
+         rv = das.types.Dict()
+         for k in value:
+            try:
+               ak = key(k)
+            except _ValidationError, e:
+               raise _ValidationError("Invalid key value '%s': %s" % (k, e))
+            try:
+               sk = str(ak)
+               vv = overrides.get(sk, vnode).fn(value[k])
+               if typed:
+                  dict.__setitem__(rv, ak, vv)
+               else:
+                  rv[ak] = vv
+            except _ValidationError, e:
+               raise _ValidationError("Invalid value for key '%s': %s" % (k, e))
+         rv._set_schema_type(t)
+         return self.done(value, rv, mixins, inplace)
+      return _Node(validate, True, True)
+
+   def _Struct(self, t):
+      mixins = _mixins(t)
+      Alias = das.schematypes.Alias
+      Optional = das.schematypes.Optional
+      Deprecated = das.schematypes.Deprecated
+      aliases = bool(t._aliases)
+      names = frozenset(t.keys())
+      required = []
+      # (key, function, optional, direct, deprecation message)
+      # function is None for aliases, message being printed when the alias is used
+      fields = []
+      for k, v in t.iteritems():
+         deprecated = isinstance(v, Deprecated)
+         aliasname = Alias.Name(v)
+         if aliasname is not None:
+            if deprecated:
+               fields.append((k, None, True, False, "[das] Field %s is deprecated, use %s instead" % (repr(k), repr(aliasname))))
+            continue
+         optional = isinstance(v, Optional)
+         if not optional:
+            required.append(k)
+         n = self.node(v)
+         # Fields that das.types.Struct.__setitem__ would neither rename, reject nor adapt
+         direct = (n.typed and not hasattr(das.types.Struct, k) and not hasattr({}, k))
+         message = None
+         if deprecated:
+            message = ("[das] Field %s is deprecated" % repr(k) if not v.message else v.message)
+         fields.append((k, n.fn, optional, direct, message))
+      aliaswarnings = any([fn is None for _, fn, _, _, _ in fields])
+      def validate(value):
+         if _Struct.CompatibilityMode:
+            return t._interpret(value)
+         inplace = self.inplace(t, value, mixins)
+         if inplace is _Clean:
+            return value
+         if aliases or not isinstance(value, dict):
+            t._validate_self(value)
+         else:
+            for k in required:
+               if not k in value:
+                  raise _ValidationError("Missing key '%s'" % k)
+            for k in value:
+               if not k in names:
+                  raise _ValidationError("Unknown key '%s'" % k)
+         actualkeys = (set([item for item in value]) if aliaswarnings else None)
+         rv = das.types.Struct()
+         rvd = rv._dict
+         for k, fn, optional, direct, message in fields:
+            if fn is None:
+               if k in actualkeys:
+                  das.print_once(message)
+               continue
+            try:
+               vv = fn(value[k])
+               if vv is not None and message is not None:
+                  das.print_once(message)
+               if direct:
+                  rvd[k] = vv
+               else:
+                  rv[k] = vv
+            except KeyError, e:
+               if not optional:
+                  raise _ValidationError("Invalid value for key '%s': %s" % (k, e))
+            except _ValidationError, e:
+               raise _ValidationError("Invalid value for key '%s': %s" % (k, e))
+         rv._set_schema_type(t)
+         return self.done(value, rv, mixins, inplace)
+      # A '_validate_globally' field would be seen as a global validation method
+      return _Node(validate, not "_validate_globally" in names, True)
+
+   def _Or(self, t):
+      mixins = _mixins(t)
+      nodes = [self.node(x) for x in t.types]
+      fns = [n.fn for n in nodes]
+      plain = all([n.plain for n in nodes])
+      def validate(value):
+         if _Struct.CompatibilityMode:
+            return t._interpret(value)
+         rv = t._first(value, t._candidates(value), lambda i: fns[i](value))
+         return self.passthrough(value, rv, mixins, plain)
+      return _Node(validate, plain, all([n.typed for n in nodes]))
+
+   def _Optional(self, t):
+      mixins = _mixins(t)
+      n = self.node(t.type)
+      fn = n.fn
+      plain = n.plain
+      def validate(value):
+         if _Struct.CompatibilityMode:
+            return t._interpret(value)
+         return self.passthrough(value, fn(value), mixins, plain)
+      return _Node(validate, plain, n.typed)
+
+   def _Deprecated(self, t):
+      mixins = _mixins(t)
+      n = self.node(t.type)
+      fn = n.fn
+      plain = n.plain
+      def validate(value):
+         if _Struct.CompatibilityMode:
+            return t._interpret(value)
+         return self.passthrough(value, (True if value is None else fn(value)), mixins, plain)
+      return _Node(validate, plain, n.typed)
+
+   def _SchemaType(self, t):
+      try:
+         st = das.get_schema_type(t.name)
+      except das.UnknownSchemaError:
+         # Reported at validation time
+         return None
+      mixins = _mixins(t)
+      n = self.node(st)
+      fn = n.fn
+      plain = n.plain
+      def validate(value):
+         if _Struct.CompatibilityMode:
+            return t._interpret(value)
+         return self.passthrough(value, fn(value), mixins, plain)
+      return _Node(validate, plain, n.typed)
+
+
+def compile(schema_type, reuse=False):
+   return _Compiler(reuse=reuse).node(schema_type).fn
+
+
+# Matchers are predicates telling whether validation of a value succeeds without raising
+# (as das.check and das.is_compatible do on a copy of value), checking value as is:
+#   nothing is built, copied or modified and no error message is formatted
+# Types whose validation runs global validation (mixins), modifies value (Struct aliases)
+# or may fail building its result fall back to validating a copy
+
+_Leaves = (das.schematypes.Boolean, das.schematypes.Integer, das.schematypes.Real, das.schematypes.String, das.schematypes.Empty)
+
+
+def _validates(t, hooks):
+   # hooks: t.validate is used, t._validate otherwise (no mixins bound, no global validation)
+   def matches(value):
+      try:
+         if hooks:
+            t.validate(das.copy(value))
+         else:
+            t._validate(das.copy(value))
+         return True
+      except:
+         return False
+   return matches
+
+
+def _string(value):
+   # das.ascii_or_unicode without exception, None for invalid strings
+   if isinstance(value, str):
+      try:
+         value.decode("ascii")
+      except UnicodeDecodeError:
+         return None
+      return value
+   elif isinstance(value, unicode):
+      return value
+   return None
+
+
+class _Matcher(object):
+   def __init__(self):
+      super(_Matcher, self).__init__()
+      # id(schema type) -> (schema type, matcher)
+      self.nodes = {}
+
+   def node(self, t):
+      entry = self.nodes.get(id(t), None)
+      if entry is not None:
+         return entry[1]
+      target = []
+      self.nodes[id(t)] = (t, lambda value: target[0](value))
+      fn = self.build(t, True)
+      target.append(fn)
+      self.nodes[id(t)] = (t, fn)
+      return fn
+
+   def build(self, t, hooks):
+      slow = _validates(t, hooks)
+      builder = getattr(self, "_" + type(t).__name__, None)
+      if builder is None or type(t) is not getattr(das.schematypes, type(t).__name__, None):
+         return slow
+      if hooks and _mixins(t):
+         return slow
+      fn = builder(t)
+      if fn is None:
+         return slow
+      if hooks and not isinstance(t, _Leaves):
+         # Mixins bound to value are bound to the validation result too
+         def matches(value):
+            if value.__class__.__name__ in _DynamicClasses:
+               return slow(value)
+            return fn(value)
+         return matches
+      return fn
+
+   def _Boolean(self, t):
+      def matches(value):
+         if isinstance(value, bool):
+            return True
+         return (isinstance(value, basestring) and (t.TrueExp.match(value) is not None or t.FalseExp.match(value) is not None))
+      return matches
+
+   def _Integer(self, t):
+      def matches(value):
+         if t.enum is not None:
+            if isinstance(value, basestring):
+               v = _string(value)
+               if v is None or not v in t.enum:
+                  return False
+               value = t.enum[v]
+            elif isinstance(value, (int, long)):
+               if not value in t.enumvals:
+                  return False
+         if not isinstance(value, (int, long)):
+            return False
+         if t.enum is None:
+            if t.min is not None and value < t.min:
+               return False
+            if t.max is not None and value > t.max:
+               return False
+         return True
+      return matches
+
+   def _Real(self, t):
+      def matches(value):
+         if not isinstance(value, (int, long, float)):
+            return False
+         if t.min is not None and value < t.min:
+            return False
+         if t.max is not None and value > t.max:
+            return False
+         return True
+      return matches
+
+   def _String(self, t):
+      if t.choices is not None and t.strict and callable(t.choices):
+         # Choices may not be valid strings
+         return None
+      def matches(value):
+         v = _string(value)
+         if v is None:
+            return False
+         if t.choices is not None and t.strict and not v in t.choices:
+            return False
+         if t.matches is not None and not t.matches.match(v):
+            return False
+         return True
+      return matches
+
+   def _Empty(self, t):
+      return (lambda value: value is None)
+
+   def _Sequence(self, t):
+      elem = self.node(t.type)
+      def matches(value):
+         if not isinstance(value, (tuple, list, set)):
+            return False
+         n = len(value)
+         if t.size is not None:
+            if n != t.size:
+               return False
+         else:
+            if t.min_size is not None and n < t.min_size:
+               return False
+            if t.max_size is not None and n > t.max_size:
+               return False
+         for item in value:
+            if not elem(item):
+               return False
+         return True
+      return matches
+
+   def _Set(self, t):
+      # Other elements may not be hashable once validated
+      if not type(t.type) in _Leaves:
+         return None
+      elem = self.node(t.type)
+      def matches(value):
+         if not isinstance(value, (tuple, list, set)):
+            return False
+         for item in value:
+            if not elem(item):
+               return False
+         return True
+      return matches
+
+   def _Tuple(self, t):
+      elems = [self.node(x) for x in t.types]
+      n = len(elems)
+      def matches(value):
+         if not isinstance(value, (list, tuple)) or len(value) != n:
+            return False
+         for i in xrange(n):
+            if not elems[i](value[i]):
+               return False
+         return True
+      return matches
+
+   def _Dict(self, t):
+      # Overrides depend on validated keys
+      if t.vtypeOverrides or not type(t.ktype) in _Leaves:
+         return None
+      key = self.node(t.ktype)
+      val = self.node(t.vtype)
+      def matches(value):
+         if not isinstance(value, (dict, das.types.Struct)):
+            return False
+         for k in value:
+            if not key(k) or not val(value[k]):
+               return False
+         return True
+      return matches
+
+   def _Struct(self, t):
+      names = frozenset(t.keys())
+      if t._aliases or "_validate_globally" in names:
+         return None
+      # Field names das.types.Struct may rename or reject
+      if any([hasattr(das.types.Struct, k) or hasattr({}, k) for k in names]):
+         return None
+      Optional = das.schematypes.Optional
+      fields = [(k, self.node(v), isinstance(v, Optional)) for k, v in t.iteritems()]
+      def matches(value):
+         if not isinstance(value, (dict, das.types.Struct)):
+            return False
+         for k, fn, optional in fields:
+            if k in value:
+               if not fn(value[k]):
+                  return False
+            elif not optional:
+               return False
+         for k in value:
+            if not k in names:
+               return False
+         return True
+      return matches
+
+   def _Or(self, t):
+      fns = [self.node(x) for x in t.types]
+      def matches(value):
+         for i in t._candidates(value):
+            if fns[i](value):
+               return True
+         return False
+      return matches
+
+   def _Optional(self, t):
+      return self.node(t.type)
+
+   def _Deprecated(self, t):
+      fn = self.node(t.type)
+      return (lambda value: value is None or fn(value))
+
+   def _SchemaType(self, t):
+      try:
+         st = das.get_schema_type(t.name)
+      except das.UnknownSchemaError:
+         return None
+      return self.node(st)
+
+
+def matcher(schema_type, hooks=True):
+   # hooks: match schema_type.validate, schema_type._validate otherwise (see _validates)
+   if hooks:
+      return _Matcher().node(schema_type)
+   else:
+      return _Matcher().build(schema_type, False)
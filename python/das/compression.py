@@ -0,0 +1,215 @@
+import os
+import bz2
+import __builtin__
+import zlib
+import gzip
+import cStringIO
+try:
+   import lzma
+except ImportError:
+   try:
+      from backports import lzma
+   except ImportError:
+      lzma = None
+
+
+class CompressionError(Exception):
+   def __init__(self, msg):
+      super(CompressionError, self).__init__(msg)
+
+
+# name -> (magic bytes, file extensions)
+Formats = {"gzip": ("\x1f\x8b", (".gz", ".gzip")),
+           "bz2": ("BZh", (".bz2",)),
+           "xz": ("\xfd7zXZ\x00", (".xz",))}
+
+MagicSize = max([len(x[0]) for x in Formats.values()])
+
+
+def _check(compression):
+   if not compression in Formats:
+      raise CompressionError("Unsupported compression '%s'" % compression)
+   if compression == "xz" and lzma is None:
+      raise CompressionError("xz compression requires the 'lzma' module ('backports.lzma' on python 2)")
+
+
+def available():
+   return sorted([x for x in Formats if x != "xz" or lzma is not None])
+
+
+def from_extension(path):
+   ext = os.path.splitext(path)[1].lower()
+   for name, (_, exts) in Formats.iteritems():
+      if ext in exts:
+         return name
+   return None
+
+
+def from_magic(s):
+   for name, (magic, _) in Formats.iteritems():
+      if s.startswith(magic):
+         return name
+   return None
+
+
+ChunkSize = 1 << 20
+
+
+class _Stream(object):
+   # Read only file object over a sequence of string chunks
+   def __init__(self, chunks, f=None):
+      super(_Stream, self).__init__()
+      self.chunks = iter(chunks)
+      # File object owned by the stream, closed with it
+      self.f = f
+      self.buf = ""
+      self.pos = 0
+
+   def __enter__(self):
+      return self
+
+   def __exit__(self, type, value, traceback):
+      self.close()
+
+   def __iter__(self):
+      while True:
+         l = self.readline()
+         if not l:
+            break
+         yield l
+
+   def close(self):
+      if self.f is not None:
+         self.f.close()
+         self.f = None
+
+   def _more(self):
+      for data in self.chunks:
+         if data:
+            self.buf = self.buf[self.pos:] + data
+            self.pos = 0
+            return True
+      return False
+
+   def peek(self, n):
+      while len(self.buf) - self.pos < n and self._more():
+         pass
+      return self.buf[self.pos:self.pos + n]
+
+   def read(self, n=-1):
+      if n is None or n < 0:
+         rv = [self.buf[self.pos:]]
+         rv.extend(self.chunks)
+         self.buf = ""
+         self.pos = 0
+         return "".join(rv)
+      rv = self.peek(n)
+      self.pos += len(rv)
+      return rv
+
+   def readline(self):
+      while True:
+         i = self.buf.find("\n", self.pos)
+         if i >= 0:
+            rv = self.buf[self.pos:i + 1]
+            self.pos = i + 1
+            return rv
+         if not self._more():
+            rv = self.buf[self.pos:]
+            self.buf = ""
+            self.pos = 0
+            return rv
+
+
+def _chunks(f, size=ChunkSize):
+   while True:
+      data = f.read(size)
+      if not data:
+         break
+      yield data
+
+
+def _decompressor(compression):
+   if compression == "gzip":
+      return zlib.decompressobj(16 + zlib.MAX_WBITS)
+   elif compression == "bz2":
+      return bz2.BZ2Decompressor()
+   else:
+      return lzma.LZMADecompressor()
+
+
+def _ended(d):
+   if hasattr(d, "eof"):
+      return d.eof
+   # Data passed a complete stream is left unused (or rejected by bz2)
+   try:
+      d.decompress("\x00")
+   except EOFError:
+      return True
+   except (IOError, zlib.error):
+      return False
+   return (d.unused_data != "")
+
+
+def _decompressed(chunks, compression):
+   d = _decompressor(compression)
+   for data in chunks:
+      while data:
+         try:
+            yield d.decompress(data)
+            data = d.unused_data
+         except EOFError:
+            # Previous stream ended right at the end of previous chunk
+            pass
+         if data:
+            # Concatenated streams
+            d = _decompressor(compression)
+   if not _ended(d):
+      raise CompressionError("Truncated %s data" % compression)
+
+
+def open(source, compression=None, chunk_size=ChunkSize):
+   # Returns a read only file object over (decompressed) content of source, either
+   # a path, a file like object or a byte buffer
+   # compression is detected from the first bytes of content when not specified
+   # chunk_size is the size of reads on source, keep it small to only read the beginning
+   f = None
+   if hasattr(source, "read"):
+      chunks = _chunks(source, chunk_size)
+   elif isinstance(source, memoryview):
+      chunks = [source.tobytes()]
+   elif isinstance(source, (bytearray, buffer)):
+      chunks = [str(source)]
+   else:
+      f = __builtin__.open(source, "rb")
+      chunks = _chunks(f, chunk_size)
+   rv = _Stream(chunks, f)
+   if compression is None:
+      compression = from_magic(rv.peek(MagicSize))
+      if compression is None:
+         return rv
+   try:
+      _check(compression)
+   except:
+      rv.close()
+      raise
+   return _Stream(_decompressed(_chunks(rv, chunk_size), compression), f)
+
+
+def compress(data, compression, level=9):
+   _check(compression)
+   if compression == "gzip":
+      s = cStringIO.StringIO()
+      # No file name nor time stamp so that same contents give same bytes
+      with gzip.GzipFile(filename="", mode="wb", compresslevel=level, fileobj=s, mtime=0) as f:
+         f.write(data)
+      return s.getvalue()
+   elif compression == "bz2":
+      return bz2.compress(data, level)
+   else:
+      return lzma.compress(data, preset=min(level, 9))
+
+
+def decompress(data, compression=None):
+   with open(buffer(data), compression) as f:
+      return f.read()
@@ -0,0 +1,287 @@
+import hashlib
+import das
+
+
+# Canonical encoding fed to the hash:
+#   None, True, False    N, T, F
+#   int, long            i<decimal>;
+#   float                f<repr>;
+#   str, unicode         s<size>:<bytes> (unicode as utf8 so that equal strings hash the same)
+#   list                 L<count>:<values>
+#   dict, Struct         D<count>:<key><value>... (Struct fields in schema order, other keys sorted)
+#   tuple                U<count>:<values>
+#   set, frozenset       S<count>:<sorted encoded values>
+#   other objects        R<size>:<repr>
+# Encodings of immutable tuples and frozensets can be cached
+
+# Chunks buffered before updating the hash
+_FlushChunks = 4096
+
+_Immutables = set([type(None), bool, int, long, float, complex, str, unicode])
+
+_StructOrderedKeys = das.types.Struct.ordered_keys.im_func
+
+
+def _str(d):
+   return "s%d:%s" % (len(d), d)
+
+
+def _unicode(d):
+   d = d.encode("utf8")
+   return "s%d:%s" % (len(d), d)
+
+
+def _int(d):
+   return "i%d;" % d
+
+
+def _float(d):
+   return "f%r;" % d
+
+
+def _none(d):
+   return "N"
+
+
+def _bool(d):
+   return ("T" if d else "F")
+
+
+# Encoders of simple values by exact type, looked up once per value
+_Scalars = {str: _str,
+            unicode: _unicode,
+            int: _int,
+            long: _int,
+            float: _float,
+            type(None): _none,
+            bool: _bool}
+
+
+def _scalar(d):
+   # Encoding of simple values, None for anything else
+   enc = _Scalars.get(type(d), None)
+   return (None if enc is None else enc(d))
+
+
+# Nesting level up to which containers are encoded inline by generated functions
+_MaxInlineDepth = 3
+
+
+class _Generator(das.serializer._CodeGenerator):
+   # Emits code encoding Struct values of a given schema type with constant keys and
+   # no per value type dispatch, like das.serializer does for writing, falling back
+   # to Digester._feed for values that don't match their declared type
+
+   def expr(self, t, x):
+      # Encoding of x as an expression
+      t = das.serializer._resolve(t)
+      if isinstance(t, das.schematypes.String):
+         return "('s%%d:%%s' %% (len(%s), %s) if type(%s) is str else dg._encode(%s))" % (x, x, x, x)
+      elif isinstance(t, das.schematypes.Boolean):
+         return "('T' if %s is True else ('F' if %s is False else dg._encode(%s)))" % (x, x, x)
+      elif isinstance(t, das.schematypes.Integer):
+         return "('i%%d;' %% %s if type(%s) is long or type(%s) is int else dg._encode(%s))" % (x, x, x, x)
+      elif isinstance(t, das.schematypes.Real):
+         return "('f%%r;' %% %s if type(%s) is float else dg._encode(%s))" % (x, x, x)
+      else:
+         return "dg._encode(%s)" % x
+
+   def value(self, level, t, v, depth):
+      t = das.serializer._resolve(t)
+      if isinstance(t, das.schematypes.Tuple):
+         n = len(t.types)
+         self.emit(level, "if isinstance(%s, tuple) and len(%s) == %d:" % (v, v, n))
+         self.emit(level + 1, "if dg.cache is None:")
+         es = [self.var("e") for i in xrange(n)]
+         if n:
+            self.emit(level + 2, "%s%s = tuple.__iter__(%s)" % (", ".join(es), ("," if n == 1 else ""), v))
+         self.emit(level + 2, "append(%s)" % " + ".join([repr("U%d:" % n)] + [self.expr(t.types[i], es[i]) for i in xrange(n)]))
+         self.emit(level + 1, "else:")
+         self.emit(level + 2, "append(dg._cached(%s, dg._tuple))" % v)
+         self.emit(level, "else:")
+         self.emit(level + 1, "dg._feed(%s, out, h)" % v)
+      elif isinstance(t, das.schematypes.Set):
+         # Mutable sets are never cached
+         e = self.var("e")
+         self.emit(level, "if isinstance(%s, set):" % v)
+         self.emit(level + 1, "append('S%%d:%%s' %% (len(%s), ''.join(sorted([%s for %s in set.__iter__(%s)]))))" % (v, self.expr(t.type, e), e, v))
+         self.emit(level, "else:")
+         self.emit(level + 1, "dg._feed(%s, out, h)" % v)
+      elif depth < _MaxInlineDepth and isinstance(t, das.schematypes.Sequence):
+         e = self.var("e")
+         self.emit(level, "if isinstance(%s, list):" % v)
+         self.emit(level + 1, "append('L%%d:' %% len(%s))" % v)
+         self.emit(level + 1, "for %s in list.__iter__(%s):" % (e, v))
+         self.value(level + 2, t.type, e, depth + 1)
+         self.emit(level, "else:")
+         self.emit(level + 1, "dg._feed(%s, out, h)" % v)
+      elif isinstance(t, (das.schematypes.String, das.schematypes.Boolean, das.schematypes.Integer, das.schematypes.Real)):
+         self.emit(level, "append(%s)" % self.expr(t, v))
+      else:
+         self.emit(level, "dg._feed(%s, out, h)" % v)
+
+   def generate(self, st):
+      # Only Struct values whose keys are all fields of st are handled
+      order = st.ordered_keys()
+      for k in order:
+         if _scalar(k) is None:
+            return None
+      self.emit(0, "def feed(dg, d, out, h):")
+      self.struct_layout(order, True)
+      self.emit(1, "append = out.append")
+      self.emit(1, "append('D%d:' % left)")
+      for k, t, v in self.struct_fields(st, order):
+         self.emit(2, "append(%s)" % repr(_scalar(k)))
+         self.value(2, t, v, 1)
+      self.emit(1, "return True")
+      return self.build(st, "feed", {})
+
+
+def _feeder(d):
+   # Returns a function encoding Struct value d or None, the function itself returns
+   # False when d doesn't match the layout it was generated for
+   st = d._get_schema_type()
+   if not isinstance(st, das.schematypes.Struct):
+      return None
+   # False when no function can be generated
+   return (st._compiled_function("digest", lambda: _Generator().generate(st) or False, load=False) or None)
+
+
+def _immutable(d):
+   if type(d) in _Immutables:
+      return True
+   elif isinstance(d, (tuple, frozenset)):
+      for x in (tuple.__iter__(d) if isinstance(d, tuple) else d):
+         if not _immutable(x):
+            return False
+      return True
+   else:
+      return False
+
+
+class Digester(object):
+   # cache: dictionary keeping encodings of immutable tuples and frozensets between calls
+   #   id(value) -> (value, encoding)
+   def __init__(self, algorithm="sha1", cache=None):
+      super(Digester, self).__init__()
+      hashlib.new(algorithm)
+      self.algorithm = algorithm
+      self.cache = cache
+
+   def digest(self, d):
+      h = hashlib.new(self.algorithm)
+      out = []
+      self._feed(d, out, h)
+      h.update("".join(out))
+      return h.digest()
+
+   def hexdigest(self, d):
+      return self.digest(d).encode("hex")
+
+   def _encode(self, d):
+      enc = _Scalars.get(type(d), None)
+      if enc is not None:
+         return enc(d)
+      out = []
+      self._feed(d, out, None)
+      return "".join(out)
+
+   def _encode_all(self, values):
+      get = _Scalars.get
+      rv = []
+      append = rv.append
+      for x in values:
+         enc = get(type(x), None)
+         append(self._encode(x) if enc is None else enc(x))
+      return rv
+
+   def _tuple(self, d):
+      return "U%d:%s" % (len(d), "".join(self._encode_all(tuple.__iter__(d))))
+
+   def _set(self, d):
+      return "S%d:%s" % (len(d), "".join(sorted(self._encode_all(set.__iter__(d) if isinstance(d, set) else d))))
+
+   def _field_keys(self, st, order):
+      # Encoded field names, kept on the schema type
+      return st._compiled_function("digest_keys", lambda: dict([(k, self._encode(k)) for k in order]), load=False)
+
+   def _cached(self, d, fn):
+      cache = self.cache
+      if cache is None:
+         return fn(d)
+      entry = cache.get(id(d), None)
+      if entry is not None and entry[0] is d:
+         return entry[1]
+      rv = fn(d)
+      if _immutable(d):
+         cache[id(d)] = (d, rv)
+      return rv
+
+   def _struct_keys(self, d):
+      dd = d._dict
+      if type(d).ordered_keys.im_func is not _StructOrderedKeys:
+         # Overridden by a mixin
+         keys = [(self._encode(k), k) for k in d.ordered_keys() if k in dd]
+      else:
+         st = d._get_schema_type()
+         if hasattr(st, "ordered_keys"):
+            order = st.ordered_keys()
+            fkeys = self._field_keys(st, order)
+            keys = [(fkeys[k], k) for k in order if k in dd]
+         else:
+            keys = []
+      if len(keys) != len(dd):
+         used = set([k for _, k in keys])
+         keys += sorted([(self._encode(k), k) for k in dd if not k in used])
+      return keys
+
+   def _feed(self, d, out, h):
+      append = out.append
+      get = _Scalars.get
+      if isinstance(d, das.types.Struct):
+         feed = _feeder(d)
+         if feed is not None and feed(self, d, out, h):
+            if h is not None and len(out) > _FlushChunks:
+               h.update("".join(out))
+               del(out[:])
+            return
+         dd = d._dict
+         keys = self._struct_keys(d)
+         append("D%d:" % len(keys))
+         for key, k in keys:
+            append(key)
+            v = dd[k]
+            enc = get(type(v), None)
+            if enc is None:
+               self._feed(v, out, h)
+            else:
+               append(enc(v))
+      elif isinstance(d, dict):
+         append("D%d:" % len(d))
+         for key, k in sorted([(self._encode(k), k) for k in dict.iterkeys(d)]):
+            append(key)
+            self._feed(dict.__getitem__(d, k), out, h)
+      elif isinstance(d, list):
+         append("L%d:" % len(d))
+         for v in list.__iter__(d):
+            enc = get(type(v), None)
+            if enc is None:
+               self._feed(v, out, h)
+            else:
+               append(enc(v))
+      elif isinstance(d, tuple):
+         append(self._tuple(d) if self.cache is None else self._cached(d, self._tuple))
+      elif isinstance(d, (set, frozenset)):
+         append(self._set(d) if self.cache is None else self._cached(d, self._set))
+      else:
+         e = _scalar(d)
+         if e is None:
+            if isinstance(d, basestring):
+               e = _scalar(str(d) if isinstance(d, str) else unicode(d))
+            else:
+               r = repr(d)
+               e = "R%d:%s" % (len(r), r)
+         append(e)
+      if h is not None and len(out) > _FlushChunks:
+         h.update("".join(out))
+         del(out[:])
@@ -0,0 +1,217 @@
+import os
+import itertools
+import cStringIO
+import das
+
+
+# Journal files sit next to the file they patch:
+#   # base: <digest of the base file content>
+#   # encoding: <encoding of string values>
+#   [<operation>, <key>, <value>]
+#   ...
+# One record per line, keys use das.cli syntax (field.subfield[index])
+# Records are only replayed on top of the base file they were written for
+
+Suffix = ".journal"
+
+Operations = ("set", "add", "remove")
+
+# Journals are merged back into their base file when they grow over
+#   max(MinCompactSize, base file size * CompactRatio)
+MinCompactSize = 64 * 1024
+CompactRatio = 0.25
+
+
+class JournalError(Exception):
+   def __init__(self, msg):
+      super(JournalError, self).__init__(msg)
+
+
+def journal_path(path):
+   return path + Suffix
+
+
+def _dumps_records(records, encoding):
+   f = cStringIO.StringIO()
+   ser = das.serializer.Serializer(f, indent=None, encoding=encoding)
+   for record in records:
+      try:
+         op, key, value = record
+      except (TypeError, ValueError):
+         raise JournalError("Invalid journal record %s, expected (operation, key, value)" % repr(record))
+      if not op in Operations:
+         raise JournalError("Unsupported journal operation '%s'" % op)
+      ser.dump([op, key, (None if op == "remove" else value)])
+   return f.getvalue()
+
+
+def _apply(data, op, key, value):
+   if op == "set":
+      das.cli.set_value(data, key, value)
+   elif op == "add":
+      das.cli.add_value(data, key, value)
+   elif op == "remove":
+      das.cli.remove(data, key)
+   else:
+      raise JournalError("Unsupported journal operation '%s'" % op)
+
+
+def _key_path(key):
+   # Field names and subscripts of a das.cli key, in access order
+   path = []
+   for part in das.cli._merge(key.split(".")):
+      subscripts = []
+      m = das.cli._subscript_expr.match(part)
+      while m is not None:
+         subscripts.append(das.cli._pyeval(m.group(2)))
+         part = m.group(1)
+         m = das.cli._subscript_expr.match(part)
+      subscripts.reverse()
+      if part:
+         path.append(part)
+      path.extend(subscripts)
+   return path
+
+
+def _item_type(st, k):
+   # Schema type of field or item k of st values, None when it depends on actual values
+   st = das.serializer._resolve(st)
+   if isinstance(st, das.schematypes.Struct):
+      vtype = st.get(k, None)
+      if vtype is None:
+         raise JournalError("Invalid key '%s'" % k)
+      aliasname = das.schematypes.Alias.Name(vtype)
+      return (vtype if aliasname is None else st[aliasname])
+   elif isinstance(st, das.schematypes.Dict):
+      st.ktype.validate(k)
+      return st.vtypeOverrides.get(str(k), st.vtype)
+   elif isinstance(st, das.schematypes.Sequence):
+      return st.type
+   elif isinstance(st, das.schematypes.Tuple):
+      return st.types[k]
+   elif st is None or isinstance(st, (das.schematypes.Or, das.schematypes.Class)):
+      return None
+   else:
+      raise JournalError("%s values have no item '%s'" % (type(st).__name__, k))
+
+
+def _check_record(st, op, key, value):
+   # Validates record against schema type st of the data it applies to, an invalid one
+   # would make every later read fail
+   # Only the schema types along key are used: index ranges aren't checked
+   path = _key_path(key)
+   if not path:
+      raise JournalError("Empty key")
+   for k in path[:-1]:
+      st = _item_type(st, k)
+      if st is None:
+         return
+   parent = das.serializer._resolve(st)
+   if op != "add" and isinstance(parent, das.schematypes.Tuple):
+      raise JournalError("Tuple items can't be changed")
+   st = _item_type(parent, path[-1])
+   if op == "remove":
+      if isinstance(parent, das.schematypes.Struct) and not isinstance(st, das.schematypes.Optional):
+         raise JournalError("Cannot remove required field '%s'" % path[-1])
+      return
+   if op == "add":
+      st = das.serializer._resolve(st)
+      if isinstance(st, (das.schematypes.Sequence, das.schematypes.Set)):
+         st = st.type
+      elif st is not None and not isinstance(st, (das.schematypes.Or, das.schematypes.Class)):
+         raise JournalError("Cannot add value to %s" % type(st).__name__)
+      else:
+         return
+   if st is not None:
+      st.validate(value)
+
+
+def _check_records(d, path, records):
+   st = (d._get_schema_type() if isinstance(d, das.types.TypeBase) else None)
+   if st is None:
+      return
+   for op, key, value in records:
+      try:
+         _check_record(st, op, key, value)
+      except Exception, e:
+         raise JournalError("Invalid journal record %s for '%s' (%s)" % (repr([op, key, value]), path, e))
+
+
+def _read_header(path):
+   # Returns journal metadata and size, None if there is no journal
+   try:
+      with open(path, "rb") as f:
+         md = das._read_header(f)[0]
+         f.seek(0, 2)
+         return md, f.tell()
+   except IOError:
+      return None, 0
+
+
+def remove(path):
+   jpath = journal_path(path)
+   if os.path.isfile(jpath):
+      os.remove(jpath)
+
+
+def write(d, path, records, indent="  ", encoding=None, format="text", compression=None):
+   # Appends records to the journal of file at path, falls back to a full write
+   # when base file is missing, was not written by das.write, or when the journal
+   # grew too big
+   # Returns True when the base file was written
+   if not records:
+      return False
+   md = (das.read_meta(path, compression=compression) if os.path.isfile(path) else {})
+   base = md.get("digest", None)
+   jpath = journal_path(path)
+   jmd, jsize = _read_header(jpath)
+   if base is None or (jmd is not None and jmd.get("base", None) != base):
+      return das._write(d, path, indent, encoding, format, compression)
+   enc = md.get("encoding", None)
+   content = _dumps_records(records, enc)
+   if jsize + len(content) > max(MinCompactSize, os.path.getsize(path) * CompactRatio):
+      return das._write(d, path, indent, encoding, format, compression)
+   _check_records(d, path, records)
+   if jmd is None:
+      content = "# base: %s\n%s%s" % (base, ("" if not enc else "# encoding: %s\n" % enc), content)
+   # Records are written at once so that a crash can't leave an incomplete one behind
+   # (last line without an end of line is ignored when reading)
+   with open(jpath, "ab") as f:
+      f.write(content)
+   return False
+
+
+def stamp(path):
+   # Changes whenever journal content does, part of das read cache keys
+   try:
+      st = os.stat(journal_path(path))
+   except OSError:
+      return None
+   return (st.st_size, st.st_mtime)
+
+
+def replay(path, data, md, names=None):
+   # Applies journal records of file at path to data read from it (md being its metadata)
+   jpath = journal_path(path)
+   if not os.path.isfile(jpath):
+      return data
+   with open(jpath, "rb") as f:
+      content = cStringIO.StringIO(f.read())
+   jmd, l = das._read_header(content)
+   if jmd.get("base", None) != md.get("digest", None):
+      if das.__verbose__:
+         das.print_once("[das] Ignore outdated journal '%s'" % jpath)
+      return data
+   encoding = jmd.get("encoding", None)
+   for line in itertools.chain([l], content):
+      if not line.endswith("\n"):
+         # Interrupted append
+         break
+      line = line.strip()
+      if not line or line.startswith("#"):
+         continue
+      op, key, value = das.parser.parse(line, names=names, encoding=encoding)
+      if not op in Operations:
+         raise JournalError("Unsupported journal operation '%s' in '%s'" % (op, jpath))
+      _apply(data, op, key, value)
+   return data
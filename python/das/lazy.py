@@ -0,0 +1,282 @@
+import re
+import das
+
+
+# Field names das.write(..., lazy=True) records the location of in the 'fields' metadata entry
+#   fields: <name>=<offset>+<size>,...
+# offsets being relative to the first content line
+FieldName = re.compile(r"^[A-Za-z_][A-Za-z0-9_]*$")
+
+
+class _Pending(object):
+   # Location of a field value not parsed yet
+   __slots__ = ("owner", "key", "start", "end")
+
+   def __init__(self, owner, key, start, end):
+      super(_Pending, self).__init__()
+      self.owner = owner
+      self.key = key
+      self.start = start
+      self.end = end
+
+   # Plain dict comparisons against a LazyDict see pending values
+
+   def __eq__(self, oth):
+      return (self.owner[self.key] == oth)
+
+   def __ne__(self, oth):
+      return (self.owner[self.key] != oth)
+
+   def __repr__(self):
+      return repr(self.owner[self.key])
+
+
+class _Source(object):
+   def __init__(self, text, schema_type, encoding, strict_schema, names):
+      super(_Source, self).__init__()
+      self.text = text
+      self.schema_type = schema_type
+      self.encoding = encoding
+      self.strict_schema = strict_schema
+      self.names = names
+      self.pending = 0
+
+
+class LazyDict(dict):
+   # Dictionary of a das.types.Struct whose values are parsed and validated on first access
+   # Methods returning values are overridden, anything else sees _Pending objects
+
+   def __init__(self, items, source):
+      dict.__init__(self, items)
+      self._lazy = source
+      for v in dict.itervalues(self):
+         if type(v) is _Pending:
+            v.owner = self
+            source.pending += 1
+      if source.pending == 0:
+         self._lazy = None
+
+   def _load(self, k, p):
+      src = self._lazy
+      v = _parse(src, k, p)
+      for key, val in dict.items(self):
+         # Aliased fields share the same location
+         if val is p:
+            dict.__setitem__(self, key, v)
+            src.pending -= 1
+      if src.pending <= 0:
+         self._lazy = None
+      return v
+
+   def _load_all(self):
+      if self._lazy is not None:
+         for k, v in dict.items(self):
+            if type(v) is _Pending:
+               self._load(k, v)
+      return self
+
+   def __getitem__(self, k):
+      v = dict.__getitem__(self, k)
+      if type(v) is _Pending and self._lazy is not None:
+         v = self._load(k, v)
+      return v
+
+   def get(self, k, default=None):
+      return (self[k] if dict.__contains__(self, k) else default)
+
+   def pop(self, k, *args):
+      if dict.__contains__(self, k):
+         self[k]
+      return dict.pop(self, k, *args)
+
+   def popitem(self):
+      return dict.popitem(self._load_all())
+
+   def setdefault(self, k, default=None):
+      if dict.__contains__(self, k):
+         return self[k]
+      return dict.setdefault(self, k, default)
+
+   def copy(self):
+      return dict.copy(self._load_all())
+
+   def items(self):
+      return dict.items(self._load_all())
+
+   def iteritems(self):
+      return dict.iteritems(self._load_all())
+
+   def values(self):
+      return dict.values(self._load_all())
+
+   def itervalues(self):
+      return dict.itervalues(self._load_all())
+
+   def __eq__(self, oth):
+      return dict.__eq__(self._load_all(), oth)
+
+   def __ne__(self, oth):
+      return dict.__ne__(self._load_all(), oth)
+
+   def __cmp__(self, oth):
+      return dict.__cmp__(self._load_all(), oth)
+
+   def __lt__(self, oth):
+      return dict.__lt__(self._load_all(), oth)
+
+   def __le__(self, oth):
+      return dict.__le__(self._load_all(), oth)
+
+   def __gt__(self, oth):
+      return dict.__gt__(self._load_all(), oth)
+
+   def __ge__(self, oth):
+      return dict.__ge__(self._load_all(), oth)
+
+   def __repr__(self):
+      return dict.__repr__(self._load_all())
+
+   def __str__(self):
+      return dict.__str__(self._load_all())
+
+   def _snapshot(self):
+      # Content and lazy state without loading pending values (see das.types.Transaction)
+      return (dict.copy(self), self._lazy)
+
+   def _restore(self, state):
+      items, source = state
+      dict.clear(self)
+      dict.update(self, items)
+      self._lazy = source
+      if source is not None:
+         source.pending = len([v for v in dict.itervalues(self) if type(v) is _Pending])
+
+   def __reduce__(self):
+      return (dict, (dict(self.iteritems()),))
+
+
+def _parse(src, k, p):
+   text = src.text[p.start:p.end]
+   with das._CompatibilityMode(src.strict_schema):
+      et = _field_type(src.schema_type, k)
+      v = das.parser.parse(text, names=src.names, encoding=src.encoding)
+      if et is not None:
+         try:
+            v = et.validate(v)
+         except das.ValidationError, e:
+            # Same error as a full read
+            raise das.ValidationError("Invalid value for key '%s': %s" % (k, e))
+   return v
+
+
+def _field_type(sch, k):
+   vtype = sch.get(k, None)
+   if vtype is not None:
+      aliasname = das.schematypes.Alias.Name(vtype)
+      if aliasname is not None:
+         vtype = sch[aliasname]
+   return vtype
+
+
+def _recorded(text, md):
+   # Field locations from metadata, None if they don't match text
+   fields = md.get("fields", None)
+   if not fields:
+      return None
+   rv = []
+   try:
+      for item in fields.split(","):
+         k, loc = item.split("=")
+         start, size = [int(x) for x in loc.split("+")]
+         rv.append((k, start, start + size))
+   except ValueError:
+      return None
+   # Content may have been edited, check that only the struct syntax lies between values
+   end = 0
+   for i, (k, start, stop) in enumerate(rv):
+      prefix = "%s: " % repr(k)
+      if start < end or text[start - len(prefix):start] != prefix:
+         return None
+      if text[end:start - len(prefix)].strip() != ("{" if i == 0 else ","):
+         return None
+      end = stop
+   if text[end:].strip() != "}":
+      return None
+   return rv
+
+
+def _scanned(text, encoding):
+   # Field locations found by tokenizing text, None if it is not a dict literal with string keys
+   rv = []
+   depth = 0
+   key = None
+   start = None
+   expect = "{"
+   for m in das.parser._Token.finditer(text):
+      punct, string = m.group(1), m.group(2)
+      if depth == 1 and expect == "key":
+         if punct == "}":
+            # Empty dict or trailing comma
+            depth = 0
+            expect = None
+            continue
+         if not string:
+            return None
+         key = das.parser._string_literal(string, encoding)
+         expect = ":"
+         continue
+      if depth == 1 and expect == ":":
+         if punct != ":":
+            return None
+         start = m.end()
+         expect = "value"
+         continue
+      if punct in ("[", "{", "("):
+         if depth == 0:
+            if punct != "{" or expect != "{":
+               return None
+            expect = "key"
+         depth += 1
+      elif punct in ("]", "}", ")"):
+         depth -= 1
+         if depth == 0:
+            rv.append((key, start, m.start(1)))
+            expect = None
+      elif punct == "," and depth == 1:
+         rv.append((key, start, m.start(1)))
+         expect = "key"
+      elif depth == 0 and m.lastindex is not None:
+         # Anything but a dict at top level
+         return None
+   if depth != 0 or expect is not None:
+      return None
+   return rv
+
+
+def read_string(text, md, schema_type, encoding, strict_schema, names):
+   # text is the content following the metadata lines
+   # Returns a das.types.Struct whose fields are parsed on first access, None when
+   # schema_type is not a Struct or text not a plain dict literal (read it normally then)
+   sch = das._read_schema_type(schema_type, names)
+   if not isinstance(sch, das.schematypes.Struct) or das.binary.is_binary(text):
+      return None
+   fields = _recorded(text, md)
+   if fields is None:
+      fields = _scanned(text, encoding)
+      if fields is None:
+         return None
+   source = _Source(text, sch, encoding, strict_schema, names)
+   value = {}
+   for k, start, end in fields:
+      value[k] = _Pending(None, k, start, end)
+   # Alias conflicts are checked on actual values, parse aliases and their targets now
+   for k in value.keys():
+      aliasname = das.schematypes.Alias.Name(sch.get(k, None))
+      if aliasname is not None:
+         for n in (k, aliasname):
+            if type(value.get(n, None)) is _Pending:
+               value[n] = _parse(source, n, value[n])
+   with das._CompatibilityMode(strict_schema):
+      rv = sch._assemble(value, validate=False)
+      rv.__dict__["_dict"] = LazyDict(rv._dict, source)
+      return sch._finalize(rv)
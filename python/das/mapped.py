@@ -0,0 +1,413 @@
+from __future__ import absolute_import
+import mmap
+import struct
+import __builtin__
+import das
+from das.binary import (BinaryError,
+                        Magic,
+                        _Writer,
+                        _NONE, _TRUE, _FALSE, _INT, _LONG, _FLOAT, _COMPLEX, _STRING,
+                        _LIST, _TUPLE, _SET, _FROZENSET, _DICT, _REPR, _STR, _UNICODE)
+
+
+# Binary layout that can be read in place (das.write format="mapped")
+#   Same header as das.binary with version 2, then:
+#   Root value offset and string table offset (uint32)
+#   Values, each a tag byte followed by:
+#     _NONE, _TRUE, _FALSE          nothing
+#     _INT, _LONG                   int64 (larger values are written as _REPR)
+#     _FLOAT, _COMPLEX              1 or 2 doubles
+#     _STRING, _REPR                string index (uint32)
+#     _LIST, _TUPLE, _SET,          count (uint32), then offset of each element (uint32)
+#     _FROZENSET
+#     _DICT                         count (uint32), then offset of each key and offset
+#                                   of each value (uint32)
+#     _KEYDICT                      same as _DICT, keys being str objects sorted so that
+#                                   lookups can bisect
+#   String table: count (uint32), kind byte of each string (_STR or _UNICODE), then
+#   count + 1 offsets (uint32) delimiting their bytes
+#
+# Offsets are relative to the end of the header, all integers little endian
+
+Version = 2
+
+_KEYDICT = "K"
+
+_UInt = struct.Struct("<I")
+_Int64 = struct.Struct("<q")
+_Double = struct.Struct("<d")
+_Complex = struct.Struct("<dd")
+_Tag = struct.Struct("<cI")
+
+_MinInt64 = -(1 << 63)
+_MaxInt64 = (1 << 63) - 1
+
+
+class _MappedWriter(_Writer):
+   def __init__(self, encoding=None):
+      super(_MappedWriter, self).__init__(encoding=encoding)
+      # Offset of next value, past root and string table offsets
+      self.pos = 2 * _UInt.size
+      self.shared = {}
+
+   def emit(self, s):
+      rv = self.pos
+      self.out.append(s)
+      self.pos += len(s)
+      return rv
+
+   def constant(self, tag):
+      rv = self.shared.get(tag, None)
+      if rv is None:
+         rv = self.emit(tag)
+         self.shared[tag] = rv
+      return rv
+
+   def write(self, d, key=False):
+      # Returns the offset of d
+      if d is None:
+         return self.constant(_NONE)
+      elif d is True:
+         return self.constant(_TRUE)
+      elif d is False:
+         return self.constant(_FALSE)
+      elif isinstance(d, basestring):
+         # Same rules as pprint for values, keys are written as is
+         if key:
+            pass
+         elif isinstance(d, unicode):
+            try:
+               d = d.encode("ascii")
+            except:
+               pass
+         elif self.encoding is None:
+            try:
+               d.decode("ascii")
+            except Exception, e:
+               raise Exception("Non-ascii string value found but no encoding provided (%s)." % e)
+         return self.emit(_Tag.pack(_STRING, self.string(d)))
+      elif isinstance(d, (dict, das.types.Struct)):
+         keys = das._get_sorted_keys(d)
+         tag = _DICT
+         if all([type(k) is str for k in keys]):
+            keys = sorted(keys)
+            tag = _KEYDICT
+         koffsets = [self.write(k, key=True) for k in keys]
+         voffsets = [self.write(d[k]) for k in keys]
+         return self.emit(_Tag.pack(tag, len(keys)) + struct.pack("<%dI" % (2 * len(keys)), *(koffsets + voffsets)))
+      elif isinstance(d, (list, tuple, set, frozenset)):
+         if isinstance(d, list):
+            tag = _LIST
+         elif isinstance(d, tuple):
+            tag = _TUPLE
+         elif isinstance(d, set):
+            tag = _SET
+         else:
+            tag = _FROZENSET
+         offsets = [self.write(v) for v in d]
+         return self.emit(_Tag.pack(tag, len(offsets)) + struct.pack("<%dI" % len(offsets), *offsets))
+      elif isinstance(d, (int, long)) and _MinInt64 <= d <= _MaxInt64:
+         return self.emit((_INT if isinstance(d, int) else _LONG) + _Int64.pack(d))
+      elif isinstance(d, float):
+         return self.emit(_FLOAT + _Double.pack(d))
+      elif isinstance(d, complex):
+         return self.emit(_COMPLEX + _Complex.pack(d.real, d.imag))
+      else:
+         # Same as text format
+         return self.emit(_Tag.pack(_REPR, self.string(repr(d))))
+
+   def data(self, root):
+      kinds = []
+      offsets = [0]
+      strings = []
+      for s in self.table:
+         if isinstance(s, unicode):
+            s = s.encode("utf8")
+            kinds.append(_UNICODE)
+         else:
+            kinds.append(_STR)
+         strings.append(s)
+         offsets.append(offsets[-1] + len(s))
+      n = len(self.table)
+      table = [_UInt.pack(n), "".join(kinds), struct.pack("<%dI" % (n + 1), *offsets)] + strings
+      return "".join([_UInt.pack(root), _UInt.pack(self.pos)] + self.out + table)
+
+
+def dumps_body(d, encoding=None):
+   w = _MappedWriter(encoding=encoding)
+   root = w.write(d)
+   if w.pos + 1 >= (1 << 32):
+      raise BinaryError("Mapped das content can't exceed 4GB")
+   return w.data(root)
+
+
+def dumps(d, metadata=None, encoding=None):
+   return das.binary.dumps_header(metadata, version=Version) + dumps_body(d, encoding=encoding)
+
+
+class _Buffer(object):
+   # Decodes values of mapped content s (a string or a mmap object)
+   def __init__(self, s, start, names=None, encoding=None):
+      super(_Buffer, self).__init__()
+      self.s = s
+      self.start = start
+      self.names = names
+      self.encoding = encoding
+      # Container views already created, so that dictionary key lookup tables are only built once
+      #   offset -> view
+      self.views = {}
+      try:
+         self.root = _UInt.unpack_from(s, start)[0]
+         table = start + _UInt.unpack_from(s, start + _UInt.size)[0]
+         self.count = _UInt.unpack_from(s, table)[0]
+         self.kinds = table + _UInt.size
+         self.offsets = self.kinds + self.count
+         self.strings = self.offsets + (self.count + 1) * _UInt.size
+      except struct.error:
+         raise BinaryError("Unexpected end of data")
+
+   def close(self):
+      if isinstance(self.s, mmap.mmap):
+         self.s.close()
+
+   def string(self, idx, key=False):
+      if idx >= self.count:
+         raise BinaryError("Invalid string index %d" % idx)
+      start, end = struct.unpack_from("<II", self.s, self.offsets + idx * _UInt.size)
+      rv = self.s[self.strings + start:self.strings + end]
+      if self.s[self.kinds + idx] == _UNICODE:
+         rv = rv.decode("utf8")
+      # Values are decoded the same way the text parser does, keys are kept as read
+      if self.encoding and not key:
+         rv = das.ascii_or_unicode(rv, encoding=self.encoding)
+      return rv
+
+   def value(self, offset, key=False):
+      s = self.s
+      p = self.start + offset
+      try:
+         tag = s[p]
+         if tag == _STRING:
+            return self.string(_UInt.unpack_from(s, p + 1)[0], key=key)
+         elif tag == _INT:
+            return int(_Int64.unpack_from(s, p + 1)[0])
+         elif tag == _LONG:
+            return long(_Int64.unpack_from(s, p + 1)[0])
+         elif tag == _NONE:
+            return None
+         elif tag == _TRUE:
+            return True
+         elif tag == _FALSE:
+            return False
+         elif tag == _FLOAT:
+            return _Double.unpack_from(s, p + 1)[0]
+         elif tag == _COMPLEX:
+            return complex(*_Complex.unpack_from(s, p + 1))
+         elif tag == _KEYDICT or tag == _DICT or tag == _LIST:
+            rv = self.views.get(p, None)
+            if rv is None:
+               rv = (MappedList(self, p) if tag == _LIST else MappedDict(self, p))
+               self.views[p] = rv
+            return rv
+         elif tag == _TUPLE or tag == _SET or tag == _FROZENSET:
+            return _Empty[tag](MappedList(self, p))
+         elif tag == _REPR:
+            return das.parser.parse(self.string(_UInt.unpack_from(s, p + 1)[0], key=True), names=self.names, encoding=self.encoding)
+         else:
+            raise BinaryError("Invalid value tag %s" % repr(tag))
+      except (IndexError, struct.error):
+         raise BinaryError("Unexpected end of data")
+
+
+_Empty = {_TUPLE: tuple,
+          _SET: set,
+          _FROZENSET: frozenset}
+
+
+class MappedList(object):
+   # Read only list whose elements are decoded on access
+   __slots__ = ("_buf", "_pos", "_len")
+
+   def __init__(self, buf, pos):
+      super(MappedList, self).__init__()
+      self._buf = buf
+      self._pos = pos + _Tag.size
+      self._len = _Tag.unpack_from(buf.s, pos)[1]
+
+   def __len__(self):
+      return self._len
+
+   def __getitem__(self, i):
+      if isinstance(i, slice):
+         return [self[j] for j in xrange(*i.indices(self._len))]
+      if i < 0:
+         i += self._len
+      if i < 0 or i >= self._len:
+         raise IndexError("list index out of range")
+      return self._buf.value(_UInt.unpack_from(self._buf.s, self._pos + i * _UInt.size)[0])
+
+   def __iter__(self):
+      for i in xrange(self._len):
+         yield self[i]
+
+   def __eq__(self, oth):
+      return (materialize(self) == materialize(oth))
+
+   def __ne__(self, oth):
+      return not self.__eq__(oth)
+
+   def __repr__(self):
+      return repr(materialize(self))
+
+
+class MappedDict(object):
+   # Read only dictionary whose values are decoded on access
+   #   string keys are also available as attributes
+   __slots__ = ("_buf", "_pos", "_len", "_sorted", "_index")
+
+   def __init__(self, buf, pos):
+      super(MappedDict, self).__init__()
+      self._buf = buf
+      self._pos = pos + _Tag.size
+      tag, self._len = _Tag.unpack_from(buf.s, pos)
+      self._sorted = (tag == _KEYDICT)
+      self._index = None
+
+   def _offset(self, i):
+      return _UInt.unpack_from(self._buf.s, self._pos + i * _UInt.size)[0]
+
+   def _find(self, k):
+      # Position of key k, None if not found
+      if self._sorted:
+         if isinstance(k, unicode):
+            try:
+               k = k.encode("ascii")
+            except UnicodeError:
+               return None
+         elif not isinstance(k, str):
+            return None
+         lo, hi = 0, self._len
+         while lo < hi:
+            mid = (lo + hi) // 2
+            mk = self._buf.value(self._offset(mid), key=True)
+            if mk < k:
+               lo = mid + 1
+            elif mk > k:
+               hi = mid
+            else:
+               return mid
+         return None
+      if self._index is None:
+         # key -> position, built on first lookup
+         self._index = dict([(self._buf.value(self._offset(i), key=True), i) for i in xrange(self._len)])
+      return self._index.get(k, None)
+
+   def __len__(self):
+      return self._len
+
+   def __contains__(self, k):
+      return (self._find(k) is not None)
+
+   def __getitem__(self, k):
+      i = self._find(k)
+      if i is None:
+         raise KeyError(k)
+      return self._buf.value(self._offset(self._len + i))
+
+   def __getattr__(self, k):
+      if k.startswith("__"):
+         raise AttributeError(k)
+      try:
+         return self[k]
+      except KeyError:
+         raise AttributeError("'%s' has no field '%s'" % (type(self).__name__, k))
+
+   def __setattr__(self, k, v):
+      if not k in MappedDict.__slots__:
+         raise TypeError("'%s' object is read only" % type(self).__name__)
+      super(MappedDict, self).__setattr__(k, v)
+
+   def get(self, k, default=None):
+      i = self._find(k)
+      return (default if i is None else self._buf.value(self._offset(self._len + i)))
+
+   def has_key(self, k):
+      return (k in self)
+
+   def iterkeys(self):
+      for i in xrange(self._len):
+         yield self._buf.value(self._offset(i), key=True)
+
+   def itervalues(self):
+      for i in xrange(self._len):
+         yield self._buf.value(self._offset(self._len + i))
+
+   def iteritems(self):
+      for i in xrange(self._len):
+         yield (self._buf.value(self._offset(i), key=True), self._buf.value(self._offset(self._len + i)))
+
+   def keys(self):
+      return list(self.iterkeys())
+
+   def values(self):
+      return list(self.itervalues())
+
+   def items(self):
+      return list(self.iteritems())
+
+   def __iter__(self):
+      return self.iterkeys()
+
+   def __eq__(self, oth):
+      return (materialize(self) == materialize(oth))
+
+   def __ne__(self, oth):
+      return not self.__eq__(oth)
+
+   def __repr__(self):
+      return repr(materialize(self))
+
+
+def materialize(d):
+   # Plain python value of a mapped view
+   if isinstance(d, MappedDict):
+      return dict([(k, materialize(v)) for k, v in d.iteritems()])
+   elif isinstance(d, MappedList):
+      return [materialize(v) for v in d]
+   elif isinstance(d, (tuple, set, frozenset)):
+      return type(d)([materialize(v) for v in d])
+   else:
+      return d
+
+
+def loads(s, names=None, encoding=None):
+   r = das.binary._Reader(s)
+   return materialize(_Buffer(s, r.start + r.size, names=names, encoding=encoding).value(_UInt.unpack_from(s, r.start + r.size)[0]))
+
+
+def open(path, **funcs):
+   # Returns a read only view of the value stored in file at path (MappedDict, MappedList
+   # or scalar value), the file being mapped in memory for as long as views on it exist
+   with __builtin__.open(path, "rb") as f:
+      try:
+         m = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+      except (ValueError, EnvironmentError), e:
+         raise BinaryError("Cannot map '%s' (%s)" % (path, e))
+   try:
+      if m[:len(Magic)] != Magic:
+         raise BinaryError("Not a binary das content")
+      r = das.binary._Reader(m[:len(Magic) + 1 + das.binary._Size.size])
+      if r.version != Version:
+         raise BinaryError("'%s' was not written with format='mapped'" % path)
+      md = das.binary.loads_meta(m[:r.start + r.size])
+      names = dict(funcs)
+      if md.get("schema_type", None):
+         try:
+            das._read_schema_type(md["schema_type"], names)
+         except das.UnknownSchemaError:
+            pass
+      buf = _Buffer(m, r.start + r.size, names=names, encoding=md.get("encoding", None))
+      return buf.value(buf.root)
+   except:
+      m.close()
+      raise
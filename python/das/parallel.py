@@ -0,0 +1,365 @@
+import os
+import sys
+import stat
+import cPickle
+import multiprocessing
+import das
+
+
+class ReadManyError(Exception):
+   def __init__(self, errors, results=None):
+      # errors: list of (path, message) tuples
+      self.errors = errors
+      self.results = results
+      msg = "Failed to read %d file(s)" % len(errors)
+      for path, err in errors:
+         msg += "\n  %s: %s" % (path, err)
+      super(ReadManyError, self).__init__(msg)
+
+
+class WriteManyError(Exception):
+   def __init__(self, errors):
+      # errors: list of (path, message) tuples
+      self.errors = errors
+      msg = "Failed to write %d file(s)" % len(errors)
+      for path, err in errors:
+         msg += "\n  %s: %s" % (path, err)
+      super(WriteManyError, self).__init__(msg)
+
+
+# Validated values are exchanged with worker processes as a tree of plain values:
+#   containers are (kind, schema type reference, mixins bound, items) tuples and
+#   any other object is wrapped as (_OBJECT, None, False, object)
+# Schema type references are (registered type name, path to sub type) tuples so that
+# each process can map them to its own TypeValidator instances
+
+_OBJECT = 0
+_LIST = 1
+_TUPLE = 2
+_SET = 3
+_FROZENSET = 4
+_DICT = 5
+_STRUCT = 6
+
+_Immutables = set([type(None), bool, int, long, float, complex, str, unicode])
+
+
+class _TypeIndex(object):
+   def __init__(self):
+      super(_TypeIndex, self).__init__()
+      self.refs = {}
+      self.types = {}
+      for name in das.list_schema_types():
+         self._add(das.get_schema_type(name), (name,))
+
+   def _add(self, st, ref):
+      if id(st) in self.refs:
+         return
+      self.refs[id(st)] = ref
+      self.types[ref] = st
+      if isinstance(st, das.schematypes.Struct):
+         children = [(k, dict.__getitem__(st, k)) for k in sorted(dict.keys(st))]
+      elif isinstance(st, das.schematypes.Dict):
+         children = [("<key>", st.ktype), ("<value>", st.vtype)]
+         children += [(k, st.vtypeOverrides[k]) for k in sorted(st.vtypeOverrides)]
+      elif isinstance(st, (das.schematypes.Tuple, das.schematypes.Or)):
+         children = list(enumerate(st.types))
+      elif isinstance(st, (das.schematypes.Sequence, das.schematypes.Set, das.schematypes.Optional)):
+         children = [("<type>", st.type)]
+      else:
+         children = []
+      for k, t in children:
+         if isinstance(t, das.schematypes.TypeValidator):
+            self._add(t, ref + (k,))
+
+
+class _Unsupported(Exception):
+   def __init__(self, msg):
+      super(_Unsupported, self).__init__(msg)
+
+
+def _encode(d, index):
+   if type(d) in _Immutables:
+      return d
+   st = None
+   mixins = False
+   if isinstance(d, das.types.TypeBase):
+      st = d._get_schema_type()
+      if st is not None:
+         st = index.refs.get(id(st), None)
+         if st is None:
+            raise _Unsupported("Unregistered schema type")
+      mixins = das.has_bound_mixins(d)
+   if isinstance(d, das.types.Struct):
+      return (_STRUCT, st, mixins, [(k, _encode(v, index)) for k, v in d._dict.iteritems()])
+   elif isinstance(d, list):
+      return (_LIST, st, mixins, [_encode(x, index) for x in list.__iter__(d)])
+   elif isinstance(d, tuple):
+      return (_TUPLE, st, mixins, [_encode(x, index) for x in tuple.__iter__(d)])
+   elif isinstance(d, set):
+      return (_SET, st, mixins, [_encode(x, index) for x in set.__iter__(d)])
+   elif isinstance(d, frozenset):
+      return (_FROZENSET, st, mixins, [_encode(x, index) for x in d])
+   elif isinstance(d, dict):
+      return (_DICT, st, mixins, [(_encode(k, index), _encode(v, index)) for k, v in dict.iteritems(d)])
+   elif isinstance(d, das.types.TypeBase):
+      raise _Unsupported("Unsupported das type %s" % type(d).__name__)
+   else:
+      return (_OBJECT, None, False, d)
+
+
+def _bind_mixins(d):
+   st = d._get_schema_type()
+   if st is None:
+      return
+   stn = das.get_schema_type_name(st)
+   mixins = (das.get_registered_mixins(stn) if stn else st.get_property("mixins", None))
+   if mixins:
+      das.mixin.bind(mixins, d)
+
+
+def _decode(n, index, root=False):
+   if type(n) is not tuple:
+      return n
+   kind, st, mixins, items = n
+   if kind == _OBJECT:
+      return items
+   elif kind == _STRUCT:
+      rv = das.types.Struct()
+      rv._dict.update([(k, _decode(v, index)) for k, v in items])
+   elif kind == _DICT:
+      items = [(_decode(k, index), _decode(v, index)) for k, v in items]
+      rv = (dict(items) if st is None else das.types.Dict(items))
+   else:
+      items = [_decode(x, index) for x in items]
+      if kind == _LIST:
+         rv = (items if st is None else das.types.Sequence(items))
+      elif kind == _TUPLE:
+         rv = (tuple(items) if st is None else das.types.Tuple(items))
+      elif kind == _SET:
+         rv = (set(items) if st is None else das.types.Set(items))
+      else:
+         rv = frozenset(items)
+   if st is not None:
+      rv._set_schema_type(index.types[st])
+      if mixins or root:
+         _bind_mixins(rv)
+   return rv
+
+
+_WorkerIndex = None
+
+
+def _init_worker(schema_path, added_path):
+   global _WorkerIndex
+   # Warm the schema registry once per worker process
+   if schema_path is not None:
+      os.environ["DAS_SCHEMA_PATH"] = schema_path
+   das.load_schemas()
+   if added_path:
+      das.load_schemas(paths=added_path.split(os.pathsep))
+   _WorkerIndex = _TypeIndex()
+
+
+def _read_worker(args):
+   path, schema_type, ignore_meta, strict_schema = args
+   try:
+      rv = das.read(path, schema_type=schema_type, ignore_meta=ignore_meta, strict_schema=strict_schema)
+   except Exception, e:
+      return (False, "%s: %s" % (type(e).__name__, e))
+   try:
+      return (True, cPickle.dumps(_encode(rv, _WorkerIndex), 2))
+   except Exception:
+      # Let the calling process read it
+      return (True, None)
+
+
+def _new_pool(workers):
+   registry = das.SchemaTypesRegistry.instance
+   return multiprocessing.Pool(workers, initializer=_init_worker, initargs=(os.environ.get("DAS_SCHEMA_PATH", None), registry.addedpath))
+
+
+def read_many(paths, schema_type=None, workers=None, ignore_meta=False, strict_schema=None):
+   paths = list(paths)
+   if isinstance(schema_type, das.schematypes.TypeValidator):
+      name = das.get_schema_type_name(schema_type)
+      if name:
+         schema_type = name
+      else:
+         # Can't be sent to worker processes
+         workers = 1
+   if workers is None:
+      workers = multiprocessing.cpu_count()
+   workers = min(workers, len(paths))
+
+   if workers > 1:
+      pool = _new_pool(workers)
+      try:
+         outputs = pool.map(_read_worker, [(path, schema_type, ignore_meta, strict_schema) for path in paths], chunksize=1)
+      finally:
+         pool.close()
+         pool.join()
+      index = _TypeIndex()
+   else:
+      outputs = [(True, None)] * len(paths)
+      index = None
+
+   results = []
+   errors = []
+   for path, (ok, data) in zip(paths, outputs):
+      rv = None
+      if not ok:
+         errors.append((path, data))
+      elif data is not None:
+         rv = _decode(cPickle.loads(data), index, root=True)
+      else:
+         try:
+            rv = das.read(path, schema_type=schema_type, ignore_meta=ignore_meta, strict_schema=strict_schema)
+         except Exception, e:
+            errors.append((path, "%s: %s" % (type(e).__name__, e)))
+      results.append(rv)
+
+   if errors:
+      raise ReadManyError(errors, results=results)
+
+   return results
+
+
+def _dumps(d, indent, encoding, format, compression, path=None):
+   # Returns None when path is given and already has the same content
+   content = das._dumps(d, indent=indent, encoding=encoding, format=format)
+   if path is not None and das._unchanged(path, content, compression):
+      return None
+   if compression is not None:
+      content = das.compression.compress(content, compression)
+   return content
+
+
+def _write_worker(args):
+   data, indent, encoding, format, compression, path = args
+   try:
+      d = _decode(cPickle.loads(data), _WorkerIndex, root=True)
+      return (True, _dumps(d, indent, encoding, format, compression, path))
+   except Exception, e:
+      return (False, "%s: %s" % (type(e).__name__, e))
+
+
+def _fsync_dir(path):
+   if sys.platform == "win32":
+      return
+   fd = os.open(path, os.O_RDONLY)
+   try:
+      os.fsync(fd)
+   finally:
+      os.close(fd)
+
+
+def _commit(contents, fsync=False):
+   # Write all temporary files first so that nothing is replaced if any of them fails
+   errors = []
+   temps = []
+   for path, content in contents:
+      tmppath = "%s.%d.tmp" % (path, os.getpid())
+      try:
+         fd = os.open(tmppath, os.O_WRONLY | os.O_CREAT | os.O_EXCL | getattr(os, "O_BINARY", 0), 0666)
+         temps.append(tmppath)
+         with os.fdopen(fd, "wb") as f:
+            f.write(content)
+         if os.path.isfile(path):
+            os.chmod(tmppath, stat.S_IMODE(os.stat(path).st_mode))
+      except (IOError, OSError), e:
+         errors.append((path, "%s: %s" % (type(e).__name__, e)))
+
+   if not errors and fsync:
+      # Flushing once all files are written lets the file system group the writes
+      for tmppath, (path, _) in zip(temps, contents):
+         try:
+            with open(tmppath, "r+b") as f:
+               os.fsync(f.fileno())
+         except (IOError, OSError), e:
+            errors.append((path, "%s: %s" % (type(e).__name__, e)))
+
+   if errors:
+      for tmppath in temps:
+         try:
+            os.remove(tmppath)
+         except:
+            pass
+      raise WriteManyError(errors)
+
+   dirs = set()
+   for tmppath, (path, _) in zip(temps, contents):
+      try:
+         if sys.platform == "win32" and os.path.isfile(path):
+            # No atomic replace on windows
+            os.remove(path)
+         os.rename(tmppath, path)
+         # Journal records applied to previous content
+         das.journal.remove(path)
+         dirs.add(os.path.dirname(os.path.abspath(path)))
+      except (IOError, OSError), e:
+         errors.append((path, "%s: %s" % (type(e).__name__, e)))
+         try:
+            os.remove(tmppath)
+         except:
+            pass
+
+   if fsync:
+      for d in dirs:
+         try:
+            _fsync_dir(d)
+         except (IOError, OSError):
+            pass
+
+   if errors:
+      raise WriteManyError(errors)
+
+
+def write_many(items, indent="  ", encoding=None, format="text", compression=None, workers=None, fsync=False, only_if_changed=False):
+   if not format in ("text", "binary", "mapped"):
+      raise Exception("Unsupported das format '%s'" % format)
+   items = list(items)
+   compressions = [(compression or das.compression.from_extension(path)) for _, path in items]
+   if format == "mapped" and any(compressions):
+      raise das.CompressionError("Mapped das files can't be compressed")
+   checks = [(path if only_if_changed else None) for _, path in items]
+   if workers is None:
+      workers = multiprocessing.cpu_count()
+   workers = min(workers, len(items))
+
+   outputs = [None] * len(items)
+   if workers > 1:
+      index = _TypeIndex()
+      tasks = []
+      for i, (d, _) in enumerate(items):
+         try:
+            tasks.append((i, cPickle.dumps(_encode(d, index), 2)))
+         except Exception:
+            # Serialized in the calling process
+            pass
+      if tasks:
+         pool = _new_pool(workers)
+         try:
+            results = pool.map(_write_worker, [(data, indent, encoding, format, compressions[i], checks[i]) for i, data in tasks], chunksize=1)
+         finally:
+            pool.close()
+            pool.join()
+         for (i, _), out in zip(tasks, results):
+            outputs[i] = out
+
+   for i, (d, _) in enumerate(items):
+      if outputs[i] is None:
+         try:
+            outputs[i] = (True, _dumps(d, indent, encoding, format, compressions[i], checks[i]))
+         except Exception, e:
+            outputs[i] = (False, "%s: %s" % (type(e).__name__, e))
+
+   errors = [(path, out[1]) for (_, path), out in zip(items, outputs) if not out[0]]
+   if errors:
+      raise WriteManyError(errors)
+
+   # Unchanged files have no content
+   contents = [(path, out[1]) for (_, path), out in zip(items, outputs) if out[1] is not None]
+   _commit(contents, fsync=fsync)
+
+   return [path for path, _ in contents]
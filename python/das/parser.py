@@ -0,0 +1,420 @@
+import re
+import das
+
+
+class ParseError(Exception):
+   def __init__(self, msg, text=None, pos=None, line=1):
+      if text is not None and pos is not None:
+         line += text.count("\n", 0, pos)
+         column = pos - text.rfind("\n", 0, pos)
+         msg = "%s (line %d, column %d)" % (msg, line, column)
+      super(ParseError, self).__init__(msg)
+
+
+# Whitespaces, comments and line continuations are skipped as part of each token
+_Token = re.compile(r"\s*(?:(?:#[^\n]*|\\\n)\s*)*" +
+                    r"(?:([][{}(),:=])" +
+                    r"|([uUbB]?[rR]?(?:'''[^'\\]*(?:(?:\\.|'(?!''))[^'\\]*)*'''" +
+                                    r"|\"\"\"[^\"\\]*(?:(?:\\.|\"(?!\"\"))[^\"\\]*)*\"\"\"" +
+                                    r"|'[^'\\\n]*(?:\\.[^'\\\n]*)*'" +
+                                    r"|\"[^\"\\\n]*(?:\\.[^\"\\\n]*)*\"))" +
+                    r"|([-+]?(?:0[xX][0-9a-fA-F]+[lL]?|(?:\d+\.\d*|\.\d+|\d+)(?:[eE][-+]?\d+)?[jJlL]?))" +
+                    r"|([A-Za-z_][A-Za-z0-9_]*)" +
+                    r"|(.)" +
+                    r"|\Z)", re.DOTALL)
+
+# Trailing whitespaces and comments produce empty matches at the end of input
+_EndToken = ("", "", "", "", "")
+
+# Only tokens containing these can span several lines
+_MultiLine = ("\\\n", "'''", '"""')
+
+Constants = {"True": True,
+             "False": False,
+             "None": None}
+
+# Side effect free constructors always available to das files
+Builtins = {"set": set,
+            "frozenset": frozenset,
+            "dict": dict,
+            "list": list,
+            "tuple": tuple,
+            "int": int,
+            "long": long,
+            "float": float,
+            "bool": bool,
+            "str": str,
+            "unicode": unicode}
+
+# Frame kinds
+_LIST = 0
+_TUPLE = 1
+_BRACE = 2
+_CALL = 3
+
+# _BRACE frame states
+_FIRST = 0     # waiting for first element
+_FIRSTKEY = 1  # first element read, dict or set not decided yet
+_KEY = 2       # waiting for dict key
+_COLON = 3     # waiting for ':'
+_VALUE = 4     # waiting for dict value
+_NEXT = 5      # waiting for ',' or '}' after a dict value
+_SET = 6       # reading set elements
+
+_Closers = {_LIST: "]", _TUPLE: ")", _BRACE: "}", _CALL: ")"}
+
+# Values built from builtins, already decoded
+_Decoded = set([set, frozenset, dict, list, tuple, int, long, float, bool, str, unicode, type(None)])
+
+
+# Input is tokenized by blocks of whole lines so that the token list doesn't outweigh the parsed data
+
+def _text_blocks(text, blocksize=65536):
+   n = len(text)
+   start = 0
+   while start < n:
+      end = text.find("\n", start + blocksize)
+      end = (n if end == -1 else end + 1)
+      if end < n:
+         for s in _MultiLine:
+            if text.find(s, start, end) != -1:
+               end = n
+               break
+      yield (text if (start == 0 and end == n) else text[start:end])
+      start = end
+
+
+def _line_blocks(lines, encoding=None, blocksize=65536):
+   block = []
+   size = 0
+   multiline = False
+   for l in lines:
+      if isinstance(l, unicode):
+         l = l.encode(encoding or "utf8")
+      block.append(l)
+      size += len(l)
+      if not multiline:
+         multiline = (l.endswith("\\\n") or "'''" in l or '"""' in l)
+      if size >= blocksize and not multiline:
+         yield "".join(block)
+         block = []
+         size = 0
+   if block:
+      yield "".join(block)
+
+
+def _string_literal(tok, encoding):
+   i = 0
+   while tok[i] not in "'\"":
+      i += 1
+   prefix = tok[:i].lower()
+   n = (3 if (len(tok) - i) >= 6 and tok[i:i+3] == tok[i] * 3 else 1)
+   body = tok[i+n:-n]
+   raw = ("r" in prefix)
+   if "u" in prefix:
+      if raw:
+         if encoding:
+            return body.decode(encoding).encode("raw_unicode_escape").decode("raw_unicode_escape")
+         else:
+            return body.decode("raw_unicode_escape")
+      elif "\\" in body:
+         if encoding:
+            body = body.decode(encoding).encode("ascii", "backslashreplace")
+         return body.decode("unicode_escape")
+      else:
+         return body.decode(encoding or "latin-1")
+   elif raw or not "\\" in body:
+      return body
+   else:
+      return body.decode("string_escape")
+
+
+def _number_literal(tok):
+   c = tok[-1]
+   if c in "lL":
+      return long(tok[:-1], 0)
+   elif c in "jJ":
+      return complex(tok)
+   elif "x" in tok or "X" in tok:
+      return int(tok, 0)
+   elif "." in tok or "e" in tok or "E" in tok:
+      return float(tok)
+   else:
+      return int(tok, 0)
+
+
+class Parser(object):
+   def __init__(self, text, names=None, encoding=None):
+      # text is either a string or an iterable of lines
+      super(Parser, self).__init__()
+      if isinstance(text, unicode):
+         if not encoding:
+            encoding = "utf8"
+         text = text.encode(encoding)
+      if isinstance(text, str):
+         self.blocks = _text_blocks(text)
+      else:
+         self.blocks = _line_blocks(text, encoding=encoding)
+      # (first token index, first line, text) of the last tokenized blocks
+      self.recent = []
+      self.encoding = encoding
+      self.names = Builtins.copy()
+      if names:
+         self.names.update(names)
+
+   def error(self, msg, index=None):
+      if index is None or not self.recent:
+         return ParseError(msg)
+      for first, line, text in reversed(self.recent):
+         if index >= first:
+            break
+      # Token positions are only needed for error reporting, find it back now
+      index -= first
+      pos = len(text)
+      for i, m in enumerate(_Token.finditer(text)):
+         if i == index:
+            pos = (m.end() if m.lastindex is None else m.start(m.lastindex))
+            break
+      return ParseError(msg, text, pos, line)
+
+   def parse(self):
+      return self._parse().next()
+
+   def iterparse(self):
+      # Yields the elements of a top level list as soon as they are read
+      return self._parse(stream=True)
+
+   def _parse(self, stream=False):
+      tokens = []
+      pop = tokens.pop
+      fetched = [0]
+      line = [1]
+      names = self.names
+      encoding = self.encoding
+      ascii_or_unicode = das.ascii_or_unicode
+
+      def more():
+         for block in self.blocks:
+            chunk = _Token.findall(block)
+            while chunk and chunk[-1] == _EndToken:
+               chunk.pop()
+            self.recent = self.recent[-1:] + [(fetched[0], line[0], block)]
+            line[0] += block.count("\n")
+            if chunk:
+               fetched[0] += len(chunk)
+               # Tokens are consumed from the end of the list
+               chunk.reverse()
+               tokens.extend(chunk)
+               return True
+         return False
+
+      def error(msg, ahead=0):
+         return self.error(msg, fetched[0] - len(tokens) - 1 + ahead)
+
+      stack = []
+      frame = None
+      expect = True
+      done = False
+      result = None
+
+      while tokens or more():
+         punct, string, number, word, bad = pop()
+
+         if punct:
+            if expect:
+               if punct == "[":
+                  stack.append(frame)
+                  frame = [_LIST, []]
+                  continue
+               elif stream and frame is None:
+                  raise error("Expected '['")
+               elif punct == "{":
+                  stack.append(frame)
+                  frame = [_BRACE, {}, _FIRST, None]
+                  continue
+               elif punct == "(":
+                  stack.append(frame)
+                  frame = [_TUPLE, [], False]
+                  continue
+               elif frame is None or punct != _Closers[frame[0]]:
+                  raise error("Unexpected '%s'" % punct)
+               # Closing an empty container or after a trailing comma
+               fkind = frame[0]
+               if fkind == _BRACE and not frame[2] in (_FIRST, _KEY, _SET):
+                  raise error("Unexpected '%s'" % punct)
+               elif fkind == _TUPLE and frame[1] and not frame[2]:
+                  raise error("Unexpected '%s'" % punct)
+               elif fkind == _CALL and frame[4] is not None:
+                  raise error("Unexpected '%s'" % punct)
+            else:
+               if frame is None:
+                  raise error("Unexpected content after value")
+               fkind = frame[0]
+               if punct == ",":
+                  if fkind == _BRACE:
+                     state = frame[2]
+                     if state == _NEXT:
+                        frame[2] = _KEY
+                     elif state == _FIRSTKEY:
+                        frame[1] = [self._set_first(frame)]
+                        frame[2] = _SET
+                     elif state != _SET:
+                        raise error("Unexpected ','")
+                  elif fkind == _TUPLE:
+                     frame[2] = True
+                  expect = True
+                  continue
+               elif punct == ":":
+                  if fkind != _BRACE or not frame[2] in (_FIRSTKEY, _COLON):
+                     raise error("Unexpected ':'")
+                  frame[2] = _VALUE
+                  expect = True
+                  continue
+               elif punct != _Closers[fkind]:
+                  raise error("Unexpected '%s'" % punct)
+               elif fkind == _BRACE:
+                  state = frame[2]
+                  if state == _FIRSTKEY:
+                     frame[1] = [self._set_first(frame)]
+                     frame[2] = _SET
+                  elif state != _NEXT and state != _SET:
+                     raise error("Unexpected '%s'" % punct)
+
+            # Close current frame
+            if fkind == _LIST:
+               value = frame[1]
+            elif fkind == _BRACE:
+               value = frame[1]
+               if frame[2] == _SET:
+                  try:
+                     value = set(value)
+                  except TypeError:
+                     raise error("Unhashable set element")
+            elif fkind == _TUPLE:
+               items = frame[1]
+               if len(items) == 1 and not frame[2]:
+                  # Parenthesized expression
+                  value = items[0]
+               else:
+                  value = tuple(items)
+            else:
+               value = frame[3](*frame[1], **frame[2])
+               if encoding:
+                  value = self._decode(value)
+            frame = stack.pop()
+
+         elif not expect:
+            if frame is None:
+               raise error("Unexpected content after value")
+            else:
+               raise error("Expected ',' or '%s'" % _Closers[frame[0]])
+
+         elif stream and frame is None:
+            raise error("Expected '['")
+
+         elif string:
+            c = string[0]
+            if (c == "'" or c == "\"") and not "\\" in string and string[:3] != c * 3:
+               value = string[1:-1]
+            else:
+               value = _string_literal(string, encoding)
+            while (tokens or more()) and tokens[-1][1]:
+               # Implicit concatenation of adjacent literals
+               value += _string_literal(pop()[1], encoding)
+            if encoding:
+               # Dict keys are kept as read
+               if frame is None or frame[0] != _BRACE or not frame[2] in (_FIRST, _KEY):
+                  value = ascii_or_unicode(value, encoding=encoding)
+
+         elif number:
+            try:
+               value = _number_literal(number)
+            except ValueError:
+               raise error("Invalid number literal '%s'" % number)
+
+         elif word:
+            if word in Constants:
+               value = Constants[word]
+            else:
+               nxt = (tokens[-1][0] if (tokens or more()) else None)
+               if nxt == "=" and frame is not None and frame[0] == _CALL:
+                  if frame[4] is not None:
+                     raise error("Unexpected '='", 1)
+                  frame[4] = word
+                  pop()
+                  continue
+               elif not word in names:
+                  raise error("Unknown name '%s'" % word)
+               elif nxt == "(":
+                  stack.append(frame)
+                  frame = [_CALL, [], {}, names[word], None]
+                  pop()
+                  continue
+               value = names[word]
+
+         else:
+            raise error("Invalid character %s" % repr(bad))
+
+         # Store value in current frame
+         expect = False
+         if frame is None:
+            result = value
+            done = True
+            continue
+         fkind = frame[0]
+         if fkind == _BRACE:
+            state = frame[2]
+            if state == _VALUE:
+               try:
+                  frame[1][frame[3]] = value
+               except TypeError:
+                  raise error("Unhashable dict key")
+               frame[2] = _NEXT
+            elif state == _FIRST:
+               frame[3] = value
+               frame[2] = _FIRSTKEY
+            elif state == _KEY:
+               frame[3] = value
+               frame[2] = _COLON
+            else:
+               frame[1].append(value)
+         elif fkind == _CALL:
+            if frame[4] is not None:
+               frame[2][frame[4]] = value
+               frame[4] = None
+            elif frame[2]:
+               raise error("Positional argument follows keyword argument")
+            else:
+               frame[1].append(value)
+         elif stream and not stack[-1]:
+            yield value
+         else:
+            frame[1].append(value)
+
+      if not done or frame is not None:
+         raise self.error("Unexpected end of input", fetched[0])
+
+      if not stream:
+         yield result
+
+   def _decode(self, value):
+      # Strings are decoded as they are read, objects built by calls to names may have their
+      # own decoding method (see das.decode)
+      if type(value) in _Decoded or not callable(getattr(value, "_decode", None)):
+         return value
+      return das.decode(value, self.encoding)
+
+   def _set_first(self, frame):
+      # First element of a set literal was read as a dict key
+      first = frame[3]
+      if self.encoding and isinstance(first, basestring):
+         first = das.ascii_or_unicode(first, encoding=self.encoding)
+      return first
+
+
+def parse(text, names=None, encoding=None):
+   return Parser(text, names=names, encoding=encoding).parse()
+
+
+def iterparse(text, names=None, encoding=None):
+   return Parser(text, names=names, encoding=encoding).iterparse()
@@ -0,0 +1,115 @@
+import os
+import sys
+import fnmatch
+import marshal
+import das
+
+
+# Files per task submitted to the thread pool
+_BatchSize = 32
+
+IndexVersion = 1
+
+
+def _list_files(root, pattern):
+   # Paths relative to root
+   rv = []
+   for dirpath, dirnames, filenames in os.walk(root):
+      dirnames.sort()
+      rel = os.path.relpath(dirpath, root)
+      for name in sorted(filenames):
+         if pattern is None or fnmatch.fnmatch(name, pattern):
+            rv.append(name if rel == "." else os.path.join(rel, name))
+   return rv
+
+
+def _scan_batch(root, entries):
+   # entries: list of (relative path, (mtime, size))
+   rv = []
+   for rel, stamp in entries:
+      try:
+         rv.append((rel, stamp, True, das.read_meta(os.path.join(root, rel))))
+      except Exception, e:
+         rv.append((rel, stamp, False, "%s: %s" % (type(e).__name__, e)))
+   return rv
+
+
+def load_index(path):
+   # Returns a dictionary: relative path -> (mtime, size, metadata)
+   try:
+      with open(path, "rb") as f:
+         data = marshal.loads(f.read())
+      if data.get("version", None) == IndexVersion:
+         return data["entries"]
+   except (IOError, EOFError, ValueError, TypeError, AttributeError):
+      pass
+   return {}
+
+
+def save_index(path, entries):
+   tmppath = "%s.%d.tmp" % (path, os.getpid())
+   try:
+      with open(tmppath, "wb") as f:
+         f.write(marshal.dumps({"version": IndexVersion, "entries": entries}, 2))
+      if os.path.isfile(path) and sys.platform == "win32":
+         os.remove(path)
+      os.rename(tmppath, path)
+   except (IOError, OSError), e:
+      if das.__verbose__:
+         das.print_once("[das] Failed to write metadata index '%s' (%s)" % (path, e))
+      try:
+         os.remove(tmppath)
+      except:
+         pass
+
+
+def scan_meta(root, pattern="*.das", workers=None, index=None):
+   # Returns a dictionary: file path -> metadata
+   # index is the path of a file keeping metadata of files under root between calls,
+   # only files whose modification time or size changed are read again
+   entries = ({} if not index else load_index(index))
+   todo = []
+   results = {}
+   newentries = {}
+   for rel in _list_files(root, pattern):
+      try:
+         st = os.stat(os.path.join(root, rel))
+      except OSError:
+         continue
+      stamp = (st.st_mtime, st.st_size)
+      entry = entries.get(rel, None)
+      if entry is not None and (entry[0], entry[1]) == stamp:
+         newentries[rel] = entry
+         results[os.path.join(root, rel)] = dict(entry[2])
+      else:
+         todo.append((rel, stamp))
+
+   batches = [todo[i:i + _BatchSize] for i in xrange(0, len(todo), _BatchSize)]
+   if workers == 1 or len(batches) <= 1:
+      outputs = [_scan_batch(root, x) for x in batches]
+   else:
+      # Private executor: waiting on the shared one from one of its own tasks (an aread
+      # callback for example) could block every worker
+      executor = das.tasks.Executor(max_workers=(das.tasks._DefaultWorkers if workers is None else workers))
+      try:
+         outputs = [t.result() for t in [executor.submit(_scan_batch, root, x) for x in batches]]
+      finally:
+         executor.shutdown(wait=False)
+
+   errors = []
+   for output in outputs:
+      for rel, stamp, ok, md in output:
+         path = os.path.join(root, rel)
+         if ok:
+            newentries[rel] = (stamp[0], stamp[1], md)
+            results[path] = dict(md)
+         else:
+            errors.append((path, md))
+
+   if index and (todo or len(newentries) != len(entries)):
+      save_index(index, newentries)
+
+   if errors:
+      raise das.ReadManyError(sorted(errors), results=results)
+
+   return results
@@ -10,6 +10,14 @@ class ValidationError(Exception):
 
 class TypeValidator(object):
    CurrentSchema = ""
+   # Incremented whenever a schema type is modified, invalidating compiled validation functions
+   Generation = 0
+   # Attributes changed lazily that compiled functions don't depend on
+   Transient = set(["default", "default_validated", "_compiled", "_dispatch"])
+
+   @classmethod
+   def invalidate(klass):
+      TypeValidator.Generation += 1
 
    def __init__(self, default=None, description=None, editable=True, hidden=False, __properties__=None, **kwargs):
       super(TypeValidator, self).__init__(**kwargs)
@@ -26,6 +34,11 @@ class TypeValidator(object):
       # if not "mixins" in self._properties:
       #    self._properties["mixins"] = []
 
+   def __setattr__(self, k, v):
+      super(TypeValidator, self).__setattr__(k, v)
+      if not k in self.Transient:
+         TypeValidator.invalidate()
+
    def has_property(self, name):
       return (name in self._properties)
 
@@ -37,6 +50,7 @@ class TypeValidator(object):
 
    def set_property(self, name, value):
       self._properties[name] = value
+      TypeValidator.invalidate()
 
    def set_properties(self, props):
       self._properties = props
@@ -44,6 +58,7 @@ class TypeValidator(object):
    def remove_property(self, name):
       if name in self._properties:
          del(self._properties[name])
+         TypeValidator.invalidate()
 
    def value_to_string(self, v):
       return repr(self._validate(v))
@@ -75,8 +90,48 @@ class TypeValidator(object):
       return self._is_compatible(value, key=key, index=index)
 
    def validate(self, value, key=None, index=None):
+      if key is None and index is None:
+         return self.compile()(value)
+      else:
+         return self._interpret(value, key=key, index=index)
+
+   def accepts(self, value):
+      # Whether validate(value) would succeed, value being neither copied nor modified
+      return self._matcher(True)(value)
+
+   def compile(self, reuse=False):
+      # Returns a function equivalent to validate(value) (see das.compiler)
+      # reuse: das objects of this type validated since their last modification are returned
+      #        as is, others being validated in place (results may share objects with value)
+      return self._compiled_function(reuse, lambda: das.compiler.compile(self, reuse=reuse))
+
+   def _matcher(self, hooks):
+      # hooks: match validate, _validate otherwise (is_compatible)
+      if Struct.CompatibilityMode:
+         # Validation may modify value
+         return das.compiler._validates(self, hooks)
+      return self._compiled_function(("matcher", hooks), lambda: das.compiler.matcher(self, hooks=hooks))
+
+   def _compiled_function(self, key, build, load=True):
+      # load=False when self comes from an already validated value
+      if load:
+         das.SchemaTypesRegistry.instance.load_schemas()
+      c = self.__dict__.get("_compiled", None)
+      if c is None or c[0] != TypeValidator.Generation:
+         c = (TypeValidator.Generation, {})
+         self._compiled = c
+      fn = c[1].get(key, None)
+      if fn is None:
+         fn = build()
+         c[1][key] = fn
+      return fn
+
+   def _interpret(self, value, key=None, index=None):
       mixins = (None if not das.has_bound_mixins(value) else das.get_bound_mixins(value))
       rv = self._validate(value, key=key, index=index)
+      return self._finalize(rv, mixins=mixins, key=key, index=index)
+
+   def _finalize(self, rv, mixins=None, key=None, index=None):
       if mixins is not None:
          # Re-bind the same mixins that were found on original value
          das.mixin.bind(mixins, rv, reset=True)
@@ -707,9 +762,12 @@ class Struct(TypeValidator, dict):
          raise ValidationError("Expected a dict value, got %s" % type(value).__name__)
       allfound = True
       aliasvalues = {}
+      # Struct values resolve aliases on access, they can't hold conflicting ones (and
+      # checking would load lazily read fields)
+      isstruct = isinstance(value, das.types.Struct)
       for k, v in self.iteritems():
          aliasname = self._aliases.get(k, None)
-         if aliasname is not None and k in value:
+         if aliasname is not None and not isstruct and k in value:
             if aliasname in aliasvalues:
                if aliasvalues[aliasname] != value[k]:
                   raise ValidationError("Conflicting alias values for '%s'" % aliasname)
@@ -733,7 +791,7 @@ class Struct(TypeValidator, dict):
             raise ValidationError("Conflicting alias values for '%s'" % k)
       # Ignore new keys only in compatibility mode if all base keys are fullfilled (forward compatibility)
       if not self.CompatibilityMode or not allfound:
-         for k, _ in value.iteritems():
+         for k in value:
             if not k in self:
                raise ValidationError("Unknown key '%s'" % k)
       return value
@@ -757,33 +815,38 @@ class Struct(TypeValidator, dict):
                das.print_once(message) 
             return vv
       else:
-         self._validate_self(value)
-         actualkeys = set([item for item in value])
-         rv = das.types.Struct()
-         # don't set schema type just yet
-         for k, v in self.iteritems():
-            # don't add aliases to dictionary
-            deprecated = isinstance(v, Deprecated)
-            aliasname = Alias.Name(v)
-            if aliasname is not None:
-               # Issue warning on deprecated field
-               if deprecated and k in actualkeys:
-                  message = "[das] Field %s is deprecated, use %s instead" % (repr(k), repr(aliasname))
-                  das.print_once(message)
-               continue
-            try:
-               vv = v.validate(value[k])
-               if vv is not None and deprecated:
-                  message = ("[das] Field %s is deprecated" % repr(k) if not v.message else v.message)
-                  das.print_once(message)
-               rv[k] = vv
-            except KeyError, e:
-               if not isinstance(v, Optional):
-                  raise ValidationError("Invalid value for key '%s': %s" % (k, e))
-            except ValidationError, e:
+         return self._assemble(value)
+
+   def _assemble(self, value, validate=True):
+      # das.types.Struct holding value fields, validated against their type or left
+      # as they are (see das.lazy)
+      self._validate_self(value)
+      actualkeys = set([item for item in value])
+      rv = das.types.Struct()
+      # don't set schema type just yet
+      for k, v in self.iteritems():
+         # don't add aliases to dictionary
+         deprecated = isinstance(v, Deprecated)
+         aliasname = Alias.Name(v)
+         if aliasname is not None:
+            # Issue warning on deprecated field
+            if deprecated and k in actualkeys:
+               message = "[das] Field %s is deprecated, use %s instead" % (repr(k), repr(aliasname))
+               das.print_once(message)
+            continue
+         try:
+            vv = (v.validate(value[k]) if validate else value[k])
+            if vv is not None and deprecated:
+               message = ("[das] Field %s is deprecated" % repr(k) if not v.message else v.message)
+               das.print_once(message)
+            rv[k] = vv
+         except KeyError, e:
+            if not isinstance(v, Optional):
                raise ValidationError("Invalid value for key '%s': %s" % (k, e))
-         rv._set_schema_type(self)
-         return rv
+         except ValidationError, e:
+            raise ValidationError("Invalid value for key '%s': %s" % (k, e))
+      rv._set_schema_type(self)
+      return rv
 
    def _decode(self, encoding):
       super(Struct, self)._decode(encoding)
@@ -1107,56 +1170,105 @@ class Or(TypeValidator):
          raise Exception("Schema type 'Or' requires at least two types") 
       self.types = types
 
-   def _validate_self(self, value):
-      # even in compat mode, look for an exact match first
-      if Struct.CompatibilityMode:
-         rv = None
-         Struct.CompatibilityMode = False
-         for typ in self.types:
-            try:
-               rv = typ._validate_self(value)
-               break
-            except ValidationError, e:
+   def _probe(self, t):
+      # Cheap discriminator of values t may accept outside of compatibility mode:
+      #   (value classes, required keys, allowed keys, string choices), None if unknown
+      tt = type(t)
+      if tt is Optional:
+         return self._probe(t.type)
+      elif tt is SchemaType:
+         try:
+            return self._probe(das.get_schema_type(t.name))
+         except das.UnknownSchemaError:
+            return None
+      classes = {Boolean: (bool, basestring),
+                 Integer: (int, long, basestring),
+                 Real: (int, long, float),
+                 String: (basestring,),
+                 Set: (tuple, list, set),
+                 Sequence: (tuple, list, set),
+                 Tuple: (list, tuple),
+                 Dict: (dict, das.types.Struct),
+                 Struct: (dict, das.types.Struct),
+                 Empty: (type(None),)}.get(tt, None)
+      if classes is None:
+         return None
+      required, allowed, choices = None, None, None
+      if tt is Struct and not t._aliases:
+         required = [k for k, v in t.iteritems() if not isinstance(v, Optional)]
+         allowed = frozenset(t.keys())
+      elif tt is String and t.strict and t.choices is not None and not callable(t.choices):
+         choices = t.choices
+      return (classes, required, allowed, choices)
+
+   def _candidates(self, value):
+      # Indices of alternatives value may be valid for outside of compatibility mode
+      # Probes and candidates by value class are kept until TypeValidator.Generation changes
+      d = self.__dict__.get("_dispatch", None)
+      if d is None or d[0] != TypeValidator.Generation:
+         d = (TypeValidator.Generation, [self._probe(x) for x in self.types], {})
+         self._dispatch = d
+      _, probes, byclass = d
+      klass = type(value)
+      indices = byclass.get(klass, None)
+      if indices is None:
+         indices = [i for i, p in enumerate(probes) if p is None or issubclass(klass, p[0])]
+         byclass[klass] = indices
+      rv = []
+      for i in indices:
+         p = probes[i]
+         if p is not None:
+            _, required, allowed, choices = p
+            if required is not None:
+               if not all([k in value for k in required]) or not all([k in allowed for k in value]):
+                  continue
+            elif choices is not None and not das.compiler._string(value) in choices:
                continue
-         Struct.CompatibilityMode = True
-         if rv is not None:
-            return rv
-      emsgs = []
-      for typ in self.types:
+         rv.append(i)
+      return rv
+
+   def _first(self, value, candidates, check):
+      # Result of check(i) for the first alternative i it succeeds for
+      # Candidates are tried first, others only when they all failed (probes being conservative,
+      # this only builds the error messages of all alternatives)
+      errors = {}
+      for i in candidates:
          try:
-            return typ._validate_self(value)
+            return check(i)
          except ValidationError, e:
-            emsgs.append(str(e))
-            continue
+            errors[i] = e
+      for i in xrange(len(self.types)):
+         if not i in errors:
+            try:
+               return check(i)
+            except ValidationError, e:
+               errors[i] = e
       emsg = "Value of type %s doesn't match any of the allowed types" % type(value).__name__
-      emsg += "".join(["\n  Type %d error: %s" % (x, emsgs[x]) for x in xrange(len(emsgs))])
+      emsg += "".join(["\n  Type %d error: %s" % (x, errors[x]) for x in xrange(len(self.types))])
       raise ValidationError(emsg)
-      return None
 
-   def _validate(self, value, key=None, index=None):
+   def _dispatch_validation(self, value, check):
       if Struct.CompatibilityMode:
+         # even in compat mode, look for an exact match first
          rv = None
          Struct.CompatibilityMode = False
-         for typ in self.types:
+         for i in self._candidates(value):
             try:
-               rv = typ.validate(value, key=key, index=index)
+               rv = check(i)
                break
             except ValidationError, e:
                continue
          Struct.CompatibilityMode = True
          if rv is not None:
             return rv
-      emsgs = []
-      for typ in self.types:
-         try:
-            return typ.validate(value, key=key, index=index)
-         except ValidationError, e:
-            emsgs.append(str(e))
-            continue
-      emsg = "Value of type %s doesn't match any of the allowed types" % type(value).__name__
-      emsg += "".join(["\n  Type %d error: %s" % (x, emsgs[x]) for x in xrange(len(emsgs))])
-      raise ValidationError(emsg)
-      return None
+         return self._first(value, xrange(len(self.types)), check)
+      return self._first(value, self._candidates(value), check)
+
+   def _validate_self(self, value):
+      return self._dispatch_validation(value, lambda i: self.types[i]._validate_self(value))
+
+   def _validate(self, value, key=None, index=None):
+      return self._dispatch_validation(value, lambda i: self.types[i].validate(value, key=key, index=index))
 
    def value_to_string(self, v):
       for typ in self.types:
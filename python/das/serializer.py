@@ -0,0 +1,468 @@
+import das
+
+
+# Output is accumulated in a list of chunks written to the stream in large blocks
+_FlushChunks = 8192
+
+def _check_key(k):
+   # We assume string keys are 'ascii'
+   if isinstance(k, unicode):
+      try:
+         k.encode("ascii")
+      except:
+         raise Exception("Non-ascii keys are not supported!")
+   elif isinstance(k, str):
+      try:
+         k.decode("ascii")
+      except:
+         raise Exception("Non-ascii keys are not supported!")
+
+
+def _ascii_keys(keys):
+   try:
+      for k in keys:
+         _check_key(k)
+      return True
+   except:
+      return False
+
+
+_StructOrderedKeys = das.types.Struct.ordered_keys.im_func
+
+
+def _struct_keys(d):
+   # Same order as das._get_sorted_keys, schema type's field order resolved once
+   if type(d).ordered_keys.im_func is not _StructOrderedKeys:
+      # Overridden by a mixin
+      return das._get_sorted_keys(d)
+   dd = d._dict
+   st = d._get_schema_type()
+   if not hasattr(st, "ordered_keys"):
+      keys = sorted(dd)
+      for k in keys:
+         _check_key(k)
+      return keys
+   order = st.ordered_keys()
+   keys = [k for k in order if k in dd]
+   # Result kept on the schema type until the next schema change
+   if not st._compiled_function("ascii_keys", lambda: _ascii_keys(order), load=False):
+      # Only fail on keys actually used
+      for k in keys:
+         _check_key(k)
+   if not keys:
+      keys = [k for k in dd]
+      for k in keys:
+         _check_key(k)
+   elif len(keys) != len(dd):
+      extra = sorted(set(dd).difference(keys))
+      for k in extra:
+         _check_key(k)
+      keys += extra
+   return keys
+
+
+def _dict_keys(d):
+   if hasattr(d, "ordered_keys"):
+      return das._get_sorted_keys(d)
+   keys = sorted(d)
+   for k in keys:
+      _check_key(k)
+   return keys
+
+
+def _string(d, encoding, multiline):
+   if isinstance(d, str):
+      try:
+         d.decode("ascii")
+      except Exception, e:
+         if not encoding:
+            raise Exception("Non-ascii string value found but no encoding provided (%s)." % e)
+         try:
+            return repr(d.decode(encoding))
+         except Exception, e:
+            raise Exception("Non-ascii string value cannot be decoded to '%s' (%s)." % (encoding, e))
+   else:
+      try:
+         d = d.encode("ascii")
+      except:
+         return repr(d)
+   # properly deal with multiline characters
+   # using repr here would solve the problem too but lead to less readable files
+   # -> line1\\nline1 -> eval -> line1\nline2
+   if multiline and "\n" in d:
+      return "'''" + d + "'''"
+   else:
+      return repr(d)
+
+
+_Numbers = set([bool, int, long, float])
+
+# Nesting level up to which containers are written inline by generated functions
+_MaxInlineDepth = 3
+
+
+def _resolve(t):
+   try:
+      while True:
+         if isinstance(t, das.schematypes.Optional):
+            t = t.type
+         elif isinstance(t, das.schematypes.SchemaType):
+            t = das.get_schema_type(t.name)
+         else:
+            return t
+   except das.UnknownSchemaError:
+      return None
+
+
+class _MissingValue(object):
+   pass
+
+_Missing = _MissingValue()
+
+
+class _CodeGenerator(object):
+   # Base of the generators of functions specialised for a schema type (see das.hashing)
+   def __init__(self):
+      super(_CodeGenerator, self).__init__()
+      self.lines = []
+      self.count = 0
+
+   def emit(self, level, line):
+      self.lines.append("   " * level + line)
+
+   def var(self, prefix):
+      self.count += 1
+      return "%s%d" % (prefix, self.count)
+
+   def struct_layout(self, order, empty):
+      # Fetches the fields of Struct value d into v0, v1... (_Missing when not set), their
+      # count into 'left', and returns False unless all keys of d are fields in order
+      # and no mixin overrides d's key order (nor when d is empty if not empty)
+      n = len(order)
+      self.emit(1, "if type(d).ordered_keys.im_func is not _StructOrderedKeys:")
+      self.emit(2, "return False")
+      self.emit(1, "dd = d._dict")
+      self.emit(1, "get = dd.get")
+      for i, k in enumerate(order):
+         self.emit(1, "v%d = get(%s, _Missing)" % (i, repr(k)))
+      if n:
+         self.emit(1, "left = " + " + ".join(["(v%d is not _Missing)" % i for i in xrange(n)]))
+      else:
+         self.emit(1, "left = 0")
+      self.emit(1, ("if left != len(dd):" if empty else "if left == 0 or left != len(dd):"))
+      self.emit(2, "return False")
+
+   def struct_fields(self, st, order):
+      # Yields key, type and variable of each field, the code emitted for it only
+      # running when the field is set
+      for i, k in enumerate(order):
+         v = "v%d" % i
+         self.emit(1, "if %s is not _Missing:" % v)
+         yield k, dict.__getitem__(st, k), v
+
+   def build(self, st, fname, ns):
+      ns["_Missing"] = _Missing
+      ns["_StructOrderedKeys"] = _StructOrderedKeys
+      name = das.get_schema_type_name(st) or "anonymous"
+      exec compile("\n".join(self.lines) + "\n", "<%s %s>" % (type(self).__module__, name), "exec") in ns
+      return ns[fname]
+
+
+class _Generator(_CodeGenerator):
+   # Emits code writing values of a given schema type with constant keys and
+   # no per value type dispatch, falling back to the generic path for values that
+   # don't match their declared type
+   def __init__(self, compact):
+      super(_Generator, self).__init__()
+      self.compact = compact
+
+   def generic(self, level, v, ind):
+      if self.compact:
+         self.emit(level, "ser._compact(%s)" % v)
+      else:
+         self.emit(level, "ser._pretty(%s, %s)" % (v, ind))
+
+   def guard(self, t, v, depth):
+      # Condition under which v can be written with the code from body
+      t = _resolve(t)
+      if isinstance(t, das.schematypes.String):
+         return "type(%s) is str or type(%s) is unicode" % (v, v)
+      elif isinstance(t, (das.schematypes.Boolean, das.schematypes.Integer, das.schematypes.Real)):
+         return "type(%s) in _Numbers" % v
+      elif isinstance(t, das.schematypes.Tuple):
+         return "isinstance(%s, tuple)" % v
+      elif depth < _MaxInlineDepth and isinstance(t, das.schematypes.Sequence):
+         return "isinstance(%s, list)" % v
+      elif depth < _MaxInlineDepth and isinstance(t, das.schematypes.Set):
+         return "isinstance(%s, set)" % v
+      else:
+         return None
+
+   def body(self, level, t, v, ind, depth):
+      t = _resolve(t)
+      if isinstance(t, das.schematypes.String):
+         self.emit(level, "append(_string(%s, encoding, %s))" % (v, not self.compact))
+      elif isinstance(t, (das.schematypes.Sequence, das.schematypes.Set)):
+         isset = isinstance(t, das.schematypes.Set)
+         e = self.var("e")
+         it = ("set.__iter__(%s)" if isset else "list.__iter__(%s)") % v
+         if self.compact:
+            first = self.var("first")
+            self.emit(level, "append(%s)" % repr("set([" if isset else "["))
+            self.emit(level, "%s = True" % first)
+            self.emit(level, "for %s in %s:" % (e, it))
+            self.emit(level + 1, "if %s:" % first)
+            self.emit(level + 2, "%s = False" % first)
+            self.emit(level + 1, "else:")
+            self.emit(level + 2, "append(', ')")
+            self.value(level + 1, t.type, e, None, depth + 1)
+            self.emit(level, "append(%s)" % repr("])" if isset else "]"))
+         else:
+            i, n, c = self.var("i"), self.var("n"), self.var("cindent")
+            self.emit(level, "%s = %s + ser.indent" % (c, ind))
+            self.emit(level, "%s = len(%s)" % (n, v))
+            self.emit(level, "append(%s)" % repr("set([\n" if isset else "[\n"))
+            self.emit(level, "for %s, %s in enumerate(%s):" % (i, e, it))
+            self.emit(level + 1, "append(%s)" % c)
+            self.value(level + 1, t.type, e, c, depth + 1)
+            self.emit(level + 1, "append('\\n' if %s + 1 >= %s else ',\\n')" % (i, n))
+            self.emit(level, "append(%s + %s)" % (ind, repr("])" if isset else "]")))
+      else:
+         self.emit(level, "append(repr(%s))" % v)
+
+   def value(self, level, t, v, ind, depth):
+      cond = self.guard(t, v, depth)
+      if cond is None:
+         self.generic(level, v, ind)
+      else:
+         self.emit(level, "if %s:" % cond)
+         self.body(level + 1, t, v, ind, depth)
+         self.emit(level, "else:")
+         self.generic(level + 1, v, ind)
+
+   def struct(self, st, order):
+      # Only Struct values whose keys are all fields of st, in the order of st, are
+      # handled here
+      self.struct_layout(order, False)
+      self.emit(1, "append = ser.out.append")
+      self.emit(1, "encoding = ser.encoding")
+      if self.compact:
+         self.emit(1, "append('{')")
+         self.emit(1, "sep = ''")
+      else:
+         self.emit(1, "cindent = tindent + ser.indent")
+         self.emit(1, "append('{\\n')")
+      for k, t, v in self.struct_fields(st, order):
+         if self.compact:
+            self.emit(2, "append(sep + %s)" % repr(repr(k) + ": "))
+            self.emit(2, "sep = ', '")
+            self.value(2, t, v, None, 1)
+         else:
+            self.emit(2, "left -= 1")
+            self.emit(2, "append(cindent + %s)" % repr(repr(k) + ": "))
+            self.value(2, t, v, "cindent", 1)
+            self.emit(2, "append(',\\n' if left else '\\n')")
+      self.emit(1, "append('}')" if self.compact else "append(tindent + '}')")
+
+   def container(self, st):
+      self.emit(1, "if not %s:" % self.guard(st, "d", 0))
+      self.emit(2, "return False")
+      self.emit(1, "append = ser.out.append")
+      self.emit(1, "encoding = ser.encoding")
+      self.body(1, st, "d", "tindent", 0)
+
+   def generate(self, st, order):
+      self.emit(0, "def write(ser, d, tindent):")
+      if isinstance(st, das.schematypes.Struct):
+         try:
+            for k in order:
+               _check_key(k)
+         except:
+            return None
+         self.struct(st, order)
+      elif isinstance(st, (das.schematypes.Sequence, das.schematypes.Set)):
+         self.container(st)
+      else:
+         return None
+      self.emit(1, "return True")
+      return self.build(st, "write", {"_Numbers": _Numbers, "_string": _string})
+
+
+def _writer(d, compact):
+   # Returns a function writing d or None, the function itself returns False when
+   # d doesn't match the layout it was generated for
+   st = d._get_schema_type()
+   if st is None:
+      return None
+   order = (st.ordered_keys() if isinstance(st, das.schematypes.Struct) else None)
+   # Functions are kept on the schema type like compiled validators, False when none can be generated
+   return (st._compiled_function(("write", compact), lambda: _Generator(compact).generate(st, order) or False, load=False) or None)
+
+
+class Serializer(object):
+   # indent=None produces compact single line output
+   def __init__(self, stream, indent="  ", encoding=None):
+      super(Serializer, self).__init__()
+      self.stream = stream
+      self.indent = indent
+      self.encoding = encoding
+      self.out = []
+      # Bytes written to stream so far
+      self.size = 0
+
+   def flush(self):
+      if self.out:
+         s = "".join(self.out)
+         self.stream.write(s)
+         self.size += len(s)
+         del(self.out[:])
+
+   def dump(self, d, depth=0, inline=False, eof=True):
+      if self.indent is None:
+         self._compact(d)
+      else:
+         tindent = self.indent * depth
+         if not inline:
+            self.out.append(tindent)
+         self._pretty(d, tindent)
+      if eof:
+         self.out.append("\n")
+      self.flush()
+
+   def dump_fields(self, d, eof=True):
+      # Same output as dump for Struct d, returns the [(key, offset, size)] of its fields
+      # values, offsets being relative to the start of the output
+      keys = _struct_keys(d)
+      get = d._dict.__getitem__
+      rv = []
+      n = len(keys)
+      self.flush()
+      start = self.size
+      self.out.append("{" if self.indent is None else "{\n")
+      for i, k in enumerate(keys):
+         if self.indent is None:
+            self.out.append("%s%s: " % (", " if i > 0 else "", repr(k)))
+         else:
+            self.out.append("%s%s: " % (self.indent, repr(k)))
+         self.flush()
+         offset = self.size
+         if self.indent is None:
+            self._compact(get(k))
+         else:
+            self._pretty(get(k), self.indent)
+         self.flush()
+         rv.append((k, offset - start, self.size - offset))
+         if self.indent is not None:
+            self.out.append("\n" if i + 1 >= n else ",\n")
+      self.out.append("}")
+      if eof:
+         self.out.append("\n")
+      self.flush()
+      return rv
+
+   def _pretty(self, d, tindent):
+      out = self.out
+      append = out.append
+      if isinstance(d, das.types.TypeBase):
+         write = _writer(d, False)
+         if write is not None and write(self, d, tindent):
+            if len(out) > _FlushChunks:
+               self.flush()
+            return
+      if isinstance(d, das.types.Struct):
+         keys = _struct_keys(d)
+         get = d._dict.__getitem__
+      elif isinstance(d, dict):
+         keys = _dict_keys(d)
+         get = dict.__getitem__.__get__(d)
+      elif isinstance(d, list):
+         cindent = tindent + self.indent
+         n = len(d)
+         append("[\n")
+         for i, v in enumerate(list.__iter__(d)):
+            append(cindent)
+            self._pretty(v, cindent)
+            append("\n" if i + 1 >= n else ",\n")
+         append(tindent + "]")
+         if len(out) > _FlushChunks:
+            self.flush()
+         return
+      elif isinstance(d, set):
+         cindent = tindent + self.indent
+         n = len(d)
+         append("set([\n")
+         for i, v in enumerate(set.__iter__(d)):
+            append(cindent)
+            self._pretty(v, cindent)
+            append("\n" if i + 1 >= n else ",\n")
+         append(tindent + "])")
+         if len(out) > _FlushChunks:
+            self.flush()
+         return
+      elif isinstance(d, basestring):
+         append(_string(d, self.encoding, True))
+         return
+      else:
+         append(repr(d))
+         return
+
+      cindent = tindent + self.indent
+      n = len(keys)
+      append("{\n")
+      for i, k in enumerate(keys):
+         append("%s%s: " % (cindent, repr(k)))
+         self._pretty(get(k), cindent)
+         append("\n" if i + 1 >= n else ",\n")
+      append(tindent + "}")
+      if len(out) > _FlushChunks:
+         self.flush()
+
+   def _compact(self, d):
+      out = self.out
+      append = out.append
+      if isinstance(d, das.types.TypeBase):
+         write = _writer(d, True)
+         if write is not None and write(self, d, None):
+            if len(out) > _FlushChunks:
+               self.flush()
+            return
+      if isinstance(d, das.types.Struct):
+         keys = _struct_keys(d)
+         get = d._dict.__getitem__
+      elif isinstance(d, dict):
+         keys = _dict_keys(d)
+         get = dict.__getitem__.__get__(d)
+      elif isinstance(d, (list, set)):
+         isset = isinstance(d, set)
+         append("set([" if isset else "[")
+         first = True
+         for v in (set.__iter__(d) if isset else list.__iter__(d)):
+            if first:
+               first = False
+            else:
+               append(", ")
+            self._compact(v)
+         append("])" if isset else "]")
+         if len(out) > _FlushChunks:
+            self.flush()
+         return
+      elif isinstance(d, basestring):
+         append(_string(d, self.encoding, False))
+         return
+      else:
+         append(repr(d))
+         return
+
+      append("{")
+      first = True
+      for k in keys:
+         if first:
+            first = False
+         else:
+            append(", ")
+         append(repr(k))
+         append(": ")
+         self._compact(get(k))
+      append("}")
+      if len(out) > _FlushChunks:
+         self.flush()
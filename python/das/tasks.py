@@ -0,0 +1,192 @@
+import os
+import Queue
+import threading
+import das
+
+
+class CancelledError(Exception):
+   def __init__(self, msg="Task cancelled"):
+      super(CancelledError, self).__init__(msg)
+
+
+class TimeoutError(Exception):
+   def __init__(self, msg):
+      super(TimeoutError, self).__init__(msg)
+
+
+_Current = threading.local()
+
+
+def current():
+   return getattr(_Current, "task", None)
+
+
+def checkpoint():
+   # Stops the current task if it was cancelled while running
+   task = current()
+   if task is not None and task._cancel_requested:
+      raise CancelledError()
+
+
+class Task(object):
+   # Mirrors the concurrent.futures.Future interface so that event loops can wrap it
+
+   PENDING = 0
+   RUNNING = 1
+   FINISHED = 2
+   CANCELLED = 3
+
+   def __init__(self, fn, args=(), kwargs=None):
+      super(Task, self).__init__()
+      self.fn = fn
+      self.args = args
+      self.kwargs = ({} if kwargs is None else kwargs)
+      self.state = Task.PENDING
+      self.value = None
+      self.error = None
+      self.callbacks = []
+      self._cancel_requested = False
+      self._cond = threading.Condition()
+
+   def run(self):
+      with self._cond:
+         if self.state != Task.PENDING:
+            return
+         self.state = Task.RUNNING
+      _Current.task = self
+      try:
+         value = self.fn(*self.args, **self.kwargs)
+         error = None
+      except Exception, e:
+         value, error = None, e
+      finally:
+         _Current.task = None
+      with self._cond:
+         self.value = value
+         self.error = error
+         self.state = (Task.CANCELLED if isinstance(error, CancelledError) else Task.FINISHED)
+         self._cond.notify_all()
+      self._run_callbacks()
+
+   def _run_callbacks(self):
+      for cb in self.callbacks:
+         try:
+            cb(self)
+         except Exception, e:
+            das.print_once("[das] Task callback failed (%s)" % e)
+
+   def cancel(self):
+      # Like Future.cancel, only pending tasks can be cancelled. Running ones are still asked
+      #   to stop at their next checkpoint (best effort, one that doesn't reach it finishes normally)
+      with self._cond:
+         if self.state in (Task.FINISHED, Task.CANCELLED):
+            return (self.state == Task.CANCELLED)
+         self._cancel_requested = True
+         if self.state == Task.RUNNING:
+            return False
+         self.state = Task.CANCELLED
+         self.error = CancelledError()
+         self._cond.notify_all()
+      self._run_callbacks()
+      return True
+
+   def cancelled(self):
+      return (self.state == Task.CANCELLED)
+
+   def running(self):
+      return (self.state == Task.RUNNING)
+
+   def done(self):
+      return (self.state in (Task.FINISHED, Task.CANCELLED))
+
+   def wait(self, timeout=None):
+      with self._cond:
+         if not self.done():
+            self._cond.wait(timeout)
+         return self.done()
+
+   def result(self, timeout=None):
+      if not self.wait(timeout):
+         raise TimeoutError("Task not done after %s second(s)" % timeout)
+      if self.error is not None:
+         raise self.error
+      return self.value
+
+   def exception(self, timeout=None):
+      if not self.wait(timeout):
+         raise TimeoutError("Task not done after %s second(s)" % timeout)
+      return self.error
+
+   def add_done_callback(self, fn):
+      with self._cond:
+         if not self.done():
+            self.callbacks.append(fn)
+            return
+      fn(self)
+
+
+class Executor(object):
+   def __init__(self, max_workers=4):
+      super(Executor, self).__init__()
+      self.max_workers = max(1, max_workers)
+      self.queue = Queue.Queue()
+      self.threads = []
+      self.lock = threading.Lock()
+      self.shutdown_requested = False
+
+   def submit(self, fn, *args, **kwargs):
+      task = Task(fn, args, kwargs)
+      with self.lock:
+         if self.shutdown_requested:
+            raise RuntimeError("Cannot submit tasks after shutdown")
+         self.queue.put(task)
+         if len(self.threads) < self.max_workers:
+            t = threading.Thread(target=self._work, name="das.tasks.Executor")
+            t.daemon = True
+            t.start()
+            self.threads.append(t)
+      return task
+
+   def _work(self):
+      while True:
+         task = self.queue.get()
+         if task is None:
+            return
+         task.run()
+
+   def shutdown(self, wait=True):
+      with self.lock:
+         self.shutdown_requested = True
+         threads = self.threads[:]
+      for _ in threads:
+         self.queue.put(None)
+      if wait:
+         for t in threads:
+            t.join()
+
+
+_DefaultExecutor = None
+_DefaultWorkers = 4
+try:
+   _DefaultWorkers = max(1, int(os.environ.get("DAS_TASK_WORKERS", "4")))
+except:
+   pass
+
+
+def get_executor():
+   global _DefaultExecutor
+   if _DefaultExecutor is None:
+      _DefaultExecutor = Executor(max_workers=_DefaultWorkers)
+   return _DefaultExecutor
+
+
+def set_executor(executor):
+   # Any object with a concurrent.futures.Executor like 'submit' method
+   global _DefaultExecutor
+   _DefaultExecutor = executor
+
+
+def submit(executor, fn, *args, **kwargs):
+   if executor is None:
+      executor = get_executor()
+   return executor.submit(fn, *args, **kwargs)
@@ -1,5 +1,6 @@
 import sys
 import das
+import threading
 import traceback
 
 
@@ -48,6 +49,133 @@ class GlobalValidationDisabled(object):
       return False
 
 
+class Transaction(object):
+   # Defers validation of data mutations to the end of the block, where each modified
+   # object (and its parents) is validated once
+   # Data is restored to its original state when validation or anything else in the block fails
+   # Transactions nested in one covering the same data join it
+   # Objects content is saved before their first change (see TypeBase._will_change)
+
+   # Number of transactions in progress, objects only look for theirs when not 0
+   Active = 0
+   _Lock = threading.Lock()
+
+   def __init__(self, data):
+      super(Transaction, self).__init__()
+      if not isinstance(data, TypeBase):
+         raise Exception("Expected a das.types.TypeBase instance, got %s" % type(data).__name__)
+      self.data = data
+      self.joined = False
+      # id(object) -> (object, saved content)
+      self.saved = {}
+      # Objects whose validation was deferred, in order
+      self.touched = []
+      self.touchedids = set()
+
+   def _save(self, d):
+      # Saves content of d (not its children) and marks it as part of the transaction
+      # Raw methods are used to skip value adaptation and global validator transfers
+      if id(d) in self.saved:
+         return
+      if isinstance(d, Struct):
+         dd = d._dict
+         if isinstance(dd, das.lazy.LazyDict):
+            content = dd._snapshot()
+         else:
+            content = dd.copy()
+      elif isinstance(d, Sequence):
+         content = list(list.__iter__(d))
+      elif isinstance(d, Set):
+         content = set(set.__iter__(d))
+      elif isinstance(d, Dict):
+         content = dict.copy(d)
+      else:
+         # Tuples are immutable
+         content = None
+      self.saved[id(d)] = (d, content)
+      d.__dict__["_transaction"] = self
+
+   def _restore(self):
+      for d, content in self.saved.itervalues():
+         if content is None:
+            continue
+         if isinstance(d, Struct):
+            dd = d._dict
+            if isinstance(dd, das.lazy.LazyDict):
+               dd._restore(content)
+            else:
+               dd.clear()
+               dd.update(content)
+         elif isinstance(d, Sequence):
+            list.__delslice__(d, 0, list.__len__(d))
+            list.extend(d, content)
+         elif isinstance(d, Set):
+            set.clear(d)
+            set.update(d, content)
+         elif isinstance(d, Dict):
+            dict.clear(d)
+            dict.update(d, content)
+
+   def _release(self):
+      for d, _ in self.saved.itervalues():
+         d.__dict__.pop("_transaction", None)
+
+   def _defer(self, d):
+      if not id(d) in self.touchedids:
+         self.touchedids.add(id(d))
+         self.touched.append(d)
+
+   def _commit(self):
+      # Parents are validated after their modified children
+      pending = []
+      seen = set()
+      callbacks = []
+      for d in self.touched:
+         while d is not None and not id(d) in seen:
+            seen.add(id(d))
+            pending.append(d)
+            gvcb = d._get_validate_globally_cb()
+            d = getattr(gvcb, "__self__", None)
+            if not isinstance(d, TypeBase):
+               if gvcb is not None:
+                  callbacks.append(gvcb)
+               d = None
+      for d in pending:
+         d._gvalidate(callback=False)
+      for gvcb in callbacks:
+         gvcb()
+
+   def __enter__(self):
+      if self.data._get_transaction() is not None:
+         self.joined = True
+      else:
+         with Transaction._Lock:
+            Transaction.Active += 1
+         self._save(self.data)
+      return self.data
+
+   def __exit__(self, type, value, traceback):
+      if self.joined:
+         return False
+      self._release()
+      with Transaction._Lock:
+         Transaction.Active -= 1
+      try:
+         if type is None:
+            self._commit()
+      except:
+         self._restore()
+         raise
+      else:
+         if type is not None:
+            self._restore()
+      finally:
+         self.saved = {}
+         self.touched = []
+         self.touchedids = set()
+      return False
+
+
 class TypeBase(object):
    @classmethod
    def TransferGlobalValidator(klass, src, dst):
@@ -58,7 +186,7 @@ class TypeBase(object):
    @classmethod
    def ValidateGlobally(klass, inst):
       if isinstance(inst, klass):
-         inst._gvalidate()
+         inst._gvalidate(changed=False)
       return inst
 
    def __init__(self):
@@ -66,6 +194,8 @@ class TypeBase(object):
       self.__dict__["_schema_type"] = None
       self.__dict__["_validate_globally_cb"] = None
       self.__dict__["_global_validation_enabled"] = True
+      # TypeValidator.Generation when last validated against _schema_type, None once modified
+      self.__dict__["_validated"] = None
 
    def _wrap(self, rhs):
       st = self._get_schema_type()
@@ -80,10 +210,45 @@ class TypeBase(object):
       if schema_type is None:
          schema_type = self._get_schema_type()
       if schema_type is not None:
-         schema_type.validate(self)
+         # Descendants validated since their last modification are skipped
+         # self is always checked, catching direct changes to its raw content
+         self.__dict__["_validated"] = None
+         schema_type.compile(reuse=True)(self)
       self._set_schema_type(schema_type)
 
-   def _gvalidate(self):
+   def _dirty(self):
+      # Clears validation stamps of self and its parents
+      d = self
+      while isinstance(d, TypeBase):
+         d.__dict__["_validated"] = None
+         d = getattr(d.__dict__["_validate_globally_cb"], "__self__", None)
+
+   def _get_transaction(self):
+      # Transaction self is part of, directly or through its parents
+      d = self
+      while isinstance(d, TypeBase):
+         tr = d.__dict__.get("_transaction", None)
+         if tr is not None:
+            return tr
+         d = getattr(d.__dict__["_validate_globally_cb"], "__self__", None)
+      return None
+
+   def _will_change(self):
+      # Called before any change to self content, saves it for the transaction self is part of
+      if Transaction.Active and not "_transaction" in self.__dict__:
+         tr = self._get_transaction()
+         if tr is not None:
+            tr._save(self)
+
+   def _gvalidate(self, callback=True, changed=True):
+      # callback: also validate parent object
+      # changed: object was modified
+      if changed:
+         self._dirty()
+      tr = self.__dict__.get("_transaction", None)
+      if tr is not None:
+         tr._defer(self)
+         return
       st = self._get_schema_type()
       if st is not None:
          # run self validation first (container validation)
@@ -93,7 +258,7 @@ class TypeBase(object):
                # Skip global validaton
                return
          gvcb = self._get_validate_globally_cb()
-         if gvcb is not None:
+         if callback and gvcb is not None:
             gvcb()
          if hasattr(self, "_validate_globally"):
             try:
@@ -107,6 +272,8 @@ class TypeBase(object):
       return self.__dict__["_schema_type"]
 
    def _set_schema_type(self, schema_type):
+      if schema_type is not self.__dict__["_schema_type"]:
+         self.__dict__["_validated"] = None
       self.__dict__["_schema_type"] = schema_type
 
    def _get_validate_globally_cb(self):
@@ -157,6 +324,7 @@ class Sequence(TypeBase, list):
          return i
 
    def __imul__(self, n):
+      self._will_change()
       oldlen = len(self)
       super(Sequence, self).__imul__(n)
       try:
@@ -179,6 +347,7 @@ class Sequence(TypeBase, list):
       return self.__mul__(n)
 
    def __iadd__(self, y):
+      self._will_change()
       n = len(self)
       super(Sequence, self).__iadd__([self._adapt_value(x, index=n+i) for i, x in enumerate(y)])
       try:
@@ -198,6 +367,7 @@ class Sequence(TypeBase, list):
       return rv
 
    def __setitem__(self, i, y):
+      self._will_change()
       super(Sequence, self).__setitem__(i, self._adapt_value(y, index=i))
       self._gvalidate()
 
@@ -205,6 +375,7 @@ class Sequence(TypeBase, list):
       return TypeBase.TransferGlobalValidator(self, super(Sequence, self).__getitem__(i))
 
    def __delitem__(self, i):
+      self._will_change()
       ii = self._wrap_index(i, clamp=False)
       item = super(Sequence, self).__getitem__(ii)
       super(Sequence, self).__delitem__(i)
@@ -223,6 +394,7 @@ class Sequence(TypeBase, list):
          yield TypeBase.TransferGlobalValidator(self, item)
 
    def __setslice__(self, i, j, y):
+      self._will_change()
       oldvals = super(Sequence, self).__getslice__(i, j)
       newvals = [self._adapt_value(x, index=i+k) for k, x in enumerate(y)]
       super(Sequence, self).__setslice__(i, j, newvals)
@@ -241,6 +413,7 @@ class Sequence(TypeBase, list):
       return self._wrap(super(Sequence, self).__getslice__(i, j))
 
    def __delslice__(self, i, j):
+      self._will_change()
       oldvals = super(Sequence, self).__getslice__(i, j)
       super(Sequence, self).__delslice__(i, j)
       try:
@@ -265,6 +438,7 @@ class Sequence(TypeBase, list):
       return super(Sequence, self).index(self._adapt_value(y, index=0))
 
    def insert(self, i, y):
+      self._will_change()
       super(Sequence, self).insert(i, self._adapt_value(y, index=i))
       try:
          self._gvalidate()
@@ -277,6 +451,7 @@ class Sequence(TypeBase, list):
          raise ec, ei, tb
 
    def append(self, y):
+      self._will_change()
       n = len(self)
       super(Sequence, self).append(self._adapt_value(y, index=n))
       try:
@@ -290,6 +465,7 @@ class Sequence(TypeBase, list):
          raise ec, ei, tb
 
    def extend(self, y):
+      self._will_change()
       newvals = [self._adapt_value(x, index=len(self)+i) for i, x in enumerate(y)]
       super(Sequence, self).extend(newvals)
       try:
@@ -303,6 +479,7 @@ class Sequence(TypeBase, list):
          raise ec, ei, tb
 
    def pop(self, *args):
+      self._will_change()
       rv = super(Sequence, self).pop(*args)
       try:
          self._gvalidate()
@@ -319,6 +496,7 @@ class Sequence(TypeBase, list):
       return rv
 
    def remove(self, y):
+      self._will_change()
       idx = self.index(y)
       item = self[idx]
       super(Sequence, self).remove(item)
@@ -339,6 +517,7 @@ class Set(TypeBase, set):
       set.__init__(self, args)
 
    def __iand__(self, y):
+      self._will_change()
       oldvals = super(Set, self).copy()
       super(Set, self).__iand__(set([self._adapt_value(x, index=i) for i, x in enumerate(y)]))
       try:
@@ -362,6 +541,7 @@ class Set(TypeBase, set):
       return self.__and__(y)
 
    def __isub__(self, y):
+      self._will_change()
       oldvals = super(Set, self).copy()
       super(Set, self).__isub__(set([self._adapt_value(x, index=i) for i, x in enumerate(y)]))
       try:
@@ -385,6 +565,7 @@ class Set(TypeBase, set):
       return self.__sub__(y)
 
    def __ior__(self, y):
+      self._will_change()
       oldvals = super(Set, self).copy()
       super(Set, self).__ior__(set([self._adapt_value(x, index=i) for i, x in enumerate(y)]))
       try:
@@ -408,6 +589,7 @@ class Set(TypeBase, set):
       return self.__or__(y)
 
    def __ixor__(self, y):
+      self._will_change()
       oldvals = super(Set, self).copy()
       super(Set, self).__ixor__(set([self._adapt_value(x, index=i) for i, x in enumerate(y)]))
       try:
@@ -447,6 +629,7 @@ class Set(TypeBase, set):
          yield TypeBase.TransferGlobalValidator(self, item)
 
    def clear(self):
+      self._will_change()
       oldvals = super(Set, self).copy()
       super(Set, self).clear()
       try:
@@ -463,6 +646,7 @@ class Set(TypeBase, set):
       return self._wrap(self)
 
    def add(self, e):
+      self._will_change()
       ae = self._adapt_value(e, index=len(self))
       if ae in self:
          return
@@ -478,6 +662,7 @@ class Set(TypeBase, set):
          raise ec, ei, tb
 
    def update(self, *args):
+      self._will_change()
       added = set()
       for y in args:
          lst = [self._adapt_value(x, index=i) for i, x in enumerate(y)]
@@ -498,6 +683,7 @@ class Set(TypeBase, set):
          raise ec, ei, tb
 
    def pop(self):
+      self._will_change()
       item = super(Set, self).pop()
       try:
          self._gvalidate()
@@ -533,6 +719,7 @@ class Dict(TypeBase, dict):
       return (key if st is None else das.adapt_value(key, schema_type=st.ktype))
 
    def __setitem__(self, k, v):
+      self._will_change()
       k = self._adapt_key(k)
       wasset = (k in self)
       oldval = (self[k] if wasset else None)
@@ -554,6 +741,7 @@ class Dict(TypeBase, dict):
       return TypeBase.TransferGlobalValidator(self, super(Dict, self).__getitem__(self._adapt_key(k)))
 
    def __delitem__(self, k):
+      self._will_change()
       _k = self._adapt_key(k)
       _v = super(Dict, self).__getitem__(_k)
       super(Dict, self).__delitem__(_k)
@@ -575,14 +763,17 @@ class Dict(TypeBase, dict):
    #       return False
 
    def setdefault(self, *args):
+      self._will_change()
       if len(args) >= 2:
          args[1] = self._adapt_value(args[1], key=args[0])
+      self._dirty()
       super(Dict, self).setdefault(*args)
 
    def copy(self):
       return self._wrap(self)
 
    def update(self, *args, **kwargs):
+      self._will_change()
       oldvals = {}
       remvals = set()
       if len(args) == 1:
@@ -627,6 +818,7 @@ class Dict(TypeBase, dict):
          raise ec, ei, tb
 
    def pop(self, k, *args):
+      self._will_change()
       _k = self._adapt_key(k)
       _v = super(Dict, self).pop(_k, *args)
       try:
@@ -644,6 +836,7 @@ class Dict(TypeBase, dict):
       return _v
 
    def popitem(self):
+      self._will_change()
       item = super(Dict, self).popitem()
       try:
          self._gvalidate()
@@ -657,6 +850,7 @@ class Dict(TypeBase, dict):
       return item
 
    def clear(self):
+      self._will_change()
       items = super(Dict, self).items()
       super(Dict, self).clear()
       try:
@@ -709,6 +903,7 @@ class Struct(TypeBase):
             return self.__getattribute__(k)
 
    def __setattr__(self, k, v):
+      self._will_change()
       # Special case for __class__ member that we may want to modify for 
       #   to enable dynamic function set binding
       if k == "__class__":
@@ -733,6 +928,7 @@ class Struct(TypeBase):
             raise ec, ei, tb
 
    def __delattr__(self, k):
+      self._will_change()
       k = self._get_alias(k)
       oldval = self._dict.get(k, None)
       self._dict.__delitem__(k)
@@ -752,6 +948,7 @@ class Struct(TypeBase):
       return TypeBase.TransferGlobalValidator(self, self._dict.__getitem__(k))
 
    def __setitem__(self, k, v):
+      self._will_change()
       k = self._get_alias(k)
       self._check_reserved(k)
       wasset = (k in self._dict)
@@ -771,6 +968,7 @@ class Struct(TypeBase):
          raise ec, ei, tb
 
    def __delitem__(self, k):
+      self._will_change()
       _k = k
       k = self._get_alias(k)
       oldval = self._dict.get(k, None)
@@ -825,6 +1023,7 @@ class Struct(TypeBase):
 
    # Override of dict.pop
    def _pop(self, k, *args):
+      self._will_change()
       _k = k
       k = self._get_alias(k)
       oldval = self._dict.get(k, None)
@@ -842,6 +1041,7 @@ class Struct(TypeBase):
 
    # Override of dict.popitem
    def _popitem(self):
+      self._will_change()
       k, v = self._dict.popitem()
       try:
          self._gvalidate()
@@ -855,6 +1055,7 @@ class Struct(TypeBase):
 
    # Override of dict.clear
    def _clear(self):
+      self._will_change()
       items = self._dict.items()
       self._dict.clear()
       try:
@@ -873,14 +1074,17 @@ class Struct(TypeBase):
 
    # Override of dict.setdefault
    def _setdefault(self, *args):
+      self._will_change()
       if len(args) >= 1:
          self._check_reserved(args[0])
       if len(args) >= 2:
          args[1] = self._adapt_value(args[1], key=args[0])
+      self._dirty()
       self._dict.setdefault(*args)
 
    # Override of dict.update
    def _update(self, *args, **kwargs):
+      self._will_change()
       if len(args) > 1:
          raise Exception("update expected at most 1 arguments, got %d" % len(args))
 
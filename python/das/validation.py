@@ -277,9 +277,13 @@ class SchemaTypesRegistry(object):
       self.cache["name_to_schema"] = nts
       self.cache["name_to_type"] = ntt
       self.cache["type_to_name"] = ttn
+      # Compiled validation functions may refer to previous schema types
+      das.schematypes.TypeValidator.invalidate()
       for st in self.cache["type_to_name"]:
          if isinstance(st, das.schematypes.Struct):
             st.load_extensions()
+      # Values read with previous schema types are not valid anymore
+      das.cache.ReadCache.instance.clear()
 
    def load_schemas(self, paths=None, incremental=False, force=False):
       incremental = (paths is not None)
@@ -473,6 +477,9 @@ class SchemaTypesRegistry(object):
          props = self.properties.get(name, {})
          props[pname] = pvalue
          self.properties[name] = props
+         das.schematypes.TypeValidator.invalidate()
+         # Cached values may have been read with different mixins bound
+         das.cache.ReadCache.instance.clear()
          return True
 
    def get_schema_type_property(self, name, pname, default=None):
@@ -0,0 +1,98 @@
+# -*- coding: utf8 -*-
+import os
+import unittest
+import das
+
+class TestCase(unittest.TestCase):
+   TestDir = None
+   InputFile = None
+   OutputFile = None
+
+   @classmethod
+   def setUpClass(cls):
+      cls.TestDir = os.path.abspath(os.path.dirname(__file__))
+      cls.InputFile = cls.TestDir + "/in.items"
+      cls.OutputFile = cls.TestDir + "/out.items"
+      os.environ["DAS_SCHEMA_PATH"] = cls.TestDir
+
+   def setUp(self):
+      self.addCleanup(self.cleanUp)
+
+   def tearDown(self):
+      pass
+
+   def cleanUp(self):
+      if os.path.isfile(self.OutputFile):
+         os.remove(self.OutputFile)
+
+   @classmethod
+   def tearDownClass(cls):
+      del(os.environ["DAS_SCHEMA_PATH"])
+
+   # Test functions
+
+   def testLiterals(self):
+      rv = das.read_string("{'a': [1, -2.5, 3L, 0x10, True, None], 'b': (1,), 'c': (), 'd': set([1]), 'e': 'x' \"y\"}")
+      self.assertEqual(rv, {"a": [1, -2.5, 3L, 16, True, None], "b": (1,), "c": (), "d": set([1]), "e": "xy"})
+
+   def testEncoding(self):
+      rv = das.read_string("['\xe5\x8c\x97', u'\\u5ddd', 'abc']", encoding="utf8")
+      self.assertEqual(rv, [u"北", u"川", "abc"])
+      self.assertIsInstance(rv[2], str)
+
+   def testUnknownName(self):
+      with self.assertRaises(das.ParseError):
+         das.read_string("__import__('os').getcwd()")
+
+   def testSyntaxError(self):
+      with self.assertRaises(das.ParseError):
+         das.read_string("{'a': 1 'b': 2}")
+
+   def testRead(self):
+      items = das.read(self.InputFile)
+      self.assertEqual(len(items), 2)
+      self.assertEqual(items[0].attr.attr, "visibility")
+      self.assertEqual(items[0].attr.encoding, "utf8")
+      self.assertEqual(items[0].tags, set(["prop", u"椅子"]))
+      self.assertEqual(items[1].frames, (-10, 16))
+      self.assertEqual(items[1].tags, set(["prop", u"北川"]))
+
+   def testRoundTrip(self):
+      items = das.read(self.InputFile)
+      das.write(items, self.OutputFile)
+      self.assertEqual(das.read(self.OutputFile), items)
+
+   def testValidated(self):
+      sch = das.get_schema_type("literal.Items")
+      with open(self.InputFile, "r") as f:
+         content = f.read()
+      names = {"Attribute": das.get_schema_module("literal.Items").Attribute}
+      rv = das.read(self.InputFile)
+      self.assertIsInstance(rv, das.types.Sequence)
+      self.assertIsInstance(rv[0], das.types.Struct)
+      self.assertIsInstance(rv[1].frames, das.types.Tuple)
+      self.assertIsInstance(rv[1].tags, das.types.Set)
+      self.assertEqual(rv, sch.validate(das.parser.parse(content, names=names, encoding="utf8")))
+
+   def testValidationError(self):
+      s = "[{'name': 'chair', 'frames': (1, 'a'), 'tags': set()}]"
+      with self.assertRaises(das.ValidationError) as ctx:
+         das.read_string(s, schema_type="literal.Items")
+      with self.assertRaises(das.ValidationError) as ctx2:
+         das.get_schema_type("literal.Items").validate(das.read_string(s))
+      self.assertEqual(str(ctx.exception), str(ctx2.exception))
+
+   def testTokenizeChunks(self):
+      s = "[\n   'a',\n   '''b\n\nc''', # comment\n   'd\\\n', 1,\n   2]\n# end\n"
+      tokens = das.parser._Token.findall(s)
+      while tokens[-1] == das.parser._EndToken:
+         tokens.pop()
+      for blocks in (das.parser._text_blocks(s, blocksize=1), das.parser._line_blocks(s.splitlines(True), blocksize=1)):
+         chunked = []
+         for block in blocks:
+            chunk = das.parser._Token.findall(block)
+            while chunk and chunk[-1] == das.parser._EndToken:
+               chunk.pop()
+            chunked.extend(chunk)
+         self.assertEqual(chunked, tokens)
+      self.assertEqual(das.read_string(s), ["a", "b\n\nc", "d", 1, 2])
@@ -0,0 +1,22 @@
+__all__ = ["Attribute"]
+
+class Attribute(object):
+   def __init__(self, attr=""):
+      super(Attribute, self).__init__()
+      self.attr = attr
+      self.encoding = None
+
+   def copy(self):
+      rv = Attribute(self.attr)
+      rv.encoding = self.encoding
+      return rv
+
+   def _decode(self, encoding):
+      self.encoding = encoding
+      return self
+
+   def __repr__(self):
+      return "Attribute(%s)" % repr(self.attr)
+
+   def __cmp__(self, oth):
+      return cmp(repr(self), repr(oth))
@@ -0,0 +1,59 @@
+# -*- coding: utf8 -*-
+import os
+import unittest
+import das
+
+class TestCase(unittest.TestCase):
+   TestDir = None
+   InputFile = None
+   ErrorFile = None
+
+   @classmethod
+   def setUpClass(cls):
+      cls.TestDir = os.path.abspath(os.path.dirname(__file__))
+      cls.InputFile = cls.TestDir + "/in.shots"
+      cls.ErrorFile = cls.TestDir + "/error.shots"
+      os.environ["DAS_SCHEMA_PATH"] = cls.TestDir
+
+   def setUp(self):
+      self.addCleanup(self.cleanUp)
+
+   def tearDown(self):
+      pass
+
+   def cleanUp(self):
+      pass
+
+   @classmethod
+   def tearDownClass(cls):
+      del(os.environ["DAS_SCHEMA_PATH"])
+
+   # Test functions
+
+   def testIterRead(self):
+      shots = list(das.iterread(self.InputFile))
+      self.assertEqual(shots, list(das.read(self.InputFile)))
+      self.assertIsInstance(shots[0], das.types.Struct)
+      self.assertEqual(das.get_schema_type_name(shots[0]._get_schema_type()), "shots.Shot")
+      self.assertEqual(shots[2].name, u"s030_北")
+
+   def testNoSchema(self):
+      shots = list(das.iterread(self.InputFile, ignore_meta=True))
+      self.assertEqual(shots[1], {"name": "s020", "start": 1001, "end": 1120})
+
+   def testStream(self):
+      it = das.iterread(self.ErrorFile)
+      self.assertEqual(it.next().name, "s010")
+      with self.assertRaises(das.ValidationError):
+         it.next()
+
+   def testNotSequence(self):
+      with self.assertRaises(das.ValidationError):
+         das.iterread(self.InputFile, schema_type="shots.Shot")
+
+   def testSize(self):
+      it = das.iterread(self.InputFile, schema_type="shots.ShortList")
+      self.assertEqual(it.next().name, "s010")
+      self.assertEqual(it.next().name, "s020")
+      with self.assertRaises(das.ValidationError):
+         list(it)
@@ -0,0 +1,78 @@
+# -*- coding: utf8 -*-
+import os
+import unittest
+import das
+
+class TestCase(unittest.TestCase):
+   TestDir = None
+   DataDir = None
+   InputFile = None
+   OutputFile = None
+
+   @classmethod
+   def setUpClass(cls):
+      cls.TestDir = os.path.abspath(os.path.dirname(__file__))
+      # Shares test022 schema and input
+      cls.DataDir = os.path.abspath(cls.TestDir + "/../test022")
+      cls.InputFile = cls.DataDir + "/in.items"
+      cls.OutputFile = cls.TestDir + "/out.items"
+      os.environ["DAS_SCHEMA_PATH"] = cls.DataDir
+
+   def setUp(self):
+      self.addCleanup(self.cleanUp)
+
+   def tearDown(self):
+      pass
+
+   def cleanUp(self):
+      if os.path.isfile(self.OutputFile):
+         os.remove(self.OutputFile)
+
+   @classmethod
+   def tearDownClass(cls):
+      del(os.environ["DAS_SCHEMA_PATH"])
+
+   # Test functions
+
+   def testRoundTrip(self):
+      items = das.read(self.InputFile)
+      das.write(items, self.OutputFile, format="binary")
+      with open(self.OutputFile, "rb") as f:
+         self.assertTrue(das.binary.is_binary(f.read()))
+      rv = das.read(self.OutputFile)
+      self.assertEqual(rv, items)
+      self.assertIsInstance(rv[1].frames, das.types.Tuple)
+      self.assertIsInstance(rv[0].tags, das.types.Set)
+      self.assertEqual(rv[0].attr.attr, "visibility")
+      self.assertEqual(rv[1].tags, set(["prop", u"北川"]))
+
+   def testLiterals(self):
+      d = {"a": [1, -2.5, 3L, -(1 << 70), 1j, True, None], "b": (1,), "c": (), "d": set([1]), "e": frozenset(), "f": {}, u"g": [u"川", "abc"]}
+      rv = das.read_string(das.binary.dumps(d, encoding="utf8"), encoding="utf8")
+      self.assertEqual(rv, d)
+      self.assertIsInstance(rv["a"][2], long)
+      self.assertIsInstance(rv["g"][1], str)
+
+   def testMeta(self):
+      items = das.read(self.InputFile)
+      das.write(items, self.OutputFile, format="binary")
+      md = das.read_meta(self.OutputFile)
+      self.assertEqual(md["schema_type"], "literal.Items")
+      self.assertEqual(md["schema_version"], "1.0")
+      self.assertEqual(md["encoding"], "utf8")
+      self.assertEqual(md["version"], das.__version__)
+
+   def testIterRead(self):
+      items = das.read(self.InputFile)
+      das.write(items, self.OutputFile, format="binary")
+      self.assertEqual(list(das.iterread(self.OutputFile)), list(items))
+
+   def testTruncated(self):
+      s = das.binary.dumps([1, "abc", {"x": 2.0}])
+      for i in xrange(len(das.binary.Magic), len(s)):
+         with self.assertRaises(das.BinaryError):
+            das.binary.loads(s[:i])
+
+   def testInvalidFormat(self):
+      with self.assertRaises(Exception):
+         das.write([1], self.OutputFile, format="xml")
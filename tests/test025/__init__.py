@@ -0,0 +1,107 @@
+# -*- coding: utf8 -*-
+import os
+import shutil
+import threading
+import unittest
+import das
+
+class TestCase(unittest.TestCase):
+   TestDir = None
+   InputFile = None
+   OutputFile = None
+
+   @classmethod
+   def setUpClass(cls):
+      cls.TestDir = os.path.abspath(os.path.dirname(__file__))
+      cls.InputFile = cls.TestDir + "/in.config"
+      cls.OutputFile = cls.TestDir + "/out.config"
+      os.environ["DAS_SCHEMA_PATH"] = cls.TestDir
+
+   def setUp(self):
+      self.addCleanup(self.cleanUp)
+      shutil.copyfile(self.InputFile, self.OutputFile)
+      das.set_read_cache_size(1 << 20)
+
+   def tearDown(self):
+      pass
+
+   def cleanUp(self):
+      das.set_read_cache_size(0)
+      das.clear_read_cache()
+      if os.path.isfile(self.OutputFile):
+         os.remove(self.OutputFile)
+
+   @classmethod
+   def tearDownClass(cls):
+      del(os.environ["DAS_SCHEMA_PATH"])
+
+   # Test functions
+
+   def testHit(self):
+      hits = das.cache.ReadCache.instance.hits
+      c0 = das.read(self.OutputFile)
+      c1 = das.read(self.OutputFile)
+      self.assertEqual(das.cache.ReadCache.instance.hits, hits + 1)
+      self.assertEqual(c0, c1)
+      self.assertIsNot(c0, c1)
+      self.assertIsInstance(c1, das.types.Struct)
+      self.assertIsInstance(c1.frames, das.types.Tuple)
+      self.assertIsInstance(c1.layers[0], das.types.Dict)
+      self.assertEqual(das.get_schema_type_name(c1._get_schema_type()), "config.Config")
+
+   def testCopy(self):
+      c0 = das.read(self.OutputFile)
+      c0.tags.add("light")
+      c0.layers[0]["bg"] = 0.0
+      c1 = das.read(self.OutputFile)
+      c1.layers.append({"mg": 2.0})
+      c2 = das.read(self.OutputFile)
+      self.assertEqual(c2.tags, set(["anim", "fx"]))
+      self.assertEqual(c2.layers, [{"bg": 1.0}, {"fg": 0.5}])
+      with self.assertRaises(das.ValidationError):
+         c2.frames = (1, "a")
+
+   def testDisabled(self):
+      das.set_read_cache_size(0)
+      das.read(self.OutputFile)
+      das.read(self.OutputFile)
+      self.assertEqual(len(das.cache.ReadCache.instance.entries), 0)
+
+   def testModified(self):
+      c0 = das.read(self.OutputFile)
+      c0.name = "shot020"
+      das.write(c0, self.OutputFile)
+      st = os.stat(self.OutputFile)
+      os.utime(self.OutputFile, (st.st_atime, st.st_mtime + 10))
+      self.assertEqual(das.read(self.OutputFile).name, "shot020")
+
+   def testSchemaReload(self):
+      das.read(self.OutputFile)
+      das.load_schemas(force=True)
+      self.assertEqual(len(das.cache.ReadCache.instance.entries), 0)
+      c = das.read(self.OutputFile)
+      self.assertIs(c._get_schema_type(), das.get_schema_type("config.Config"))
+
+   def testBudget(self):
+      das.read(self.OutputFile)
+      das.read(self.InputFile)
+      self.assertEqual(len(das.cache.ReadCache.instance.entries), 2)
+      das.set_read_cache_size(das.cache.ReadCache.instance.size - 1)
+      self.assertEqual(das.cache.ReadCache.instance.entries.keys()[0][0], self.InputFile)
+      das.set_read_cache_size(1)
+      das.read(self.OutputFile)
+      self.assertEqual(len(das.cache.ReadCache.instance.entries), 0)
+
+   def testConcurrent(self):
+      c = das.cache.ReadCache.instance
+      das.set_read_cache_size(das.cache._sizeof(das.read(self.OutputFile)) + 1)
+      def readAll():
+         for i in xrange(50):
+            das.read(self.OutputFile if (i % 2) else self.InputFile)
+      threads = [threading.Thread(target=readAll) for i in xrange(4)]
+      for t in threads:
+         t.start()
+      for t in threads:
+         t.join()
+      self.assertEqual(c.size, sum([x[1] for x in c.entries.itervalues()]))
+      self.assertTrue(c.size <= c.max_size)
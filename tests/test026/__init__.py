@@ -0,0 +1,101 @@
+# -*- coding: utf8 -*-
+import os
+import time
+import shutil
+import unittest
+import das
+
+class TestCase(unittest.TestCase):
+   TestDir = None
+   InputFile = None
+   CacheDir = None
+
+   @classmethod
+   def setUpClass(cls):
+      cls.TestDir = os.path.abspath(os.path.dirname(__file__))
+      cls.InputFile = cls.TestDir + "/in.config"
+      cls.CacheDir = cls.TestDir + "/cache"
+      os.environ["DAS_SCHEMA_PATH"] = cls.TestDir
+
+   def setUp(self):
+      self.addCleanup(self.cleanUp)
+      self.maxSize = das.get_compiled_cache_size()
+      das.set_compiled_cache_path(self.CacheDir)
+
+   def tearDown(self):
+      pass
+
+   def cleanUp(self):
+      das.set_compiled_cache_path(None)
+      das.set_compiled_cache_size(self.maxSize)
+      if os.path.isdir(self.CacheDir):
+         shutil.rmtree(self.CacheDir)
+
+   @classmethod
+   def tearDownClass(cls):
+      del(os.environ["DAS_SCHEMA_PATH"])
+
+   # Test functions
+
+   def testStore(self):
+      c0 = das.read(self.InputFile)
+      self.assertEqual(len(os.listdir(self.CacheDir)), 1)
+      c1 = das.read(self.InputFile)
+      self.assertEqual(len(os.listdir(self.CacheDir)), 1)
+      self.assertEqual(c0, c1)
+      self.assertIsInstance(c1, das.types.Struct)
+      self.assertIsInstance(c1.frames, das.types.Tuple)
+      das.set_compiled_cache_path(None)
+      self.assertEqual(das.read(self.InputFile), c1)
+
+   def testLoad(self):
+      das.read(self.InputFile)
+      path = os.path.join(self.CacheDir, os.listdir(self.CacheDir)[0])
+      c = das.cache.CompiledCache.instance
+      found, d = c.unpack(open(path, "rb").read())
+      self.assertTrue(found)
+      d["name"] = "cached"
+      with open(path, "wb") as f:
+         f.write(c.pack(d))
+      self.assertEqual(das.read(self.InputFile).name, "cached")
+
+   def testInvalid(self):
+      das.read(self.InputFile)
+      path = os.path.join(self.CacheDir, os.listdir(self.CacheDir)[0])
+      data = open(path, "rb").read()
+      # Garbage, truncated and corrupted files are misses
+      for content in ["garbage", data[:-1], data[:-1] + chr(ord(data[-1]) ^ 1), data[:10]]:
+         with open(path, "wb") as f:
+            f.write(content)
+         self.assertEqual(das.read(self.InputFile).name, "shot010")
+         self.assertEqual(open(path, "rb").read(), data)
+
+   def testPrune(self):
+      c = das.cache.CompiledCache.instance
+      for i in xrange(10):
+         c.store("[%d]" % i, range(100))
+      size = os.path.getsize(os.path.join(self.CacheDir, os.listdir(self.CacheDir)[0]))
+      now = time.time()
+      for i in xrange(10):
+         os.utime(c.filename("[%d]" % i), (now - 100 + i, now - 100 + i))
+      # Loading a file makes it most recently used
+      self.assertTrue(c.load("[0]")[0])
+      das.set_compiled_cache_size(5 * size)
+      c.store("[10]", range(100))
+      self.assertEqual(len(os.listdir(self.CacheDir)), 5)
+      self.assertTrue(c.load("[0]")[0])
+      self.assertTrue(c.load("[10]")[0])
+      self.assertFalse(c.load("[5]")[0])
+      self.assertTrue(c.load("[9]")[0])
+
+   def testKey(self):
+      c = das.cache.CompiledCache.instance
+      s = "[1, 2]"
+      self.assertEqual(c.filename(s), c.filename(s))
+      self.assertNotEqual(c.filename(s), c.filename(s + " "))
+      self.assertNotEqual(c.filename(s), c.filename(s, encoding="utf8"))
+      self.assertNotEqual(c.filename(s), c.filename(s, names={"Attribute": object}))
+
+   def testUnmarshallable(self):
+      self.assertFalse(das.cache.CompiledCache.instance.store("x", [object()]))
+      self.assertFalse(os.path.isdir(self.CacheDir) and os.listdir(self.CacheDir))
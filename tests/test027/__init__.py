@@ -0,0 +1,64 @@
+# -*- coding: utf8 -*-
+import os
+import glob
+import unittest
+import das
+
+class TestCase(unittest.TestCase):
+   TestDir = None
+   InputFiles = None
+   ErrorFile = None
+
+   @classmethod
+   def setUpClass(cls):
+      cls.TestDir = os.path.abspath(os.path.dirname(__file__))
+      cls.InputFiles = sorted(glob.glob(cls.TestDir + "/shot*.config"))
+      cls.ErrorFile = cls.TestDir + "/error.config"
+      os.environ["DAS_SCHEMA_PATH"] = cls.TestDir
+
+   def setUp(self):
+      self.addCleanup(self.cleanUp)
+
+   def tearDown(self):
+      pass
+
+   def cleanUp(self):
+      pass
+
+   @classmethod
+   def tearDownClass(cls):
+      del(os.environ["DAS_SCHEMA_PATH"])
+
+   # Test functions
+
+   def testReadMany(self):
+      rv = das.read_many(self.InputFiles, workers=2)
+      self.assertEqual(rv, [das.read(x) for x in self.InputFiles])
+      self.assertEqual([x.name for x in rv], ["shot010", "shot020", "shot030"])
+      st = das.get_schema_type("config.Config")
+      for c in rv:
+         self.assertIs(c._get_schema_type(), st)
+         self.assertIsInstance(c.frames, das.types.Tuple)
+         self.assertIsInstance(c.layers[0], das.types.Dict)
+      self.assertEqual(rv[1].frame_count(), 20)
+      with self.assertRaises(das.ValidationError):
+         rv[0].frames = (1, "a")
+
+   def testSchemaType(self):
+      rv = das.read_many(self.InputFiles, schema_type=das.get_schema_type("config.Config"), workers=2)
+      self.assertEqual(rv[2].frame_count(), 30)
+
+   def testErrors(self):
+      paths = self.InputFiles[:1] + [self.ErrorFile, self.TestDir + "/missing.config"]
+      for workers in (1, 2):
+         with self.assertRaises(das.ReadManyError) as ctx:
+            das.read_many(paths, workers=workers)
+         self.assertEqual([x[0] for x in ctx.exception.errors], paths[1:])
+         self.assertTrue(ctx.exception.errors[0][1].startswith("ValidationError: "))
+         self.assertEqual(ctx.exception.results[0].name, "shot010")
+         self.assertEqual(ctx.exception.results[1:], [None, None])
+
+   def testSerial(self):
+      rv = das.read_many(self.InputFiles, workers=1)
+      self.assertEqual(rv, [das.read(x) for x in self.InputFiles])
+      self.assertEqual(rv[0].frame_count(), 10)
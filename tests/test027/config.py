@@ -0,0 +1,14 @@
+import das
+
+class Config(das.Mixin):
+   @classmethod
+   def get_schema_type(klass):
+      return "config.Config"
+
+   def __init__(self, *args, **kwargs):
+      super(Config, self).__init__(*args, **kwargs)
+
+   def frame_count(self):
+      return self.frames[1] - self.frames[0] + 1
+
+das.register_mixins(Config)
@@ -0,0 +1,81 @@
+# -*- coding: utf8 -*-
+import os
+import glob
+import shutil
+import unittest
+import das
+
+class TestCase(unittest.TestCase):
+   TestDir = None
+   InputFiles = None
+   OutputDir = None
+
+   @classmethod
+   def setUpClass(cls):
+      cls.TestDir = os.path.abspath(os.path.dirname(__file__))
+      cls.InputFiles = sorted(glob.glob(cls.TestDir + "/shot*.config"))
+      cls.OutputDir = cls.TestDir + "/out"
+      os.environ["DAS_SCHEMA_PATH"] = cls.TestDir
+
+   def setUp(self):
+      self.addCleanup(self.cleanUp)
+      os.mkdir(self.OutputDir)
+
+   def tearDown(self):
+      pass
+
+   def cleanUp(self):
+      if os.path.isdir(self.OutputDir):
+         shutil.rmtree(self.OutputDir)
+
+   @classmethod
+   def tearDownClass(cls):
+      del(os.environ["DAS_SCHEMA_PATH"])
+
+   # Test functions
+
+   def outputPaths(self, ext=".config"):
+      return [self.OutputDir + "/" + os.path.splitext(os.path.basename(x))[0] + ext for x in self.InputFiles]
+
+   def testWriteMany(self):
+      data = [das.read(x) for x in self.InputFiles]
+      paths = self.outputPaths()
+      das.write_many(zip(data, paths), workers=2)
+      self.assertEqual([das.read(x) for x in paths], data)
+      self.assertEqual(das.read_meta(paths[0])["schema_type"], "config.Config")
+      self.assertEqual(sorted(os.listdir(self.OutputDir)), sorted(map(os.path.basename, paths)))
+
+   def testBinary(self):
+      data = [das.read(x) for x in self.InputFiles]
+      paths = self.outputPaths(".bin")
+      das.write_many(zip(data, paths), format="binary", workers=2, fsync=True)
+      self.assertEqual([das.read(x) for x in paths], data)
+
+   def testSerial(self):
+      data = [das.read(x) for x in self.InputFiles]
+      paths = self.outputPaths()
+      das.write_many(zip(data, paths), workers=1, fsync=True)
+      for d, p in zip(data, paths):
+         das.write(d, p + ".ref")
+         with open(p, "rb") as f0:
+            with open(p + ".ref", "rb") as f1:
+               self.assertEqual(f0.read().split("\n")[4:], f1.read().split("\n")[4:])
+
+   def testErrors(self):
+      data = [das.read(x) for x in self.InputFiles]
+      paths = self.outputPaths()
+      with open(paths[0], "wb") as f:
+         f.write("original")
+      os.chmod(paths[0], 0640)
+      data[1]._dict["frames"] = (1, "a")
+      for workers in (1, 2):
+         with self.assertRaises(das.WriteManyError) as ctx:
+            das.write_many(zip(data, paths), workers=workers)
+         self.assertEqual([x[0] for x in ctx.exception.errors], [paths[1]])
+         self.assertEqual(os.listdir(self.OutputDir), [os.path.basename(paths[0])])
+         with open(paths[0], "rb") as f:
+            self.assertEqual(f.read(), "original")
+      data[1]._dict["frames"] = (1, 20)
+      das.write_many(zip(data, paths), workers=2)
+      self.assertEqual(das.read(paths[0]), data[0])
+      self.assertEqual(os.stat(paths[0]).st_mode & 0777, 0640)
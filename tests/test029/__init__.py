@@ -0,0 +1,117 @@
+# -*- coding: utf8 -*-
+import os
+import threading
+import unittest
+import das
+
+class TestCase(unittest.TestCase):
+   TestDir = None
+   InputFile = None
+   OutputFile = None
+
+   @classmethod
+   def setUpClass(cls):
+      cls.TestDir = os.path.abspath(os.path.dirname(__file__))
+      cls.InputFile = cls.TestDir + "/in.config"
+      cls.OutputFile = cls.TestDir + "/out.config"
+      os.environ["DAS_SCHEMA_PATH"] = cls.TestDir
+
+   def setUp(self):
+      self.addCleanup(self.cleanUp)
+      self.executor = das.tasks.Executor(max_workers=1)
+
+   def tearDown(self):
+      pass
+
+   def cleanUp(self):
+      self.executor.shutdown()
+      if os.path.isfile(self.OutputFile):
+         os.remove(self.OutputFile)
+
+   @classmethod
+   def tearDownClass(cls):
+      del(os.environ["DAS_SCHEMA_PATH"])
+
+   def block(self):
+      # Keep the executor's only worker busy until the returned event is set
+      started = threading.Event()
+      release = threading.Event()
+      def wait():
+         started.set()
+         release.wait(5)
+      task = self.executor.submit(wait)
+      started.wait(5)
+      return task, release
+
+   # Test functions
+
+   def testRead(self):
+      task = das.aread(self.InputFile)
+      self.assertEqual(task.result(5), das.read(self.InputFile))
+      self.assertTrue(task.done())
+      self.assertIsInstance(task.result(), das.types.Struct)
+
+   def testWrite(self):
+      c = das.read(self.InputFile)
+      c.name = "shot020"
+      done = []
+      task = das.awrite(c, self.OutputFile, executor=self.executor)
+      task.add_done_callback(lambda t: done.append(t))
+      self.assertIs(task.result(5), True)
+      self.assertEqual(done, [task])
+      self.assertEqual(das.aread(self.OutputFile, executor=self.executor).result(5).name, "shot020")
+
+   def testError(self):
+      task = das.aread(self.InputFile, schema_type="config.Missing", executor=self.executor)
+      self.assertIsInstance(task.exception(5), Exception)
+      with self.assertRaises(Exception):
+         task.result()
+
+   def testCancelPending(self):
+      blocker, release = self.block()
+      task = das.awrite(das.read(self.InputFile), self.OutputFile, executor=self.executor)
+      self.assertTrue(task.cancel())
+      release.set()
+      blocker.result(5)
+      self.assertTrue(task.cancelled())
+      with self.assertRaises(das.CancelledError):
+         task.result(5)
+      self.executor.shutdown()
+      self.assertFalse(os.path.isfile(self.OutputFile))
+
+   def testCancelRunning(self):
+      started = threading.Event()
+      release = threading.Event()
+      def work():
+         started.set()
+         release.wait(5)
+         das.tasks.checkpoint()
+         return 1
+      task = self.executor.submit(work)
+      started.wait(5)
+      self.assertTrue(task.running())
+      self.assertFalse(task.cancel())
+      release.set()
+      with self.assertRaises(das.CancelledError):
+         task.result(5)
+      self.assertTrue(task.cancelled())
+      # Without a checkpoint, the task finishes normally
+      started.clear()
+      release.clear()
+      def work2():
+         started.set()
+         release.wait(5)
+         return 2
+      task = self.executor.submit(work2)
+      started.wait(5)
+      self.assertFalse(task.cancel())
+      release.set()
+      self.assertEqual(task.result(5), 2)
+      self.assertFalse(task.cancelled())
+
+   def testTimeout(self):
+      blocker, release = self.block()
+      with self.assertRaises(das.TimeoutError):
+         blocker.result(0.01)
+      release.set()
+      self.assertIsNone(blocker.result(5))
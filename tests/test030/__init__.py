@@ -0,0 +1,102 @@
+# -*- coding: utf8 -*-
+import os
+import unittest
+import cStringIO
+import das
+
+class TestCase(unittest.TestCase):
+   TestDir = None
+   OutputFile = None
+
+   @classmethod
+   def setUpClass(cls):
+      cls.TestDir = os.path.abspath(os.path.dirname(__file__))
+      cls.OutputFile = cls.TestDir + "/out.layout"
+      os.environ["DAS_SCHEMA_PATH"] = cls.TestDir
+
+   def setUp(self):
+      self.addCleanup(self.cleanUp)
+
+   def tearDown(self):
+      pass
+
+   def cleanUp(self):
+      if os.path.isfile(self.OutputFile):
+         os.remove(self.OutputFile)
+
+   @classmethod
+   def tearDownClass(cls):
+      del(os.environ["DAS_SCHEMA_PATH"])
+
+   def makeLayout(self):
+      return das.make("layout.Layout", name=u"北川", frames=(1, 10), notes="line1\nline2", assets={"b": [1.0], "a": [0.5, 2.0]})
+
+   def dumps(self, d, **kwargs):
+      s = cStringIO.StringIO()
+      das.pprint(d, stream=s, **kwargs)
+      return s.getvalue()
+
+   # Test functions
+
+   def testPretty(self):
+      expected = ("{\n"
+                  "  'name': u'\\u5317\\u5ddd',\n"
+                  "  'frames': (1L, 10L),\n"
+                  "  'notes': '''line1\nline2''',\n"
+                  "  'assets': {\n"
+                  "    'a': [\n"
+                  "      0.5,\n"
+                  "      2.0\n"
+                  "    ],\n"
+                  "    'b': [\n"
+                  "      1.0\n"
+                  "    ]\n"
+                  "  }\n"
+                  "}\n")
+      self.assertEqual(self.dumps(self.makeLayout()), expected)
+
+   def testCompact(self):
+      l = self.makeLayout()
+      self.assertEqual(self.dumps(l, indent=None), "{'name': u'\\u5317\\u5ddd', 'frames': (1L, 10L), 'notes': 'line1\\nline2', 'assets': {'a': [0.5, 2.0], 'b': [1.0]}}\n")
+      self.assertEqual(self.dumps([set([1]), [], {}], indent=None), "[set([1]), [], {}]\n")
+      das.write(l, self.OutputFile, indent=None)
+      with open(self.OutputFile, "rb") as f:
+         self.assertEqual(len([x for x in f.readlines() if not x.startswith("#")]), 1)
+      self.assertEqual(das.read(self.OutputFile), l)
+
+   def testExtraKeys(self):
+      l = self.makeLayout()
+      l._dict["zz"] = 1
+      l._dict["aa"] = 2
+      self.assertEqual(self.dumps(l, indent=None).split(", 'assets'")[1].split("}, ")[1], "'aa': 2, 'zz': 1}\n")
+
+   def testNonAsciiKey(self):
+      with self.assertRaises(Exception):
+         self.dumps({u"北": 1})
+      with self.assertRaises(Exception):
+         self.dumps({"a": "\xe5\x8c\x97"})
+      self.assertEqual(self.dumps({"a": "\xe5\x8c\x97"}, encoding="utf8", indent=None), "{'a': u'\\u5317'}\n")
+
+   def testGeneratedWriters(self):
+      l = self.makeLayout()
+      l.tags = set(["a"])
+      ls = das.make("layout.Layouts", l, self.makeLayout())
+      write = das.serializer._writer(ls[0], False)
+      self.assertIsNotNone(write)
+      self.assertIs(das.serializer._writer(ls[1], False), write)
+      self.assertIsNot(das.serializer._writer(ls[0], True), write)
+      self.assertEqual(self.dumps(ls, indent=None).count("set(['a'])"), 1)
+      self.assertEqual(das.read_string(self.dumps(ls), schema_type="layout.Layouts"), ls)
+      # Values not matching their declared type go through the generic path
+      ls[1]._dict["notes"] = [1, "b"]
+      self.assertTrue("'notes': [1, 'b'], " in self.dumps(ls, indent=None))
+
+   def testSchemaReload(self):
+      l = self.makeLayout()
+      write = das.serializer._writer(l, False)
+      self.assertIs(das.serializer._writer(l, False), write)
+      das.load_schemas(force=True)
+      l = self.makeLayout()
+      # Functions are kept on the new schema type, not looked up by id
+      self.assertIsNot(das.serializer._writer(l, False), write)
+      self.assertEqual(das.read_string(self.dumps(l), schema_type="layout.Layout"), l)
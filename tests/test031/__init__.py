@@ -0,0 +1,98 @@
+import os
+import glob
+import unittest
+import das
+
+class TestCase(unittest.TestCase):
+   TestDir = None
+   OutputFile = None
+
+   @classmethod
+   def setUpClass(cls):
+      cls.TestDir = os.path.abspath(os.path.dirname(__file__))
+      cls.OutputFile = cls.TestDir + "/out.shots"
+      os.environ["DAS_SCHEMA_PATH"] = cls.TestDir
+
+   def setUp(self):
+      self.addCleanup(self.cleanUp)
+
+   def tearDown(self):
+      pass
+
+   def cleanUp(self):
+      for path in glob.glob(self.OutputFile + "*"):
+         os.remove(path)
+
+   @classmethod
+   def tearDownClass(cls):
+      del(os.environ["DAS_SCHEMA_PATH"])
+
+   def makeShots(self, n=10):
+      return das.make("shots.Shots", *[das.make("shots.Shot", name="sh%04d" % i, frames=(1, i), tags=set(["anim", "fx"])) for i in xrange(n)])
+
+   def magic(self, path):
+      with open(path, "rb") as f:
+         return das.compression.from_magic(f.read(das.compression.MagicSize))
+
+   # Test functions
+
+   def testExtension(self):
+      shots = self.makeShots()
+      for ext, compression in [(".gz", "gzip"), (".bz2", "bz2")]:
+         path = self.OutputFile + ext
+         das.write(shots, path)
+         self.assertEqual(self.magic(path), compression)
+         self.assertEqual(das.read(path), shots)
+         self.assertEqual(das.read_meta(path)["schema_type"], "shots.Shots")
+
+   def testExplicit(self):
+      shots = self.makeShots()
+      das.write(shots, self.OutputFile, compression="bz2")
+      self.assertEqual(self.magic(self.OutputFile), "bz2")
+      self.assertEqual(das.read(self.OutputFile), shots)
+      self.assertEqual(das.read(self.OutputFile, compression="bz2"), shots)
+      with self.assertRaises(das.CompressionError):
+         das.write(shots, self.OutputFile, compression="zip")
+
+   def testBinary(self):
+      shots = self.makeShots()
+      path = self.OutputFile + ".gz"
+      das.write(shots, path, format="binary")
+      self.assertEqual(das.read(path), shots)
+      self.assertEqual(das.read_meta(path)["schema_type"], "shots.Shots")
+      self.assertEqual(list(das.iterread(path)), list(shots))
+
+   def testIterread(self):
+      shots = self.makeShots()
+      path = self.OutputFile + ".bz2"
+      das.write(shots, path)
+      self.assertEqual(list(das.iterread(path)), list(shots))
+
+   def testReadMetaOnly(self):
+      # Only the beginning of the file is needed to get metadata
+      path = self.OutputFile + ".gz"
+      das.write(self.makeShots(2000), path)
+      with open(path, "rb") as f:
+         data = f.read()
+      with open(path, "wb") as f:
+         f.write(data[:len(data) / 2])
+      self.assertEqual(das.read_meta(path)["schema_type"], "shots.Shots")
+      with self.assertRaises(Exception):
+         das.read(path)
+
+   def testWriteMany(self):
+      shots = self.makeShots()
+      items = [(shots, self.OutputFile + ".gz"), (shots, self.OutputFile + "_2")]
+      das.write_many(items, workers=1)
+      self.assertEqual(self.magic(items[0][1]), "gzip")
+      self.assertEqual(self.magic(items[1][1]), None)
+      for _, path in items:
+         self.assertEqual(das.read(path), shots)
+
+   @unittest.skipIf(das.compression.lzma is None, "lzma module not available")
+   def testXz(self):
+      shots = self.makeShots()
+      path = self.OutputFile + ".xz"
+      das.write(shots, path)
+      self.assertEqual(self.magic(path), "xz")
+      self.assertEqual(das.read(path), shots)
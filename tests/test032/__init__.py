@@ -0,0 +1,89 @@
+import os
+import unittest
+import cStringIO
+import das
+
+class Pipe(object):
+   # Non seekable file object returning small chunks
+   def __init__(self, data):
+      super(Pipe, self).__init__()
+      self.data = data
+      self.pos = 0
+
+   def read(self, n=-1):
+      n = (7 if n < 0 else min(n, 7))
+      rv = self.data[self.pos:self.pos + n]
+      self.pos += len(rv)
+      return rv
+
+
+class TestCase(unittest.TestCase):
+   TestDir = None
+
+   @classmethod
+   def setUpClass(cls):
+      cls.TestDir = os.path.abspath(os.path.dirname(__file__))
+      os.environ["DAS_SCHEMA_PATH"] = cls.TestDir
+
+   def setUp(self):
+      self.addCleanup(self.cleanUp)
+
+   def tearDown(self):
+      pass
+
+   def cleanUp(self):
+      pass
+
+   @classmethod
+   def tearDownClass(cls):
+      del(os.environ["DAS_SCHEMA_PATH"])
+
+   def makeRecords(self, n=20):
+      return das.make("stream.Records", *[das.make("stream.Record", name="r%d" % i, value=i * 0.5) for i in xrange(n)])
+
+   def dumps(self, d, **kwargs):
+      s = cStringIO.StringIO()
+      das.write(d, s, **kwargs)
+      return s.getvalue()
+
+   # Test functions
+
+   def testWriteStream(self):
+      recs = self.makeRecords()
+      data = self.dumps(recs)
+      self.assertTrue(data.startswith("# encoding: utf8\n"))
+      buf = bytearray()
+      das.write(recs, buf)
+      self.assertEqual(len(buf), len(data))
+
+   def testReadStream(self):
+      recs = self.makeRecords()
+      data = self.dumps(recs)
+      self.assertEqual(das.read(cStringIO.StringIO(data)), recs)
+      self.assertEqual(das.read(Pipe(data)), recs)
+      self.assertEqual(das.read_meta(Pipe(data))["schema_type"], "stream.Records")
+
+   def testReadBuffer(self):
+      recs = self.makeRecords()
+      for fmt in ("text", "binary"):
+         data = self.dumps(recs, format=fmt)
+         for buf in (bytearray(data), buffer(data), memoryview(data)):
+            self.assertEqual(das.read(buf), recs)
+            self.assertEqual(das.read_meta(buf)["schema_type"], "stream.Records")
+
+   def testCompressedStream(self):
+      recs = self.makeRecords(1000)
+      data = self.dumps(recs, compression="gzip")
+      self.assertEqual(das.read(Pipe(data)), recs)
+      self.assertEqual(das.read_meta(Pipe(data))["schema_type"], "stream.Records")
+      # Concatenated gzip members read as one stream
+      two = das.compression.compress(data[:100], "gzip") + das.compression.compress(data[100:], "gzip")
+      self.assertEqual(das.compression.decompress(two), data)
+      with self.assertRaises(das.CompressionError):
+         das.read(Pipe(data[:len(data) / 2]))
+
+   def testIterread(self):
+      recs = self.makeRecords()
+      for kwargs in ({}, {"format": "binary"}, {"compression": "bz2"}):
+         data = self.dumps(recs, **kwargs)
+         self.assertEqual(list(das.iterread(Pipe(data))), list(recs))
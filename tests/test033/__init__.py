@@ -0,0 +1,97 @@
+import os
+import shutil
+import unittest
+import das
+
+class TestCase(unittest.TestCase):
+   TestDir = None
+   Library = None
+   IndexFile = None
+
+   @classmethod
+   def setUpClass(cls):
+      cls.TestDir = os.path.abspath(os.path.dirname(__file__))
+      cls.Library = cls.TestDir + "/library"
+      cls.IndexFile = cls.TestDir + "/library.index"
+      os.environ["DAS_SCHEMA_PATH"] = cls.TestDir
+
+   def setUp(self):
+      self.addCleanup(self.cleanUp)
+      os.makedirs(self.Library + "/chars/hero")
+      os.makedirs(self.Library + "/props")
+      for i, path in enumerate(["chars/hero/hero.das", "chars/villain.das", "props/chair.das", "props/table.das.gz"]):
+         das.write(das.make("asset.Asset", name="asset%d" % i), self.Library + "/" + path)
+      das.write(das.make("asset.Asset", name="lamp"), self.Library + "/props/lamp.das", format="binary")
+      with open(self.Library + "/props/notes.txt", "wb") as f:
+         f.write("not a das file\n")
+
+   def tearDown(self):
+      pass
+
+   def cleanUp(self):
+      if os.path.isdir(self.Library):
+         shutil.rmtree(self.Library)
+      if os.path.isfile(self.IndexFile):
+         os.remove(self.IndexFile)
+
+   @classmethod
+   def tearDownClass(cls):
+      del(os.environ["DAS_SCHEMA_PATH"])
+
+   # Test functions
+
+   def testScan(self):
+      for workers in (None, 1, 3):
+         rv = das.scan_meta(self.Library, workers=workers)
+         self.assertEqual(sorted(rv.keys()), [os.path.join(self.Library, x) for x in ["chars/hero/hero.das", "chars/villain.das", "props/chair.das", "props/lamp.das"]])
+         for md in rv.values():
+            self.assertEqual(md["schema_type"], "asset.Asset")
+            self.assertEqual(md["schema_version"], "1.2")
+      rv = das.scan_meta(self.Library, pattern="*.gz")
+      self.assertEqual(rv.keys(), [os.path.join(self.Library, "props/table.das.gz")])
+
+   def testIndex(self):
+      count = [0]
+      read_meta = das.read_meta
+      def counting_read_meta(path, **kwargs):
+         count[0] += 1
+         return read_meta(path, **kwargs)
+      das.read_meta = counting_read_meta
+      try:
+         rv = das.scan_meta(self.Library, index=self.IndexFile)
+         self.assertEqual(count[0], 4)
+         self.assertTrue(os.path.isfile(self.IndexFile))
+         self.assertEqual(das.scan_meta(self.Library, index=self.IndexFile), rv)
+         self.assertEqual(count[0], 4)
+         # Only modified files are read again
+         with open(self.Library + "/props/chair.das", "ab") as f:
+            f.write("\n")
+         os.remove(self.Library + "/chars/villain.das")
+         rv2 = das.scan_meta(self.Library, index=self.IndexFile)
+         self.assertEqual(count[0], 5)
+         self.assertEqual(len(rv2), 3)
+         self.assertEqual(len(das.scan.load_index(self.IndexFile)), 3)
+      finally:
+         das.read_meta = read_meta
+
+   def testErrors(self):
+      with open(self.Library + "/props/broken.das", "wb") as f:
+         f.write(das.binary.Magic + "\x01")
+      with self.assertRaises(das.ReadManyError) as cm:
+         das.scan_meta(self.Library)
+      self.assertEqual([x[0] for x in cm.exception.errors], [self.Library + "/props/broken.das"])
+      self.assertEqual(len(cm.exception.results), 4)
+
+   def testFromTask(self):
+      # All workers of the shared executor busy waiting on scan_meta
+      executor = das.tasks.get_executor()
+      das.tasks.set_executor(das.tasks.Executor(max_workers=1))
+      batchSize = das.scan._BatchSize
+      das.scan._BatchSize = 1
+      try:
+         t = das.tasks.submit(None, das.scan_meta, self.Library)
+         self.assertEqual(len(t.result(timeout=30)), 4)
+      finally:
+         das.tasks.get_executor().shutdown(wait=False)
+         das.tasks.set_executor(executor)
+         das.scan._BatchSize = batchSize
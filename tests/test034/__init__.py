@@ -0,0 +1,103 @@
+import os
+import unittest
+import cStringIO
+import das
+
+class TestCase(unittest.TestCase):
+   TestDir = None
+
+   @classmethod
+   def setUpClass(cls):
+      cls.TestDir = os.path.abspath(os.path.dirname(__file__))
+      os.environ["DAS_SCHEMA_PATH"] = cls.TestDir
+
+   def setUp(self):
+      self.addCleanup(self.cleanUp)
+
+   def tearDown(self):
+      pass
+
+   def cleanUp(self):
+      pass
+
+   @classmethod
+   def tearDownClass(cls):
+      del(os.environ["DAS_SCHEMA_PATH"])
+
+   def makeShot(self, **kwargs):
+      return das.make("shot.Shot", **kwargs)
+
+   def dumps(self, d):
+      s = cStringIO.StringIO()
+      das.pprint(d, stream=s)
+      return s.getvalue()
+
+   # Test functions
+
+   def testStable(self):
+      s = self.makeShot(name="sh010", frames=(1, 20), tags=set(["a", "b"]), cameras={"main": 35.0, "wide": 18.0})
+      h = das.digest(s)
+      self.assertEqual(len(h), 40)
+      self.assertEqual(das.digest(das.copy(s)), h)
+      self.assertEqual(das.digest(das.read_string(self.dumps(s), schema_type="shot.Shot")), h)
+      # Field assignment order doesn't matter
+      s2 = self.makeShot(cameras={"wide": 18.0, "main": 35.0}, tags=set(["b", "a"]), frames=(1, 20), name="sh010")
+      self.assertEqual(das.digest(s2), h)
+      s2.frames = (1, 21)
+      self.assertNotEqual(das.digest(s2), h)
+      self.assertEqual(len(das.digest(s, algorithm="sha256")), 64)
+
+   def testCanonical(self):
+      self.assertEqual(das.digest("abc"), das.digest(u"abc"))
+      self.assertEqual(das.digest(1), das.digest(1L))
+      self.assertNotEqual(das.digest(1), das.digest(True))
+      self.assertNotEqual(das.digest(1), das.digest(1.0))
+      self.assertNotEqual(das.digest([1, 2]), das.digest((1, 2)))
+      self.assertNotEqual(das.digest(["ab"]), das.digest(["a", "b"]))
+      self.assertEqual(das.digest({"b": 1, "a": [2]}), das.digest({"a": [2], "b": 1}))
+      # Set digests don't depend on iteration order
+      s1 = set(range(16))
+      s2 = set(range(1000, 1016))
+      s2.update(range(16))
+      s2.difference_update(range(1000, 1016))
+      self.assertEqual(s1, s2)
+      self.assertEqual(das.digest(s1), das.digest(s2))
+      self.assertEqual(das.digest(s1), das.digest(frozenset(range(16))))
+
+   def testExtraKeys(self):
+      s = self.makeShot(name="sh010")
+      s._dict["zz"] = 1
+      s._dict["aa"] = 2
+      s2 = self.makeShot(name="sh010")
+      s2._dict["aa"] = 2
+      s2._dict["zz"] = 1
+      self.assertEqual(das.digest(s), das.digest(s2))
+
+   def testCache(self):
+      cache = {}
+      shots = [self.makeShot(name="sh%d" % i, frames=(1, i)) for i in xrange(10)]
+      digests = [das.digest(x) for x in shots]
+      self.assertEqual([das.digest(x, cache=cache) for x in shots], digests)
+      self.assertEqual(len(cache), 10)
+      self.assertEqual([das.digest(x, cache=cache) for x in shots], digests)
+
+   def testGenerated(self):
+      s = self.makeShot(name="sh010", frames=(1, 20), tags=set(["a", u"b"]), cameras={"main": 35.0})
+      self.assertIsNotNone(das.hashing._feeder(s))
+      values = [s, self.makeShot(name=u"\u5317"), self.makeShot(name="sh010")]
+      # Values that don't match their declared types
+      raw = [("frames", [1, 2]), ("frames", (1, 2, 3)), ("frames", (1.5, True)), ("tags", frozenset(["a"])),
+             ("tags", set([1, "a"])), ("name", 1), ("cameras", None), ("zz", 1)]
+      for k, v in raw:
+         d = das.copy(s)
+         d._dict[k] = v
+         values.append(d)
+      feeder = das.hashing._feeder
+      generated = [das.digest(x) for x in values] + [das.digest(x, cache={}) for x in values]
+      das.hashing._feeder = lambda d: None
+      try:
+         generic = [das.digest(x) for x in values] + [das.digest(x, cache={}) for x in values]
+      finally:
+         das.hashing._feeder = feeder
+      self.assertEqual(generated, generic)
+      self.assertEqual(len(set(generated)), len(values))
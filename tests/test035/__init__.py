@@ -0,0 +1,75 @@
+import os
+import glob
+import unittest
+import das
+
+class TestCase(unittest.TestCase):
+   TestDir = None
+   OutputFile = None
+
+   @classmethod
+   def setUpClass(cls):
+      cls.TestDir = os.path.abspath(os.path.dirname(__file__))
+      cls.OutputFile = cls.TestDir + "/out.entry"
+      os.environ["DAS_SCHEMA_PATH"] = cls.TestDir
+
+   def setUp(self):
+      self.addCleanup(self.cleanUp)
+
+   def tearDown(self):
+      pass
+
+   def cleanUp(self):
+      for path in glob.glob(self.OutputFile + "*"):
+         os.remove(path)
+
+   @classmethod
+   def tearDownClass(cls):
+      del(os.environ["DAS_SCHEMA_PATH"])
+
+   def makeEntry(self, version=1):
+      return das.make("publish.Entry", name="chair", version=version, files=["chair.abc", "chair.usd"])
+
+   def age(self, path):
+      # Make modifications visible whatever the file system time resolution
+      os.utime(path, (1000000000, 1000000000))
+
+   # Test functions
+
+   def testUnchanged(self):
+      for kwargs in ({}, {"format": "binary"}, {"compression": "gzip"}):
+         self.assertTrue(das.write(self.makeEntry(), self.OutputFile, **kwargs))
+         self.assertTrue("digest" in das.read_meta(self.OutputFile))
+         self.age(self.OutputFile)
+         self.assertFalse(das.write(self.makeEntry(), self.OutputFile, only_if_changed=True, **kwargs))
+         self.assertEqual(os.path.getmtime(self.OutputFile), 1000000000)
+         self.assertTrue(das.write(self.makeEntry(version=2), self.OutputFile, only_if_changed=True, **kwargs))
+         self.assertEqual(das.read(self.OutputFile).version, 2)
+
+   def testFormatChange(self):
+      das.write(self.makeEntry(), self.OutputFile)
+      self.assertTrue(das.write(self.makeEntry(), self.OutputFile, only_if_changed=True, format="binary"))
+      self.assertTrue(das.binary.is_binary(open(self.OutputFile, "rb").read()))
+      self.assertTrue(das.write(self.makeEntry(), self.OutputFile, only_if_changed=True, compression="bz2"))
+      self.assertEqual(das.read(self.OutputFile), self.makeEntry())
+      self.assertTrue(das.write(self.makeEntry(), self.OutputFile, only_if_changed=True, indent="    "))
+
+   def testNoDigest(self):
+      # Files written by older versions are compared on their content
+      das.write(self.makeEntry(), self.OutputFile)
+      with open(self.OutputFile, "rb") as f:
+         lines = [x for x in f.readlines() if not x.startswith("# digest:")]
+      with open(self.OutputFile, "wb") as f:
+         f.write("".join(lines))
+      self.assertFalse("digest" in das.read_meta(self.OutputFile))
+      self.assertFalse(das.write(self.makeEntry(), self.OutputFile, only_if_changed=True))
+      self.assertTrue(das.write(self.makeEntry(version=3), self.OutputFile, only_if_changed=True))
+
+   def testWriteMany(self):
+      paths = [self.OutputFile + "_%d" % i for i in xrange(4)]
+      for workers in (1, 2):
+         self.cleanUp()
+         self.assertEqual(das.write_many([(self.makeEntry(), x) for x in paths], workers=workers, only_if_changed=True), paths)
+         items = [(self.makeEntry(version=(2 if i % 2 else 1)), x) for i, x in enumerate(paths)]
+         self.assertEqual(das.write_many(items, workers=workers, only_if_changed=True), paths[1::2])
+         self.assertEqual([das.read(x).version for x in paths], [1, 2, 1, 2])
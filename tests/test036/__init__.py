@@ -0,0 +1,141 @@
+import os
+import glob
+import unittest
+import das
+
+class TestCase(unittest.TestCase):
+   TestDir = None
+   OutputFile = None
+
+   @classmethod
+   def setUpClass(cls):
+      cls.TestDir = os.path.abspath(os.path.dirname(__file__))
+      cls.OutputFile = cls.TestDir + "/out.asset"
+      os.environ["DAS_SCHEMA_PATH"] = cls.TestDir
+
+   def setUp(self):
+      self.addCleanup(self.cleanUp)
+
+   def tearDown(self):
+      pass
+
+   def cleanUp(self):
+      das.set_read_cache_size(0)
+      for path in glob.glob(self.OutputFile + "*"):
+         os.remove(path)
+
+   @classmethod
+   def tearDownClass(cls):
+      del(os.environ["DAS_SCHEMA_PATH"])
+
+   def makeAsset(self):
+      a = das.make_default("asset.Asset")
+      a.name = "chair"
+      a.tags = ["prop", "wood"]
+      a.variants = [das.make("asset.Variant", name="main", frames=(1, 10))]
+      a.attrs = {"scale": 1.0}
+      return a
+
+   def journalFile(self):
+      return das.journal.journal_path(self.OutputFile)
+
+   # Test functions
+
+   def testAppend(self):
+      a = self.makeAsset()
+      das.write(a, self.OutputFile)
+      with open(self.OutputFile, "rb") as f:
+         base = f.read()
+      records = []
+      for key, val in (("comment", "'first pass'"), ("variants[0].frames", "(1, 24)"), ("attrs['scale']", "2.5")):
+         das.cli.set(a, key, val)
+         records.append(("set", key, das.cli.get(a, key)))
+      das.cli.add(a, "tags", "'chair'")
+      records.append(("set", "tags", a.tags))
+      das.cli.add(a, "variants", "{'name': 'broken', 'frames': (1, 5)}")
+      records.append(("add", "variants", a.variants[-1]))
+      self.assertFalse(das.write(a, self.OutputFile, journal=records))
+      with open(self.OutputFile, "rb") as f:
+         self.assertEqual(f.read(), base)
+      self.assertTrue(os.path.isfile(self.journalFile()))
+      self.assertEqual(das.read(self.OutputFile), a)
+      das.cli.remove(a, "variants[0]")
+      das.cli.remove(a, "comment")
+      das.write(a, self.OutputFile, journal=[("remove", "variants[0]", None), ("remove", "comment", None)])
+      b = das.read(self.OutputFile)
+      self.assertEqual(b, a)
+      self.assertFalse(hasattr(b, "comment"))
+      # Full writes drop the journal
+      self.assertTrue(das.write(b, self.OutputFile))
+      self.assertFalse(os.path.isfile(self.journalFile()))
+      self.assertEqual(das.read(self.OutputFile), a)
+
+   def testCompaction(self):
+      a = self.makeAsset()
+      das.write(a, self.OutputFile, format="binary")
+      count = 0
+      while os.path.isfile(self.journalFile()) or count == 0:
+         count += 1
+         a.comment = "x" * 1024 + str(count)
+         das.write(a, self.OutputFile, format="binary", journal=[("set", "comment", a.comment)])
+         self.assertEqual(das.read(self.OutputFile), a)
+      # Compacted into the base file once over the minimum size
+      self.assertTrue(count > 16)
+      self.assertTrue(das.binary.is_binary(open(self.OutputFile, "rb").read()))
+
+   def testOutdated(self):
+      a = self.makeAsset()
+      das.write(a, self.OutputFile)
+      with open(self.OutputFile, "rb") as f:
+         base = f.read()
+      a.comment = "new"
+      das.write(a, self.OutputFile, journal=[("set", "comment", "new")])
+      # Base file replaced by some other tool
+      with open(self.OutputFile, "wb") as f:
+         f.write("".join([l for l in base.replace("chair", "table").splitlines(True) if not l.startswith("# digest:")]))
+      self.assertFalse(hasattr(das.read(self.OutputFile), "comment"))
+
+   def testInterrupted(self):
+      a = self.makeAsset()
+      das.write(a, self.OutputFile)
+      das.write(a, self.OutputFile, journal=[("set", "comment", "ok")])
+      with open(self.journalFile(), "ab") as f:
+         f.write('["set", "name", "tr')
+      b = das.read(self.OutputFile)
+      self.assertEqual(b.comment, "ok")
+      self.assertEqual(b.name, "chair")
+
+   def testReadCache(self):
+      das.set_read_cache_size(1 << 20)
+      a = self.makeAsset()
+      das.write(a, self.OutputFile)
+      self.assertFalse(hasattr(das.read(self.OutputFile), "comment"))
+      das.write(a, self.OutputFile, journal=[("set", "comment", "cached")])
+      self.assertEqual(das.read(self.OutputFile).comment, "cached")
+
+   def testInvalidRecord(self):
+      a = self.makeAsset()
+      das.write(a, self.OutputFile)
+      with self.assertRaises(das.JournalError):
+         das.write(a, self.OutputFile, journal=[("rename", "name", "table")])
+      with self.assertRaises(das.JournalError):
+         das.write(a, self.OutputFile, journal=[("set", "name")])
+      self.assertFalse(os.path.isfile(self.journalFile()))
+
+   def testInvalidValue(self):
+      a = self.makeAsset()
+      das.write(a, self.OutputFile)
+      # Records not matching the schema
+      for record in (("set", "variants[0].frames", (1, "a")), ("set", "attrs['scale']", "big"),
+                     ("add", "tags", 1), ("remove", "name", None), ("set", "missing.name", "x"),
+                     ("add", "name", "x"), ("set", "variants[0].frames[2]", 1),
+                     ("set", "variants[0].frames[0]", 1)):
+         with self.assertRaises(das.JournalError):
+            das.write(a, self.OutputFile, journal=[record])
+      self.assertFalse(os.path.isfile(self.journalFile()))
+      das.write(a, self.OutputFile, journal=[("set", "comment", "ok")])
+      with self.assertRaises(das.JournalError):
+         das.write(a, self.OutputFile, journal=[("set", "comment", "fine"), ("set", "name", None)])
+      b = das.read(self.OutputFile)
+      self.assertEqual(b.comment, "ok")
+      self.assertEqual(b.name, "chair")
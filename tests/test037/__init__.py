@@ -0,0 +1,144 @@
+import os
+import glob
+import unittest
+import das
+
+class TestCase(unittest.TestCase):
+   TestDir = None
+   OutputFile = None
+
+   @classmethod
+   def setUpClass(cls):
+      cls.TestDir = os.path.abspath(os.path.dirname(__file__))
+      cls.OutputFile = cls.TestDir + "/out.shot"
+      os.environ["DAS_SCHEMA_PATH"] = cls.TestDir
+
+   def setUp(self):
+      self.addCleanup(self.cleanUp)
+
+   def tearDown(self):
+      pass
+
+   def cleanUp(self):
+      for path in glob.glob(self.OutputFile + "*"):
+         os.remove(path)
+
+   @classmethod
+   def tearDownClass(cls):
+      del(os.environ["DAS_SCHEMA_PATH"])
+
+   def makeShot(self, n=10):
+      s = das.make_default("shot.Shot")
+      s.name = "sh010"
+      s.frameRange = (1001, 1100)
+      s.notes = "first 'pass'\nwith {braces}, [brackets] and commas"
+      s.items = [das.make("shot.Item", name="item%d" % i, frames=(i, i + 10)) for i in xrange(n)]
+      return s
+
+   def writeRaw(self, text):
+      with open(self.OutputFile, "wb") as f:
+         f.write("# schema_type: shot.Shot\n# encoding: utf8\n" + text)
+
+   def pending(self, d):
+      return sorted([k for k, v in dict.iteritems(d._dict) if type(v) is das.lazy._Pending])
+
+   # Test functions
+
+   def testFieldsMetadata(self):
+      das.write(self.makeShot(), self.OutputFile)
+      self.assertFalse("fields" in das.read_meta(self.OutputFile))
+      das.write(self.makeShot(), self.OutputFile, lazy=True)
+      self.assertTrue("fields" in das.read_meta(self.OutputFile))
+      das.write(self.makeShot(), self.OutputFile, indent=None, lazy=True)
+      self.assertTrue("fields" in das.read_meta(self.OutputFile))
+      das.write(self.makeShot(), self.OutputFile, format="binary", lazy=True)
+      self.assertFalse("fields" in das.read_meta(self.OutputFile))
+
+   def testLazyAccess(self):
+      for kwargs in ({}, {"lazy": True}, {"indent": None, "lazy": True}, {"compression": "gzip"}):
+         s = self.makeShot()
+         das.write(s, self.OutputFile, **kwargs)
+         d = das.read(self.OutputFile, lazy=True)
+         self.assertTrue(isinstance(d._dict, das.lazy.LazyDict))
+         self.assertEqual(self.pending(d), ["frameRange", "items", "name", "notes"])
+         self.assertEqual(len(d), 4)
+         self.assertTrue("items" in d)
+         self.assertEqual(d.frameRange, (1001, 1100))
+         self.assertEqual(self.pending(d), ["items", "name", "notes"])
+         self.assertTrue(isinstance(d.items[0], das.types.Struct))
+         self.assertEqual(d, s)
+         self.assertEqual(self.pending(d), [])
+         self.assertEqual(das.read(self.OutputFile, lazy=True), das.read(self.OutputFile))
+         self.assertEqual(das.read(self.OutputFile), das.read(self.OutputFile, lazy=True))
+
+   def testModify(self):
+      das.write(self.makeShot(), self.OutputFile)
+      d = das.read(self.OutputFile, lazy=True)
+      d.name = "sh020"
+      self.assertEqual(self.pending(d), ["frameRange", "items", "notes"])
+      with self.assertRaises(das.ValidationError):
+         d.frameRange = "oops"
+      del(d.notes)
+      das.write(d, self.OutputFile)
+      e = das.read(self.OutputFile)
+      self.assertEqual(e.name, "sh020")
+      self.assertFalse("notes" in e)
+      self.assertEqual(len(e.items), 10)
+      self.assertEqual(das.copy(das.read(self.OutputFile, lazy=True)), e)
+
+   def testScan(self):
+      # Hand written content, or edited after das.write recorded field locations
+      self.writeRaw("{'name': 'a,b}', # comment, with ] and }\n 'frameRange': (1, \n 2), 'items': [{'name': \"x\", 'frames': (1, 2)}],}\n")
+      d = das.read(self.OutputFile, lazy=True)
+      self.assertEqual(self.pending(d), ["frameRange", "items", "name"])
+      self.assertEqual(d.name, "a,b}")
+      self.assertEqual(d.frameRange, (1, 2))
+      self.assertEqual(d.items[0].name, "x")
+      das.write(self.makeShot(), self.OutputFile)
+      with open(self.OutputFile, "rb") as f:
+         content = f.read()
+      with open(self.OutputFile, "wb") as f:
+         f.write(content.replace("sh010", "sh1000"))
+      self.assertEqual(das.read(self.OutputFile, lazy=True).name, "sh1000")
+      self.assertEqual(das.read(self.OutputFile, lazy=True), das.read(self.OutputFile))
+
+   def testValidation(self):
+      # Struct keys are checked when reading, field values on first access
+      self.writeRaw("{'name': 'a', 'items': []}\n")
+      with self.assertRaises(das.ValidationError):
+         das.read(self.OutputFile, lazy=True)
+      self.writeRaw("{'name': 'a', 'frameRange': (1, 2), 'items': [], 'other': 1}\n")
+      with self.assertRaises(das.ValidationError):
+         das.read(self.OutputFile, lazy=True)
+      self.assertEqual(das.read(self.OutputFile, lazy=True, strict_schema=False).frameRange, (1, 2))
+      self.writeRaw("{'name': 'a', 'frameRange': (1, 'b'), 'items': []}\n")
+      d = das.read(self.OutputFile, lazy=True)
+      self.assertEqual(d.name, "a")
+      with self.assertRaises(das.ValidationError) as lazyerr:
+         d.frameRange
+      with self.assertRaises(das.ValidationError) as err:
+         das.read(self.OutputFile)
+      self.assertEqual(str(lazyerr.exception), str(err.exception))
+
+   def testFallback(self):
+      # Not a dict literal
+      self.writeRaw("dict(name='a', frameRange=(1, 2), items=[])\n")
+      d = das.read(self.OutputFile, lazy=True)
+      self.assertFalse(isinstance(d._dict, das.lazy.LazyDict))
+      self.assertEqual(d.frameRange, (1, 2))
+      das.write(self.makeShot(), self.OutputFile, format="binary")
+      self.assertEqual(das.read(self.OutputFile, lazy=True), self.makeShot())
+
+   def testAlias(self):
+      self.writeRaw("{'name': 'a', 'frameRange': (1, 2), 'range': (1, 2), 'items': []}\n")
+      d = das.read(self.OutputFile, lazy=True)
+      self.assertEqual(self.pending(d), ["items", "name"])
+      self.assertEqual(d, das.read(self.OutputFile))
+      self.assertFalse("range" in d._dict)
+      self.writeRaw("{'name': 'a', 'range': (1, 2), 'items': []}\n")
+      self.assertEqual(das.read(self.OutputFile, lazy=True).frameRange, (1, 2))
+      self.writeRaw("{'name': 'a', 'frameRange': (1, 2), 'range': (1, 3), 'items': []}\n")
+      with self.assertRaises(das.ValidationError):
+         das.read(self.OutputFile)
+      with self.assertRaises(das.ValidationError):
+         das.read(self.OutputFile, lazy=True)
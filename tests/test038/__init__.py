@@ -0,0 +1,96 @@
+import os
+import glob
+import unittest
+import das
+
+class TestCase(unittest.TestCase):
+   TestDir = None
+   OutputFile = None
+
+   @classmethod
+   def setUpClass(cls):
+      cls.TestDir = os.path.abspath(os.path.dirname(__file__))
+      cls.OutputFile = cls.TestDir + "/out.table"
+      os.environ["DAS_SCHEMA_PATH"] = cls.TestDir
+
+   def setUp(self):
+      self.addCleanup(self.cleanUp)
+
+   def tearDown(self):
+      pass
+
+   def cleanUp(self):
+      for path in glob.glob(self.OutputFile + "*"):
+         os.remove(path)
+
+   @classmethod
+   def tearDownClass(cls):
+      del(os.environ["DAS_SCHEMA_PATH"])
+
+   def makeTable(self, n=50):
+      t = das.make_default("lookup.Table")
+      t.version = 3
+      t.entries = [das.make("lookup.Entry", name=u"entr\xe9e%d" % i, frames=(i, i + (1 << 40)), tags=["a", "b%d" % i], scale=0.5 * i) for i in xrange(n)]
+      t.entries[0].extra = {1: "one", 2: True, 3: None}
+      t.byname = dict([("e%d" % i, i) for i in xrange(n)])
+      return t
+
+   # Test functions
+
+   def testRoundTrip(self):
+      t = self.makeTable()
+      das.write(t, self.OutputFile, format="mapped")
+      self.assertTrue(das.binary.is_binary(open(self.OutputFile, "rb").read()))
+      self.assertEqual(das.read_meta(self.OutputFile)["schema_type"], "lookup.Table")
+      self.assertEqual(das.read(self.OutputFile), t)
+      self.assertEqual(das.binary.loads(das.mapped.dumps(t, encoding="utf8"), encoding="utf8"), t)
+
+   def testMappedAccess(self):
+      t = self.makeTable()
+      das.write(t, self.OutputFile, format="mapped")
+      m = das.read_mapped(self.OutputFile)
+      self.assertTrue(isinstance(m, das.mapped.MappedDict))
+      self.assertEqual(m.version, 3)
+      self.assertEqual(len(m.entries), 50)
+      e = m.entries[-1]
+      self.assertEqual(e.name, u"entr\xe9e49")
+      self.assertEqual(e.frames, (49, 49 + (1 << 40)))
+      self.assertEqual(e.tags, set(["a", "b49"]))
+      self.assertEqual(e["scale"], 24.5)
+      self.assertFalse("extra" in e)
+      self.assertEqual(m.entries[0].extra, {1: "one", 2: True, 3: None})
+      self.assertEqual(m.byname["e10"], 10)
+      self.assertEqual(m.byname[u"e11"], 11)
+      self.assertTrue(m.entries[0].extra[2] is True)
+      self.assertFalse(4 in m.entries[0].extra)
+      self.assertEqual(m.byname.get("missing", -1), -1)
+      self.assertEqual([x.name for x in m.entries[1:3]], [u"entr\xe9e1", u"entr\xe9e2"])
+      self.assertEqual(sorted(m.keys()), ["byname", "entries", "version"])
+      self.assertEqual(m, t)
+      self.assertEqual(das.validate(das.mapped.materialize(m), "lookup.Table"), t)
+      with self.assertRaises(AttributeError):
+         m.missing
+      with self.assertRaises(KeyError):
+         m["missing"]
+      with self.assertRaises(IndexError):
+         m.entries[50]
+      with self.assertRaises(TypeError):
+         m.version = 4
+
+   def testReplace(self):
+      das.write(self.makeTable(), self.OutputFile, format="mapped")
+      m = das.read_mapped(self.OutputFile)
+      # Files are replaced, existing mappings keep the old content
+      das.write(self.makeTable(n=2), self.OutputFile, format="mapped")
+      self.assertEqual(len(m.entries), 50)
+      self.assertEqual(len(das.read_mapped(self.OutputFile).entries), 2)
+
+   def testErrors(self):
+      das.write(self.makeTable(), self.OutputFile, format="binary")
+      with self.assertRaises(das.BinaryError):
+         das.read_mapped(self.OutputFile)
+      with self.assertRaises(das.CompressionError):
+         das.write(self.makeTable(), self.OutputFile, format="mapped", compression="gzip")
+      das.write(self.makeTable(), self.OutputFile)
+      with self.assertRaises(das.BinaryError):
+         das.read_mapped(self.OutputFile)
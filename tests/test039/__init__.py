@@ -0,0 +1,164 @@
+import os
+import glob
+import threading
+import unittest
+import das
+
+class TestCase(unittest.TestCase):
+   TestDir = None
+   OutputFile = None
+
+   @classmethod
+   def setUpClass(cls):
+      cls.TestDir = os.path.abspath(os.path.dirname(__file__))
+      cls.OutputFile = cls.TestDir + "/out.dasa"
+      os.environ["DAS_SCHEMA_PATH"] = cls.TestDir
+
+   def setUp(self):
+      self.addCleanup(self.cleanUp)
+      self.minCompactSize = das.archive.MinCompactSize
+
+   def tearDown(self):
+      das.archive.MinCompactSize = self.minCompactSize
+
+   def cleanUp(self):
+      for path in glob.glob(self.OutputFile + "*"):
+         os.remove(path)
+
+   @classmethod
+   def tearDownClass(cls):
+      del(os.environ["DAS_SCHEMA_PATH"])
+
+   def makeAsset(self, i):
+      return das.make("asset.Asset", name="asset%d" % i, version=i, tags=["t%d" % i])
+
+   def fill(self, n=10):
+      with das.archive.open(self.OutputFile, "a") as a:
+         for i in xrange(n):
+            a.write("asset%d" % i, self.makeAsset(i))
+         a.write("shot", das.make("asset.Shot", name="sh010", frames=(1001, 1100)), format="binary")
+
+   # Test functions
+
+   def testReadWrite(self):
+      self.fill()
+      with das.archive.open(self.OutputFile) as a:
+         self.assertEqual(len(a), 11)
+         self.assertTrue("asset3" in a)
+         self.assertTrue(u"shot" in a)
+         self.assertFalse("asset10" in a)
+         self.assertEqual(a.names()[:2], ["asset0", "asset1"])
+         self.assertEqual(a.read("asset3"), self.makeAsset(3))
+         self.assertEqual(a.read_meta("asset3")["schema_type"], "asset.Asset")
+         self.assertEqual(a.read_meta("shot")["schema_type"], "asset.Shot")
+         s = a.read("shot")
+         self.assertEqual(s.frames, (1001, 1100))
+         self.assertTrue(das.binary.is_binary(a.content("shot")))
+         self.assertEqual(list(a), a.names())
+         items = list(a.iteritems())
+         self.assertEqual([k for k, _ in items][:2], ["asset0", "asset1"])
+         self.assertEqual(items[-1][0], "shot")
+         self.assertEqual(items[5][1], self.makeAsset(5))
+         with self.assertRaises(das.ArchiveError):
+            a.read("missing")
+         with self.assertRaises(das.ArchiveError):
+            a.write("asset0", self.makeAsset(0))
+
+   def testUpdate(self):
+      self.fill()
+      with das.archive.open(self.OutputFile, "a") as a:
+         a.write("asset2", self.makeAsset(20))
+         a.remove("asset3")
+         with self.assertRaises(das.ArchiveError):
+            a.remove("asset3")
+         self.assertEqual(a.read("asset2").version, 20)
+      with das.archive.open(self.OutputFile) as a:
+         self.assertEqual(len(a), 10)
+         self.assertFalse("asset3" in a)
+         self.assertEqual(a.read("asset2").version, 20)
+         self.assertEqual(a.read("asset4"), self.makeAsset(4))
+
+   def testInterruptedUpdate(self):
+      self.fill()
+      with das.archive.open(self.OutputFile, "a") as a:
+         a.write("asset2", self.makeAsset(20))
+         a.remove("asset3")
+         a.write("asset4", self.makeAsset(40))
+         # No index and trailer written
+         a.f.flush()
+         end = a.end
+         a.f.close()
+         a.f = None
+      # Truncate in the middle of last record
+      with open(self.OutputFile, "r+b") as f:
+         f.truncate(end - 4)
+      with das.archive.open(self.OutputFile, "a") as a:
+         self.assertEqual(len(a), 10)
+         self.assertFalse("asset3" in a)
+         self.assertEqual(a.read("asset2").version, 20)
+         self.assertEqual(a.read("asset4"), self.makeAsset(4))
+         a.write("asset5", self.makeAsset(50))
+      with das.archive.open(self.OutputFile) as a:
+         self.assertEqual(len(a), 10)
+         self.assertEqual(a.read("asset5").version, 50)
+         self.assertEqual(a.read("shot").name, "sh010")
+
+   def testCompaction(self):
+      das.archive.MinCompactSize = 0
+      self.fill()
+      size = os.path.getsize(self.OutputFile)
+      for n in xrange(5):
+         with das.archive.open(self.OutputFile, "a") as a:
+            for i in xrange(10):
+               a.write("asset%d" % i, self.makeAsset(i + n))
+      # Without compaction, archive would hold 6 versions of most documents
+      self.assertTrue(os.path.getsize(self.OutputFile) < 1.5 * size)
+      self.assertEqual(glob.glob(self.OutputFile + ".*.tmp"), [])
+      with das.archive.open(self.OutputFile) as a:
+         self.assertEqual(len(a), 11)
+         self.assertEqual(a.read("asset9").version, 13)
+         self.assertEqual(a.read("shot").frames, (1001, 1100))
+
+   def testErrors(self):
+      with self.assertRaises(IOError):
+         das.archive.open(self.OutputFile)
+      with self.assertRaises(das.ArchiveError):
+         das.archive.open(self.OutputFile, "w")
+      with open(self.OutputFile, "wb") as f:
+         f.write("{}")
+      with self.assertRaises(das.ArchiveError):
+         das.archive.open(self.OutputFile)
+
+   def testConcurrentWriters(self):
+      das.archive.MinCompactSize = 0
+      self.fill(n=2)
+      def append(t):
+         for i in xrange(10):
+            with das.archive.open(self.OutputFile, "a") as a:
+               a.write("t%d_%d" % (t, i), self.makeAsset(i))
+               a.write("asset%d" % (i % 2), self.makeAsset(t))
+      threads = [threading.Thread(target=append, args=(t,)) for t in xrange(4)]
+      for t in threads:
+         t.start()
+      for t in threads:
+         t.join()
+      with das.archive.open(self.OutputFile) as a:
+         self.assertEqual(len(a), 43)
+         self.assertEqual(a.read("t3_9"), self.makeAsset(9))
+         self.assertTrue(a.read("asset1").version in range(4))
+      # Writers wait for each other, readers don't
+      a = das.archive.open(self.OutputFile, "a")
+      try:
+         a.write("pending", self.makeAsset(0))
+         with das.archive.open(self.OutputFile) as r:
+            self.assertFalse("pending" in r)
+         t = threading.Thread(target=append, args=(4,))
+         t.start()
+         t.join(0.5)
+         self.assertTrue(t.is_alive())
+      finally:
+         a.close()
+      t.join()
+      with das.archive.open(self.OutputFile) as a:
+         self.assertTrue("pending" in a)
+         self.assertTrue("t4_9" in a)
@@ -0,0 +1,115 @@
+import os
+import unittest
+import das
+
+class TestCase(unittest.TestCase):
+   TestDir = None
+
+   @classmethod
+   def setUpClass(cls):
+      cls.TestDir = os.path.abspath(os.path.dirname(__file__))
+      os.environ["DAS_SCHEMA_PATH"] = cls.TestDir
+
+   def setUp(self):
+      pass
+
+   def tearDown(self):
+      pass
+
+   def cleanUp(self):
+      pass
+
+   @classmethod
+   def tearDownClass(cls):
+      del(os.environ["DAS_SCHEMA_PATH"])
+
+   def item(self, **kwargs):
+      rv = {"name": "item", "frames": (1, 10), "tags": ["a", "b"], "scale": 1.0}
+      rv.update(kwargs)
+      return rv
+
+   def outcome(self, func, value):
+      try:
+         return (True, func(value))
+      except Exception, e:
+         return (False, "%s: %s" % (type(e).__name__, e))
+
+   def assertSameOutcome(self, st, value):
+      compiled = self.outcome(st.validate, value)
+      interpreted = self.outcome(st._interpret, value)
+      self.assertEqual(compiled, interpreted)
+      if compiled[0]:
+         self.assertEqual(type(compiled[1]), type(interpreted[1]))
+      return compiled
+
+   # Test functions
+
+   def testSameResults(self):
+      items = das.get_schema_type("catalog.Items")
+      values = [[self.item()],
+                [self.item(note="n", old=None)],
+                [self.item(), self.item(title="item")],
+                [self.item(title="other")],
+                [self.item(frames=(1,))],
+                [self.item(frames=(1, "a"))],
+                [self.item(tags=[1])],
+                [self.item(scale="a")],
+                [self.item(extra=1)],
+                [{"name": "item"}],
+                [self.item(note=1)],
+                (self.item(),),
+                [3],
+                "items"]
+      for value in values:
+         self.assertSameOutcome(items, value)
+      table = das.get_schema_type("catalog.Table")
+      for value in [{"a": 1, "b": "x", "c": None, "count": 2}, {"count": "x"}, {"a": 1.0}, {1: 1}]:
+         self.assertSameOutcome(table, value)
+
+   def testErrorMessages(self):
+      items = das.get_schema_type("catalog.Items")
+      ok, msg = self.assertSameOutcome(items, [self.item(), self.item(frames=(1, "a"))])
+      self.assertFalse(ok)
+      self.assertEqual(msg, "ValidationError: Invalid sequence element: Invalid value for key 'frames': Invalid tuple element: Expected an integer value, got str")
+      ok, msg = self.assertSameOutcome(das.get_schema_type("catalog.Table"), {"a": 1.0})
+      self.assertFalse(ok)
+      self.assertTrue(msg.startswith("ValidationError: Invalid value for key 'a': Value of type float doesn't match any of the allowed types\n  Type 0 error: "))
+
+   def testMixins(self):
+      items = das.validate([self.item(), self.item(name="other")], "catalog.Items")
+      self.assertEqual(items[1].label(), "other 1-10")
+      with self.assertRaises(das.ValidationError):
+         das.validate([self.item(scale=-1.0)], "catalog.Items")
+
+   def testRecursive(self):
+      tree = {"name": "root", "children": [{"name": "a", "children": []}, {"name": "b", "children": [{"name": "c", "children": []}]}]}
+      node = das.get_schema_type("catalog.Node")
+      self.assertSameOutcome(node, tree)
+      self.assertEqual(node.validate(tree).children[1].children[0].name, "c")
+      tree["children"][1]["children"][0]["children"] = [{"name": 1, "children": []}]
+      self.assertSameOutcome(node, tree)
+
+   def testCompatibilityMode(self):
+      items = das.get_schema_type("catalog.Items")
+      with das._CompatibilityMode(False):
+         rv = items.validate([{"name": "item", "frames": (1, 10), "tags": []}, self.item(extra=1)])
+      self.assertEqual(rv[0].scale, 0.0)
+      self.assertFalse("extra" in rv[1])
+      with self.assertRaises(das.ValidationError):
+         items.validate([self.item(extra=1)])
+
+   def testInvalidation(self):
+      node = das.get_schema_type("catalog.Node")
+      func = node.compile()
+      self.assertTrue(node.compile() is func)
+      das.make_default("catalog.Item")
+      self.assertTrue(node.compile() is func)
+      try:
+         node["comment"] = das.schematypes.String()
+         self.assertFalse(node.compile() is func)
+         with self.assertRaises(das.ValidationError):
+            node.validate({"name": "root", "children": []})
+         node.validate({"name": "root", "children": [], "comment": ""})
+      finally:
+         del(node["comment"])
+      node.validate({"name": "root", "children": []})
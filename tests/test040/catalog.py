@@ -0,0 +1,19 @@
+import das
+
+class ItemValidator(das.Mixin):
+   @classmethod
+   def get_schema_type(klass):
+      return "catalog.Item"
+
+   def __init__(self, *args, **kwargs):
+      super(ItemValidator, self).__init__(*args, **kwargs)
+
+   def _validate_globally(self):
+      if self.scale < 0:
+         raise Exception("Negative scale")
+
+   def label(self):
+      return "%s %d-%d" % (self.name, self.frames[0], self.frames[1])
+
+
+das.register_mixins(ItemValidator)
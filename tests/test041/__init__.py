@@ -0,0 +1,144 @@
+import os
+import glob
+import unittest
+import das
+
+class TestCase(unittest.TestCase):
+   TestDir = None
+   OutputFile = None
+
+   @classmethod
+   def setUpClass(cls):
+      cls.TestDir = os.path.abspath(os.path.dirname(__file__))
+      cls.OutputFile = cls.TestDir + "/out.inventory"
+      os.environ["DAS_SCHEMA_PATH"] = cls.TestDir
+
+   def setUp(self):
+      self.addCleanup(self.cleanUp)
+
+   def tearDown(self):
+      pass
+
+   def cleanUp(self):
+      for path in glob.glob(self.OutputFile + "*"):
+         os.remove(path)
+
+   @classmethod
+   def tearDownClass(cls):
+      del(os.environ["DAS_SCHEMA_PATH"])
+
+   def makeInventory(self):
+      inv = das.make_default("inventory.Inventory")
+      inv.limit = 1000
+      inv.items = [{"name": "a", "count": 1}, {"name": "b", "count": 2}]
+      inv.tags = ["x"]
+      inv.stock = {"a": 1}
+      return inv
+
+   def calls(self):
+      return das.schema.inventory.InventoryValidator.Calls
+
+   # Test functions
+
+   def testDeferred(self):
+      inv = self.makeInventory()
+      n = self.calls()
+      for i in xrange(10):
+         inv.items.append({"name": "i%d" % i, "count": 1})
+      self.assertEqual(self.calls() - n, 10)
+      n = self.calls()
+      with das.transaction(inv) as data:
+         self.assertTrue(data is inv)
+         for i in xrange(50):
+            inv.items.append({"name": "j%d" % i, "count": 1})
+            inv.stock["j%d" % i] = i
+         inv.items[0].count = 10
+         inv.tags.add("y")
+         self.assertEqual(self.calls(), n)
+      self.assertEqual(self.calls() - n, 1)
+      self.assertEqual(len(inv.items), 62)
+      self.assertEqual(inv.items[0].count, 10)
+      self.assertEqual(len(inv.stock), 51)
+      # Validation is immediate again
+      with self.assertRaises(das.ValidationError):
+         inv.items[1].count = 1000
+
+   def testRollback(self):
+      inv = self.makeInventory()
+      before = das.copy(inv)
+      # Container check failing at commit (max_size)
+      with self.assertRaises(das.ValidationError):
+         with das.transaction(inv):
+            inv.items[0].name = "renamed"
+            inv.tags.clear()
+            del(inv.stock["a"])
+            for i in xrange(200):
+               inv.items.append({"name": "i%d" % i, "count": 0})
+      self.assertEqual(inv, before)
+      self.assertEqual(inv.items[0].name, "a")
+      # Global validation failing at commit
+      with self.assertRaises(das.ValidationError):
+         with das.transaction(inv):
+            inv.items.append({"name": "c", "count": 10})
+            inv.limit = 5
+      self.assertEqual(inv, before)
+      # Any error in block
+      with self.assertRaises(KeyError):
+         with das.transaction(inv):
+            inv.items.pop()
+            inv.stock["missing"]
+      self.assertEqual(inv, before)
+      # Values are still validated on assignment
+      with self.assertRaises(das.ValidationError):
+         with das.transaction(inv):
+            inv.items.pop()
+            inv.items[0].count = "a"
+      self.assertEqual(inv, before)
+      inv.items.append({"name": "c", "count": 3})
+      self.assertEqual(len(inv.items), 3)
+
+   def testSavedOnChange(self):
+      inv = self.makeInventory()
+      inv.items.extend([{"name": "i%d" % i, "count": 1} for i in xrange(90)])
+      item = inv.items[3]
+      before = das.copy(inv)
+      tr = das.transaction(inv)
+      with self.assertRaises(das.ValidationError):
+         with tr:
+            # Only the objects actually changed are saved
+            self.assertEqual(len(tr.saved), 1)
+            item.count = 5
+            item.name = "x"
+            inv.stock["b"] = 2
+            self.assertEqual(len(tr.saved), 3)
+            inv.items[10].count = -1
+      self.assertEqual(inv, before)
+      self.assertEqual(item.count, 1)
+      self.assertEqual(tr.saved, {})
+      self.assertFalse("_transaction" in item.__dict__)
+      self.assertEqual(das.types.Transaction.Active, 0)
+
+   def testNested(self):
+      inv = self.makeInventory()
+      n = self.calls()
+      with das.transaction(inv):
+         with das.transaction(inv.items) as items:
+            items.append({"name": "c", "count": 3})
+         self.assertEqual(self.calls(), n)
+         inv.limit = 2
+         inv.limit = 10
+      self.assertEqual(self.calls() - n, 1)
+      self.assertEqual(len(inv.items), 3)
+      with self.assertRaises(Exception):
+         das.transaction({})
+
+   def testLazy(self):
+      inv = self.makeInventory()
+      das.write(inv, self.OutputFile)
+      inv = das.read(self.OutputFile, lazy=True)
+      with self.assertRaises(das.ValidationError):
+         with das.transaction(inv):
+            inv.limit = 0
+      self.assertEqual(inv.limit, 1000)
+      self.assertEqual(len(inv.items), 2)
+      self.assertEqual(inv, self.makeInventory())
@@ -0,0 +1,19 @@
+import das
+
+class InventoryValidator(das.Mixin):
+   Calls = 0
+
+   @classmethod
+   def get_schema_type(klass):
+      return "inventory.Inventory"
+
+   def __init__(self, *args, **kwargs):
+      super(InventoryValidator, self).__init__(*args, **kwargs)
+
+   def _validate_globally(self):
+      InventoryValidator.Calls += 1
+      if sum([x.count for x in self.items]) > self.limit:
+         raise Exception("Inventory over limit")
+
+
+das.register_mixins(InventoryValidator)
@@ -0,0 +1,96 @@
+import os
+import glob
+import unittest
+import das
+
+class TestCase(unittest.TestCase):
+   TestDir = None
+   OutputFile = None
+
+   @classmethod
+   def setUpClass(cls):
+      cls.TestDir = os.path.abspath(os.path.dirname(__file__))
+      cls.OutputFile = cls.TestDir + "/out.scene"
+      os.environ["DAS_SCHEMA_PATH"] = cls.TestDir
+
+   def setUp(self):
+      self.addCleanup(self.cleanUp)
+
+   def tearDown(self):
+      pass
+
+   def cleanUp(self):
+      for path in glob.glob(self.OutputFile + "*"):
+         os.remove(path)
+
+   @classmethod
+   def tearDownClass(cls):
+      del(os.environ["DAS_SCHEMA_PATH"])
+
+   def makeScene(self, count=20):
+      scene = das.make_default("scene.Scene")
+      for i in xrange(count):
+         scene.shots["s%d" % i] = {"name": "s%d" % i, "frames": range(i, i + 10)}
+      return scene
+
+   def calls(self):
+      return das.schema.scene.ShotValidator.Calls
+
+   def clean(self, d):
+      return (d.__dict__.get("_validated", None) == das.schematypes.TypeValidator.Generation)
+
+   # Test functions
+
+   def testWriteAfterEdit(self):
+      scene = self.makeScene()
+      das.write(scene, self.OutputFile)
+      self.assertTrue(all([self.clean(x) for x in scene.shots.itervalues()]))
+      shot = scene.shots["s3"]
+      shot.frames.append(100)
+      self.assertFalse(self.clean(shot))
+      self.assertFalse(self.clean(scene.shots))
+      self.assertTrue(self.clean(scene.shots["s4"]))
+      n = self.calls()
+      das.write(scene, self.OutputFile)
+      self.assertEqual(self.calls() - n, 1)
+      self.assertTrue(self.clean(shot))
+      n = self.calls()
+      das.write(scene, self.OutputFile)
+      self.assertEqual(self.calls(), n)
+      self.assertEqual(das.read(self.OutputFile), scene)
+
+   def testReadStamped(self):
+      das.write(self.makeScene(), self.OutputFile)
+      scene = das.read(self.OutputFile)
+      self.assertTrue(all([self.clean(x) for x in scene.shots.itervalues()]))
+      n = self.calls()
+      das.write(scene, self.OutputFile)
+      self.assertEqual(self.calls(), n)
+
+   def testInvalidChanges(self):
+      scene = self.makeScene()
+      das.write(scene, self.OutputFile)
+      shot = scene.shots["s5"]
+      with das.GlobalValidationDisabled(shot):
+         shot.frames.insert(0, 100)
+      with self.assertRaises(das.ValidationError):
+         das.write(scene, self.OutputFile)
+      shot.frames.pop(0)
+      das.write(scene, self.OutputFile)
+      # Direct changes of the written object content are caught
+      scene._dict["note"] = 1
+      with self.assertRaises(das.ValidationError):
+         das.write(scene, self.OutputFile)
+
+   def testSchemaChange(self):
+      scene = self.makeScene()
+      das.write(scene, self.OutputFile)
+      das.schematypes.TypeValidator.invalidate()
+      self.assertFalse(self.clean(scene.shots["s0"]))
+      n = self.calls()
+      das.write(scene, self.OutputFile)
+      self.assertEqual(self.calls() - n, 20)
+      # Copies are validated again
+      n = self.calls()
+      das.write(das.copy(scene), self.OutputFile)
+      self.assertEqual(self.calls() - n, 20)
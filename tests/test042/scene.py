@@ -0,0 +1,19 @@
+import das
+
+class ShotValidator(das.Mixin):
+   Calls = 0
+
+   @classmethod
+   def get_schema_type(klass):
+      return "scene.Shot"
+
+   def __init__(self, *args, **kwargs):
+      super(ShotValidator, self).__init__(*args, **kwargs)
+
+   def _validate_globally(self):
+      ShotValidator.Calls += 1
+      if list(self.frames) != sorted(self.frames):
+         raise Exception("Unsorted frames")
+
+
+das.register_mixins(ShotValidator)
@@ -0,0 +1,117 @@
+import os
+import glob
+import unittest
+import das
+
+class Tag(object):
+   def __init__(self):
+      super(Tag, self).__init__()
+      self.value = ""
+
+   def copy(self):
+      rv = Tag()
+      rv.value = self.value
+      return rv
+
+   def string_to_value(self, s):
+      self.value = s
+
+class TestCase(unittest.TestCase):
+   TestDir = None
+   OutputFile = None
+
+   @classmethod
+   def setUpClass(cls):
+      cls.TestDir = os.path.abspath(os.path.dirname(__file__))
+      cls.OutputFile = cls.TestDir + "/out.shapes"
+      os.environ["DAS_SCHEMA_PATH"] = cls.TestDir
+
+   def setUp(self):
+      self.addCleanup(self.cleanUp)
+
+   def tearDown(self):
+      pass
+
+   def cleanUp(self):
+      for path in glob.glob(self.OutputFile + "*"):
+         os.remove(path)
+
+   @classmethod
+   def tearDownClass(cls):
+      del(os.environ["DAS_SCHEMA_PATH"])
+
+   def shape(self):
+      return das.get_schema_type("shapes.Shape")
+
+   def tryAll(self, value):
+      # Reference behaviour, every alternative being tried in order
+      st = self.shape()
+      emsgs = []
+      for typ in st.types:
+         try:
+            return typ.validate(value)
+         except das.ValidationError, e:
+            emsgs.append(str(e))
+      emsg = "Value of type %s doesn't match any of the allowed types" % type(value).__name__
+      emsg += "".join(["\n  Type %d error: %s" % (x, emsgs[x]) for x in xrange(len(emsgs))])
+      raise das.ValidationError(emsg)
+
+   # Test functions
+
+   def testCandidates(self):
+      st = self.shape()
+      self.assertEqual(st._candidates({"radius": 1.0}), [0, 2])
+      self.assertEqual(st._candidates({"width": 1.0, "height": 2.0, "name": "r"}), [1, 2])
+      self.assertEqual(st._candidates({"oldname": "n"}), [2])
+      self.assertEqual(st._candidates("unit"), [3, 4])
+      self.assertEqual(st._candidates("square"), [4])
+      self.assertEqual(st._candidates(1), [4])
+      self.assertEqual(st._candidates([1, 2.0]), [5])
+      self.assertEqual(st._candidates(None), [])
+
+   def testSameResults(self):
+      values = [{"radius": 1.0}, {"radius": 2, "name": "c"}, {"width": 1, "height": 2},
+                {"name": "n"}, {"oldname": "n"}, "unit", "1", 3, [1, 2.5],
+                {"radius": "a"}, {"radius": 1.0, "width": 2.0}, "square", None, 1.5, {}]
+      for value in values:
+         try:
+            expected = self.tryAll(value)
+            error = None
+         except das.ValidationError, e:
+            expected = None
+            error = str(e)
+         if error is None:
+            rv = self.shape().validate(value)
+            self.assertEqual(rv, expected)
+            self.assertEqual(type(rv), type(expected))
+         else:
+            with self.assertRaises(das.ValidationError) as ctx:
+               self.shape().validate(value)
+            self.assertEqual(str(ctx.exception), error)
+            with self.assertRaises(das.ValidationError) as ctx:
+               self.shape()._interpret(value)
+            self.assertEqual(str(ctx.exception), error)
+
+   def testReadWrite(self):
+      scene = das.make_default("shapes.Scene")
+      scene.shapes = [{"radius": 1.0}, {"width": 1.0, "height": 2.0}, "unit", 4, [1.0]]
+      das.write(scene, self.OutputFile)
+      self.assertEqual(das.read(self.OutputFile), scene)
+      with self.assertRaises(das.ValidationError):
+         scene.shapes.append("square")
+
+   def testNonAscii(self):
+      st = das.schematypes.Or(das.schematypes.String(choices=["a", "b"]), das.schematypes.Class(Tag))
+      value = "\xc3\xa9t\xc3\xa9"
+      self.assertEqual(st._candidates(value), [1])
+      self.assertEqual(st.validate(value).value, value)
+      self.assertEqual(st.compile()(value).value, value)
+      self.assertEqual(st._candidates(u"\xe9t\xe9"), [1])
+      self.assertEqual(st._candidates(u"a"), [0, 1])
+
+   def testSchemaChange(self):
+      st = self.shape()
+      self.assertEqual(st._candidates("square"), [4])
+      das.get_schema_type("shapes.Shape").types[3].choices = ["square"]
+      self.assertEqual(st._candidates("square"), [3, 4])
+      das.get_schema_type("shapes.Shape").types[3].choices = ["unit", "empty"]
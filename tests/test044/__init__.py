@@ -0,0 +1,101 @@
+import os
+import glob
+import unittest
+import das
+
+class TestCase(unittest.TestCase):
+   TestDir = None
+   OutputFile = None
+
+   @classmethod
+   def setUpClass(cls):
+      cls.TestDir = os.path.abspath(os.path.dirname(__file__))
+      cls.OutputFile = cls.TestDir + "/out.probe"
+      os.environ["DAS_SCHEMA_PATH"] = cls.TestDir
+
+   def setUp(self):
+      self.addCleanup(self.cleanUp)
+
+   def tearDown(self):
+      pass
+
+   def cleanUp(self):
+      for path in glob.glob(self.OutputFile + "*"):
+         os.remove(path)
+
+   @classmethod
+   def tearDownClass(cls):
+      del(os.environ["DAS_SCHEMA_PATH"])
+
+   def node(self, **kwargs):
+      value = {"name": "root", "mode": "fast", "flags": [1, "b"], "points": [(0, 1), (1.5, 2)],
+               "attrs": {"x": 1, "y": "true"}, "children": [{"name": "leaf", "mode": "slow", "flags": [],
+               "points": [], "attrs": {}}]}
+      value.update(kwargs)
+      return value
+
+   def validates(self, st, value):
+      # Reference behaviour
+      try:
+         das.get_schema_type(st).validate(das.copy(value))
+         return True
+      except:
+         return False
+
+   def checkSame(self, st, value):
+      expected = self.validates(st, value)
+      self.assertEqual(das.get_schema_type(st).accepts(value), expected, repr(value))
+      self.assertEqual(das.check(value, st), expected)
+
+   # Test functions
+
+   def testSameResults(self):
+      values = [self.node(), self.node(name="Root"), self.node(mode="medium"), self.node(flags=[3]),
+                self.node(flags=["c"]), self.node(points=[(0, -1)]), self.node(points=[(0, 1)] * 4),
+                self.node(points=[(0, 1, 2)]), self.node(attrs={"x": 1.5}), self.node(attrs={1: 1}),
+                self.node(children=None), self.node(children=[self.node(mode=1)]), self.node(old=None),
+                self.node(old=2), self.node(old="a"), self.node(unknown=1), self.node(name=u"r\xe9"),
+                self.node(name="r\xc3\xa9"), {"name": "a"}, [], None, 1]
+      for value in values:
+         self.checkSame("probe.Node", value)
+      for value in ["fast", u"slow", "medium", 1, None]:
+         self.checkSame("probe.Mode", value)
+      for value in [{"title": "a"}, {"label": "a"}, {"title": "a", "label": "b"}, {}]:
+         self.checkSame("probe.Renamed", value)
+      for value in [{"low": 0, "high": 1}, {"low": 2, "high": 1}, {"low": 0}]:
+         self.checkSame("probe.Checked", value)
+
+   def testDasValues(self):
+      node = das.get_schema_type("probe.Node").validate(self.node())
+      self.checkSame("probe.Node", node)
+      self.checkSame("probe.Node", node.children[0])
+      self.assertFalse(das.check(node.points[0], "probe.Node"))
+      self.assertTrue(das.check(node.points[0], "probe.Point"))
+      checked = das.get_schema_type("probe.Checked").validate({"low": 0, "high": 1})
+      self.assertTrue(das.check(checked, "probe.Checked"))
+      with das.GlobalValidationDisabled(checked):
+         checked.low = 5
+      self.assertFalse(das.check(checked, "probe.Checked"))
+
+   def testNoModification(self):
+      value = {"label": "a"}
+      self.assertTrue(das.check(value, "probe.Renamed"))
+      self.assertEqual(value, {"label": "a"})
+      value = self.node()
+      ref = das.copy(value)
+      self.assertTrue(das.check(value, "probe.Node"))
+      self.assertEqual(value, ref)
+      # Missing fields are filled in compatibility mode
+      value = {"low": 0}
+      with das._CompatibilityMode(False):
+         self.assertTrue(das.check(value, "probe.Checked"))
+      self.assertEqual(value, {"low": 0})
+      self.assertFalse(das.check(value, "probe.Checked"))
+
+   def testIsCompatible(self):
+      # Global validation of the value itself is not run
+      self.assertTrue(das.is_compatible({"low": 2, "high": 1}, "probe.Checked"))
+      self.assertFalse(das.is_compatible({"low": 2}, "probe.Checked"))
+      self.assertTrue(das.is_compatible(self.node(), "probe.Node"))
+      self.assertFalse(das.is_compatible(self.node(mode="medium"), "probe.Node"))
+      self.assertFalse(das.is_compatible(1, "probe.Unknown"))
@@ -0,0 +1,16 @@
+import das
+
+class CheckedValidator(das.Mixin):
+   @classmethod
+   def get_schema_type(klass):
+      return "probe.Checked"
+
+   def __init__(self, *args, **kwargs):
+      super(CheckedValidator, self).__init__(*args, **kwargs)
+
+   def _validate_globally(self):
+      if self.low > self.high:
+         raise Exception("low > high")
+
+
+das.register_mixins(CheckedValidator)